@@ -1,51 +1,71 @@
 import os
 import json
+import math
 import time
 import re
-from datetime import datetime
+import uuid
+import logging
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import requests
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from flask_session import Session
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from dateutil import parser
-import dateutil.relativedelta as rd
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, session, redirect, url_for, stream_with_context, copy_current_request_context
 from dotenv import load_dotenv
-import google.generativeai as genai
-from logging_config import setup_logging
-from models import db, Reminder, CommandHistory, init_db
+from logging_config import setup_logging, bind_log_context, clear_log_context, current_log_context, logging_stats
+from http_client import http_pool, init_http_client
+from caching import ai_cache, weather_cache, weather_fallback, weather_flights, async_weather_flights, init_cache
+from google_services import google_services, init_google_services, credentials_to_dict, SCOPES
+from calendar_sync import calendar_sync, enqueue_calendar_event, init_calendar_sync, save_google_credentials
+from history_recorder import history_recorder, init_history_recorder
+from rate_limit import rate_limiter, init_rate_limiter, RateLimitExceeded
+from circuit_breaker import CircuitOpen
+from metrics import metrics, init_metrics
+from session_store import init_session_store
+from intent_router import IntentRouter
+from reminder_parser import parse_reminder_text, has_time_phrase, resolve_time_phrase, to_utc_naive, local_day_bounds
+from models import db, Reminder, CommandHistory, init_db, user_stats, REMINDER_ORDERS, encode_cursor, reminders_page, reminders_since
 from config import Config
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
-app.config.from_object(Config)
-Session(app)
-init_db(app)
-logger = setup_logging()
-
-SCOPES = ['https://www.googleapis.com/auth/calendar.events', 'https://www.googleapis.com/auth/gmail.modify']
+logger = logging.getLogger(__name__)
 
 # Load Gemini API key from environment variable
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("⚠️ GOOGLE_API_KEY is missing. Please set it in your .env file or environment.")
+MISSING_GOOGLE_API_KEY = "⚠️ GOOGLE_API_KEY is missing. Please set it in your .env file or environment."
+
+bp = Blueprint('assistant', __name__)
 
-# Configure Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
-gemini_model = genai.GenerativeModel("gemini-1.5-flash")
+GEMINI_SDK_HOST = 'generativelanguage.googleapis.com'
+_gemini_model = None
 
-def generate_ai_response(prompt, api_key, retries=3, timeout=30):
+def get_gemini_model():
     """
-    Generates a response from the Gemini 1.5 Flash model using the API.
-    Retries if the request times out or fails temporarily.
+    The Gemini SDK client used by /ask. google.generativeai takes longer to
+    import than the rest of the app together, so it is imported and
+    configured on first use rather than when a worker boots. When
+    GEMINI_API_URL points somewhere else (a proxy or a local stub), the SDK
+    talks REST to that host too.
     """
-    if not api_key:
-        return "Error: Gemini API key is missing."
+    global _gemini_model
+    if _gemini_model is None:
+        if not GOOGLE_API_KEY:
+            raise ValueError(MISSING_GOOGLE_API_KEY)
+        import google.generativeai as genai
+        options = {}
+        url = urlsplit(current_app.config['GEMINI_API_URL'])
+        if url.netloc != GEMINI_SDK_HOST:
+            options = {'transport': 'rest', 'client_options': {'api_endpoint': f"{url.scheme}://{url.netloc}"}}
+        genai.configure(api_key=GOOGLE_API_KEY, **options)
+        _gemini_model = genai.GenerativeModel("gemini-1.5-flash")
+    return _gemini_model
 
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+def gemini_request(prompt, api_key):
+    """
+    Builds the headers and JSON body for a Gemini REST call.
+    """
     headers = {
         'Content-Type': 'application/json',
         'X-goog-api-key': api_key
@@ -59,55 +79,181 @@ def generate_ai_response(prompt, api_key, retries=3, timeout=30):
             }
         ]
     }
+    return headers, json.dumps(data)
 
-    for attempt in range(1, retries + 1):
-        try:
-            response = requests.post(url, headers=headers, data=json.dumps(data), timeout=timeout)
+def extract_candidate_text(json_response):
+    """
+    Returns the text of the first candidate in a Gemini response, or None.
+    """
+    if "candidates" in json_response:
+        parts = json_response["candidates"][0].get("content", {}).get("parts", [])
+        if parts and "text" in parts[0]:
+            return parts[0]["text"]
+    return None
+
+def generate_ai_response(prompt, api_key, retries=3, timeout=None):
+    """
+    Generates a response from the Gemini 1.5 Flash model using the API.
+    Retries timeouts and throttled (429) or unavailable answers, with
+    backoff, within the Gemini rate limits.
+    """
+    if not api_key:
+        return "Error: Gemini API key is missing."
+
+    url = f"{current_app.config['GEMINI_API_URL']}:generateContent"
+    headers, data = gemini_request(prompt, api_key)
+
+    try:
+        send = lambda: http_pool.post(url, headers=headers, data=data, timeout=timeout)
+        with rate_limiter['gemini'].request(send, attempts=retries) as response:
+            response.raise_for_status()
+            text = extract_candidate_text(response.json())
+    except CircuitOpen as e:
+        return f"⚠️ {e}"
+    except RateLimitExceeded as e:
+        return f"⏳ {e}"
+    except requests.exceptions.Timeout:
+        return "❌ Failed after multiple attempts due to timeout or network issues."
+    except requests.exceptions.RequestException as e:
+        return f"Error: API request failed. Details: {e}"
+    if text is not None:
+        ai_cache.set(prompt, text)
+        return text
+    return "Error: Could not extract text from the API response."
+
+def cached_ai_response(prompt, api_key):
+    """
+    Returns (response, cached). Repeated prompts are served from the response
+    cache; misses go to Gemini, which caches successful answers.
+    """
+    cached = ai_cache.get(prompt)
+    if cached is not None:
+        return cached, True
+    return generate_ai_response(prompt, api_key), False
+
+def stream_ai_response(prompt, api_key, timeout=None):
+    """
+    Streams a response from the Gemini 1.5 Flash model, yielding text chunks
+    as soon as the API sends them (server-sent events with alt=sse).
+    """
+    if not api_key:
+        yield "Error: Gemini API key is missing."
+        return
+
+    url = f"{current_app.config['GEMINI_API_URL']}:streamGenerateContent?alt=sse"
+    headers, data = gemini_request(prompt, api_key)
+
+    try:
+        parts = []
+        send = lambda: http_pool.post(url, headers=headers, data=data, timeout=timeout, stream=True)
+        with rate_limiter['gemini'].request(send) as response:
             response.raise_for_status()
-            json_response = response.json()
-            if "candidates" in json_response:
-                parts = json_response["candidates"][0].get("content", {}).get("parts", [])
-                if parts and "text" in parts[0]:
-                    return parts[0]["text"]
-            return "Error: Could not extract text from the API response."
-        except requests.exceptions.Timeout:
-            time.sleep(2)
-        except requests.exceptions.RequestException as e:
-            return f"Error: API request failed. Details: {e}"
-    return "❌ Failed after multiple attempts due to timeout or network issues."
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                text = extract_candidate_text(json.loads(line[len('data:'):]))
+                if text:
+                    parts.append(text)
+                    yield text
+        ai_cache.set(prompt, ''.join(parts))
+    except CircuitOpen as e:
+        yield f"⚠️ {e}"
+    except RateLimitExceeded as e:
+        yield f"⏳ {e}"
+    except requests.exceptions.Timeout:
+        yield "❌ The AI response timed out. Please try again."
+    except requests.exceptions.RequestException as e:
+        yield f"Error: API request failed. Details: {e}"
+
+def cache_stream(prompt, chunks):
+    """
+    Passes chunks through and caches the full text once the stream completes.
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    ai_cache.set(prompt, ''.join(parts))
+
+def sse_event(data, event=None):
+    """
+    Encodes a dict as a single server-sent event.
+    """
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def sse_response(chunks, **start_fields):
+    """
+    Wraps a generator of text chunks in a text/event-stream response.
+    Emits a 'start' event, one 'message' event per chunk and a final 'done'
+    (or 'error') event so the client knows when the answer is complete.
+    """
+    # The body is generated after the view returns; keep its log records and spans tied to the request
+    log_fields = current_log_context()
+    trace = metrics.current_trace()
+
+    def generate():
+        bind_log_context(**log_fields)
+        metrics.resume_trace(trace)
+        yield sse_event({'status': 'success', **start_fields}, event='start')
+        try:
+            for chunk in chunks:
+                yield sse_event({'delta': chunk})
+            yield sse_event({'status': 'success'}, event='done')
+        except Exception as e:
+            logger.error(f"Streaming error: {e}")
+            yield sse_event({'status': 'error', 'response': f"❌ Streaming error: {str(e)}"}, event='error')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def wants_stream(payload):
+    """
+    A client opts into streaming with {"stream": true} or an
+    Accept: text/event-stream header; everyone else gets plain JSON.
+    """
+    return bool(payload.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
 
 def create_flow():
+    from google_auth_oauthlib.flow import Flow
     return Flow.from_client_config(
         {
             "web": {
-                "client_id": app.config['GOOGLE_CLIENT_ID'],
-                "client_secret": app.config['GOOGLE_CLIENT_SECRET'],
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "redirect_uris": [url_for('oauth2callback', _external=True)]
+                "client_id": current_app.config['GOOGLE_CLIENT_ID'],
+                "client_secret": current_app.config['GOOGLE_CLIENT_SECRET'],
+                "auth_uri": current_app.config['GOOGLE_AUTH_URI'],
+                "token_uri": current_app.config['GOOGLE_TOKEN_URI'],
+                "redirect_uris": [url_for('assistant.oauth2callback', _external=True)]
             }
         },
         scopes=SCOPES
     )
 
-def credentials_to_dict(credentials):
-    return {
-        'token': credentials.token,
-        'refresh_token': credentials.refresh_token,
-        'token_uri': credentials.token_uri,
-        'client_id': credentials.client_id,
-        'client_secret': credentials.client_secret,
-        'scopes': credentials.scopes
-    }
+def client_secrets_flow(**kwargs):
+    """
+    OAuth flow for the client in credentials.json, against the configured
+    authorization and token endpoints rather than the ones in the file.
+    """
+    from google_auth_oauthlib.flow import Flow
+    with open('credentials.json', encoding='utf-8') as f:
+        client_config = json.load(f)
+    for client in client_config.values():
+        client['auth_uri'] = current_app.config['GOOGLE_AUTH_URI']
+        client['token_uri'] = current_app.config['GOOGLE_TOKEN_URI']
+    return Flow.from_client_config(client_config, scopes=SCOPES, **kwargs)
 
 def authenticate_google_calendar():
     try:
         if 'google_credentials' not in session:
             return None
+        from google.oauth2.credentials import Credentials
         creds = Credentials.from_authorized_user_info(session['google_credentials'], SCOPES)
         if not creds or not creds.valid:
             return None
-        return build('calendar', 'v3', credentials=creds)
+        return google_services.service('calendar', 'v3', creds)
     except Exception as e:
         logger.error(f"Calendar auth error: {e}")
         return None
@@ -116,102 +262,78 @@ def authenticate_gmail():
     try:
         if 'google_credentials' not in session:
             return None
+        from google.oauth2.credentials import Credentials
         creds = Credentials.from_authorized_user_info(session['google_credentials'], SCOPES)
         if not creds or not creds.valid:
             return None
-        return build('gmail', 'v1', credentials=creds)
+        return google_services.service('gmail', 'v1', creds)
     except Exception as e:
         logger.error(f"Gmail auth error: {e}")
         return None
 
-def create_calendar_event(task, time_phrase):
-    try:
-        if 'google_credentials' not in session:
-            return "🔒 <a href='/login' style='color: #007bff;'>Sign in with Google</a> to enable calendar integration"
-        # Parse time_phrase for specific times
-        from dateutil.parser import parse as dt_parse
-        base_time = datetime.now()
-        if 'tomorrow' in time_phrase.lower():
-            base_time = base_time + rd.relativedelta(days=1)
-        try:
-            parsed_time = dt_parse(time_phrase, fuzzy=True, default=base_time)
-            start_time = parsed_time
-        except Exception:
-            start_time = base_time + rd.relativedelta(hours=2)  # Fallback
-        end_time = start_time + rd.relativedelta(hours=1)
-        event = {
-            'summary': f"Reminder: {task}",
-            'start': {
-                'dateTime': start_time.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_time.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'description': f'Created by AI Assistant: {time_phrase}'
-        }
-        service = authenticate_google_calendar()
-        if service:
-            event = service.events().insert(calendarId='primary', body=event).execute()
-            return f"✅ Calendar event created! <a href='{event.get('htmlLink')}' target='_blank' style='color: #007bff;'>View in Calendar</a>"
-        else:
-            return "✅ Reminder set! (Re-authentication needed)"
-    except Exception as e:
-        logger.error(f"Error creating calendar event: {e}")
-        return f"✅ Reminder set! (Calendar: {str(e)})"
-
-def parse_reminder_text(text):
-    time_patterns = [
-        r'at\s+\d{1,2}(:\d{2})?\s*(am|pm|AM|PM)?',
-        r'tomorrow',
-        r'next\s+\w+',
-        r'in\s+\d+\s+(hours|minutes|days)',
-        r'\d{1,2}(:\d{2})?\s*(am|pm|AM|PM)',
-        r'today',
-        r'this\s+\w+',
-        r'morning',
-        r'afternoon',
-        r'evening',
-        r'night'
-    ]
-    time_phrase = None
-    for pattern in time_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            time_phrase = match.group(0)
-            break
-    task = text
-    remove_phrases = [
-        'remind me to', 'please', 'set a reminder for', 
-        'can you', 'could you', 'i need to', 'set a reminder to',
-        'remember to', 'don\'t forget to'
-    ]
-    for phrase in remove_phrases:
-        task = re.sub(phrase, '', task, flags=re.IGNORECASE)
-    if time_phrase:
-        task = task.replace(time_phrase, '')
-    task = task.strip()
-    task = re.sub(r'^\s*(to|that|about)\s+', '', task)
-    task = re.sub(r'\s+', ' ', task).strip()
-    if not time_phrase:
-        time_phrase = "in 1 hour"
-    return task, time_phrase
+def normalize_city(city):
+    return re.sub(r'\s+', ' ', city).strip().strip('?!.,').lower()
+
+def weather_request(city):
+    """
+    URL and query parameters of an OpenWeatherMap current-weather call.
+    """
+    params = {'q': city, 'appid': current_app.config['WEATHER_API_KEY'], 'units': 'metric'}
+    return current_app.config['WEATHER_API_URL'], params
+
+def format_weather(city, data):
+    """
+    Turns an OpenWeatherMap response into (message, cacheable); only real
+    observations are cacheable.
+    """
+    if data['cod'] == 200:
+        temp = data['main']['temp']
+        description = data['weather'][0]['description']
+        humidity = data['main']['humidity']
+        wind = data['wind']['speed']
+        return f"🌤️ {city.title()}: {temp}°C, {description}, 💧{humidity}% humidity, 💨{wind}m/s wind", True
+    return f"❌ Couldn't find weather for {city}. Try another city.", False
+
+def fetch_weather(city):
+    """
+    Calls OpenWeatherMap. Returns (message, cacheable).
+    """
+    url, params = weather_request(city)
+    send = lambda: http_pool.get(url, params=params, timeout=current_app.config['WEATHER_API_TIMEOUT'])
+    with rate_limiter['weather'].request(send) as response:
+        return format_weather(city, response.json())
+
+def remember_weather(city, message):
+    weather_cache.set(city, message)
+    weather_fallback.set(city, message)
+
+def degraded_weather(city, error):
+    """
+    The answer while the weather breaker is open: the last reading for the
+    city if we still have one, otherwise a notice to try again.
+    """
+    stale = weather_fallback.get(city)
+    if stale is not None:
+        return f"{stale} (last known reading; live weather is unavailable right now)"
+    return f"⚠️ {error}"
 
 def get_weather(city="Chennai"):
     try:
-        api_key = app.config['WEATHER_API_KEY']
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        if data['cod'] == 200:
-            temp = data['main']['temp']
-            description = data['weather'][0]['description']
-            humidity = data['main']['humidity']
-            wind = data['wind']['speed']
-            return f"🌤️ {city.title()}: {temp}°C, {description}, 💧{humidity}% humidity, 💨{wind}m/s wind"
-        else:
-            return f"❌ Couldn't find weather for {city}. Try another city."
+        city = normalize_city(city)
+        cached = weather_cache.get(city)
+        if cached is not None:
+            return cached
+
+        def load():
+            message, cacheable = fetch_weather(city)
+            if cacheable:
+                remember_weather(city, message)
+            return message
+
+        # Concurrent misses for the same city share one upstream call
+        return weather_flights.do(city, load)
+    except CircuitOpen as e:
+        return degraded_weather(city, e)
     except Exception as e:
         logger.error(f"Weather API error: {e}")
         return f"⚠️ Weather service unavailable. Error: {str(e)}"
@@ -220,30 +342,54 @@ def handle_reminder(user_input):
     try:
         task, time_phrase = parse_reminder_text(user_input)
         user_id = session.get('user_id', 'anonymous')
+        tz_name = current_app.config['DEFAULT_TIMEZONE']
+        due_at = resolve_time_phrase(time_phrase, datetime.now(ZoneInfo(tz_name)))
         new_reminder = Reminder(
             task=task,
             time_phrase=time_phrase,
-            created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            created_at=datetime.now(),
             completed=False,
-            user_id=user_id
+            user_id=user_id,
+            due_at=to_utc_naive(due_at),
+            timezone=tz_name
         )
         db.session.add(new_reminder)
-        db.session.commit()
-        calendar_result = create_calendar_event(task, time_phrase)
+        if 'google_credentials' in session and session.get('user_id'):
+            # Calendar insert happens on the sync worker, not on this request
+            db.session.flush()
+            enqueue_calendar_event(new_reminder, session['google_credentials'])
+            calendar_result = "📅 Syncing to Google Calendar..."
+        else:
+            calendar_result = "🔒 <a href='/login' style='color: #007bff;'>Sign in with Google</a> to enable calendar integration"
+        with metrics.span('db.commit'):
+            db.session.commit()
+        calendar_sync.notify()
         response_text = f"""
 🎯 **Reminder Created Successfully!**
 
 📋 **Task:** {task}
-⏰ **Time:** {time_phrase}
+⏰ **Time:** {time_phrase} ({due_at.strftime('%a %d %b, %I:%M %p')})
 📅 **Status:** {calendar_result}
 
 💡 All reminders are stored in your session
 """
-        return {
+        result = {
             'status': 'success',
             'response': response_text,
-            'reminders': [{'id': r.id, 'task': r.task, 'time_phrase': r.time_phrase, 'created_at': r.created_at, 'completed': r.completed} for r in Reminder.query.filter_by(user_id=user_id).all()]
+            'reminder': new_reminder.to_dict(),
+            'reminders_cursor': encode_cursor('created', new_reminder)
         }
+        # Clients holding a cursor get everything they have not seen yet, not the whole list
+        since = (request.get_json(silent=True) or {}).get('reminders_since')
+        if since:
+            try:
+                delta = reminders_since(user_id, since, current_app.config['REMINDERS_PAGE_MAX'])
+                result['reminders'] = [r.to_dict() for r in delta]
+                if delta:
+                    result['reminders_cursor'] = encode_cursor('created', delta[-1])
+            except ValueError as e:
+                logger.warning(f"Ignoring reminders_since: {e}")
+        return result
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error creating reminder: {e}")
@@ -292,6 +438,61 @@ def handle_email(user_input):
             'response': f"❌ Email error: {str(e)}"
         }
 
+GMAIL_BATCH_LIMIT = 100  # Gmail accepts at most 100 calls per batch request
+
+def list_message_ids(service, query, limit, page_size, num_retries=0):
+    """
+    Pages through messages.list until `limit` message ids are collected.
+    """
+    message_ids = []
+    page_token = None
+    while len(message_ids) < limit:
+        page_request = service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=min(page_size, limit - len(message_ids)),
+            pageToken=page_token,
+            fields='messages/id,nextPageToken'
+        )
+        with rate_limiter['google'].slot():
+            results = page_request.execute(num_retries=num_retries)
+        message_ids.extend(msg['id'] for msg in results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    return message_ids[:limit]
+
+def fetch_subjects(service, message_ids):
+    """
+    Fetches only the Subject header of each message, using one batch
+    request per GMAIL_BATCH_LIMIT messages instead of one call per message.
+    """
+    subjects = {}
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            logger.error(f"Gmail batch error for message {request_id}: {exception}")
+            return
+        headers = response.get('payload', {}).get('headers', [])
+        subjects[request_id] = next((header['value'] for header in headers if header['name'] == 'Subject'), 'No Subject')
+
+    for start in range(0, len(message_ids), GMAIL_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=collect)
+        for message_id in message_ids[start:start + GMAIL_BATCH_LIMIT]:
+            batch.add(
+                service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='metadata',
+                    metadataHeaders=['Subject'],
+                    fields='payload/headers'
+                ),
+                request_id=message_id
+            )
+        with rate_limiter['google'].slot():
+            batch.execute()
+    return [subjects.get(message_id, 'No Subject') for message_id in message_ids]
+
 def handle_email_sorting(user_input):
     try:
         service = authenticate_gmail()
@@ -310,18 +511,17 @@ def handle_email_sorting(user_input):
         else:
             label = 'INBOX'
         query = f"from:me label:{label}"
-        results = service.users().messages().list(userId='me', q=query, maxResults=5).execute()
-        messages = results.get('messages', [])
-        if not messages:
+        message_ids = list_message_ids(
+            service, query, current_app.config['EMAIL_SORT_MAX_RESULTS'], current_app.config['GMAIL_LIST_PAGE_SIZE'],
+            current_app.config['GOOGLE_API_RETRIES']
+        )
+        if not message_ids:
             return {
                 'status': 'success',
                 'response': f"No emails found in {label}."
             }
-        response_text = f"📧 Found {len(messages)} emails in {label}:\n"
-        for msg in messages:
-            msg_data = service.users().messages().get(userId='me', id=msg['id']).execute()
-            headers = msg_data['payload']['headers']
-            subject = next((header['value'] for header in headers if header['name'] == 'Subject'), 'No Subject')
+        response_text = f"📧 Found {len(message_ids)} emails in {label}:\n"
+        for subject in fetch_subjects(service, message_ids):
             response_text += f"- {subject}\n"
         return {
             'status': 'success',
@@ -393,22 +593,25 @@ def handle_schedule(user_input):
             'response': f"❌ Scheduling error: {str(e)}"
         }
 
+def weather_city(user_input):
+    city = "Chennai"
+    if " in " in user_input.lower():
+        parts = user_input.lower().split(" in ")
+        if len(parts) > 1:
+            city = parts[1].strip()
+    elif " for " in user_input.lower():
+        parts = user_input.lower().split(" for ")
+        if len(parts) > 1:
+            city = parts[1].strip()
+    elif " of " in user_input.lower():
+        parts = user_input.lower().split(" of ")
+        if len(parts) > 1:
+            city = parts[1].strip()
+    return city
+
 def handle_weather(user_input):
     try:
-        city = "Chennai"
-        if " in " in user_input.lower():
-            parts = user_input.lower().split(" in ")
-            if len(parts) > 1:
-                city = parts[1].strip()
-        elif " for " in user_input.lower():
-            parts = user_input.lower().split(" for ")
-            if len(parts) > 1:
-                city = parts[1].strip()
-        elif " of " in user_input.lower():
-            parts = user_input.lower().split(" of ")
-            if len(parts) > 1:
-                city = parts[1].strip()
-        weather_info = get_weather(city)
+        weather_info = get_weather(weather_city(user_input))
         return {
             'status': 'success', 
             'response': weather_info
@@ -474,72 +677,171 @@ def format_ai_output(text):
     formatted = text.strip()
     return f"<pre style='white-space: pre-wrap; font-family: monospace;'>{formatted}</pre>"
 
-@app.route("/ask", methods=["POST"])
+def sdk_stream(prompt):
+    """
+    Text chunks from the Gemini SDK, holding a Gemini slot until the stream
+    ends. The model is resolved first, so a missing API key is not counted
+    against Gemini.
+    """
+    model = get_gemini_model()
+    with rate_limiter['gemini'].slot():
+        for chunk in model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+@bp.route("/ask", methods=["POST"])
 def ask():
     try:
         user_input = request.json.get("question")
         if not user_input:
             return jsonify({"error": "❌ No question provided"}), 400
 
-        # Get response from Gemini
-        response = gemini_model.generate_content(user_input)
+        cached = ai_cache.get(user_input)
+
+        if wants_stream(request.json):
+            if cached is not None:
+                return sse_response(iter([cached]), question=user_input, cached=True)
+            # Stream Gemini chunks to the client as they are generated
+            return sse_response(cache_stream(user_input, sdk_stream(user_input)), question=user_input, cached=False)
+
+        if cached is None:
+            # Get response from Gemini
+            model = get_gemini_model()
+            with rate_limiter['gemini'].slot():
+                response = model.generate_content(user_input)
+            ai_cache.set(user_input, response.text)
+            answer = response.text
+        else:
+            answer = cached
 
         # Format response neatly
-        formatted_output = format_response(user_input, response.text)
+        formatted_output = format_response(user_input, answer)
 
-        return jsonify({"response": formatted_output})
+        return jsonify({"response": formatted_output, "cached": cached is not None})
 
+    except CircuitOpen as e:
+        # Fail fast while Gemini is down; cached answers were served above
+        return jsonify({"error": f"⚠️ {e}", "degraded": True}), 503, {'Retry-After': str(math.ceil(e.retry_in))}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def handle_command(user_input):
+def handle_ai_chat(user_input, label, stream=False):
+    api_key = os.getenv("GEMINI_API_KEY")
+    if stream:
+        # process_command turns the chunk generator into an event stream
+        cached = ai_cache.get(user_input)
+        return {
+            'status': 'success',
+            'label': label,
+            'cached': cached is not None,
+            'stream': iter([cached]) if cached is not None else stream_ai_response(user_input, api_key)
+        }
+    ai_response, cached = cached_ai_response(user_input, api_key)
+    return {
+        'status': 'success',
+        'response': format_ai_output(f"{label}:\n{ai_response}"),
+        'cached': cached
+    }
+
+def handle_email_command(user_input):
+    if 'sort' in user_input.lower():
+        return handle_email_sorting(user_input)
+    return handle_email(user_input)
+
+# Pieces that open a question ("what's the weather ...") are never part of a reminder's task
+QUESTION_RE = re.compile(r"\s*(?:what|what['’]?s|how|when|where|why|who|which|is|are|will|can|could|should|do|does)\b", re.IGNORECASE)
+
+def reminder_continues(command, piece):
+    """
+    In "remind me to email the landlord and plan the move at 5 pm" the time
+    at the end belongs to the reminder, so a reminder with no time of its
+    own keeps the next piece that has one, unless that piece is a question.
+    """
+    return not has_time_phrase(command) and has_time_phrase(piece) and not QUESTION_RE.match(piece)
+
+AI_LABELS = {'ai_chat': "🤖 Gemini AI", 'fallback': "🤖 Principal AI"}
+
+# Intents are matched as whole words; earlier registrations win ties
+intent_router = IntentRouter()
+intent_router.register('help', ['help', 'what can you do', 'commands'], lambda user_input: handle_help())
+intent_router.register('reminder', ['remind', 'reminder', 'remember', 'notify', "don't forget"], handle_reminder, continues=reminder_continues)
+intent_router.register('email', ['email', 'mail', 'gmail'], handle_email_command)
+intent_router.register('resources', ['suggest', 'suggestion', 'resource', 'recommend', 'recommendation'], handle_resource_suggestion)
+intent_router.register('schedule', ['schedule', 'scheduling', 'meeting', 'appointment', 'calendar', 'plan', 'planning'], handle_schedule)
+intent_router.register('weather', ['weather', 'temperature', 'forecast', 'rain', 'raining', 'rainy', 'sunny'], handle_weather)
+intent_router.register(
+    'ai_chat', ['ai', 'gemini', 'chat', 'ask'],
+    lambda user_input, stream=False: handle_ai_chat(user_input, AI_LABELS['ai_chat'], stream),
+    streaming=True
+)
+# Default: pass to Gemini AI
+intent_router.set_default(
+    'fallback',
+    lambda user_input, stream=False: handle_ai_chat(user_input, AI_LABELS['fallback'], stream),
+    streaming=True
+)
+
+def split_command(user_input):
+    if not current_app.config['COMPOUND_COMMANDS_ENABLED']:
+        return [(None, user_input)]
+    return intent_router.split(user_input, current_app.config['COMPOUND_MAX_PARTS'])
+
+def handle_compound(parts):
+    """
+    Runs the parts of a compound command concurrently and merges their
+    responses in the order they were typed, so the command takes about as
+    long as its slowest part. Each part runs in a copy of the request
+    context, so handlers still see the session; the copy pushes its own app
+    context, so each part also gets its own database session. The request's
+    log fields and trace are handed over explicitly so records and spans
+    stay tied to the request.
+    """
+    log_fields = current_log_context()
+    trace = metrics.current_trace()
+
+    def run_part(command):
+        # Pool threads keep their context between tasks; start from the request's
+        clear_log_context()
+        bind_log_context(**log_fields)
+        metrics.resume_trace(trace)
+        try:
+            return intent_router.dispatch(command)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in compound command part '{command}': {e}")
+            return {'status': 'error', 'response': f"❌ Unexpected error: {str(e)}"}
+        finally:
+            clear_log_context()
+            metrics.resume_trace(None)
+
+    compound_executor = current_app.extensions['compound_executor']
+    futures = [compound_executor.submit(copy_current_request_context(run_part), command) for _, command in parts]
+    results = [{'intent': intent, 'command': command, **future.result()} for (intent, command), future in zip(parts, futures)]
+    merged = {
+        'status': 'success' if any(result['status'] == 'success' for result in results) else 'error',
+        'response': '\n\n'.join(result['response'] for result in results),
+        'parts': results
+    }
+    # Keep extras such as the new reminder's cursor at the top level for the client
+    for result in results:
+        for key, value in result.items():
+            if key not in ('intent', 'command', 'status', 'response'):
+                merged.setdefault(key, value)
+    return merged
+
+def handle_command(user_input, stream=False):
     if not user_input.strip():
         return {
             'status': 'error',
             'response': "Please type a command. Say 'help' to see what I can do!"
         }
 
-    user_id = session.get('user_id', 'anonymous')
-    command_history = CommandHistory(
-        command=user_input,
-        timestamp=datetime.now().strftime("%H:%M:%S"),
-        user_id=user_id
-    )
-    db.session.add(command_history)
-    db.session.commit()
+    history_recorder.record(user_input, session.get('user_id', 'anonymous'))
 
-    user_input_lower = user_input.lower()
     try:
-        if any(word in user_input_lower for word in ['help', 'what can you do', 'commands']):
-            return handle_help()
-        elif any(word in user_input_lower for word in ['remind', 'remember', 'notify', 'don\'t forget']):
-            return handle_reminder(user_input)
-        elif any(word in user_input_lower for word in ['email', 'mail', 'gmail']):
-            if 'sort' in user_input_lower:
-                return handle_email_sorting(user_input)
-            return handle_email(user_input)
-        elif any(word in user_input_lower for word in ['suggest', 'resources', 'recommend']):
-            return handle_resource_suggestion(user_input)
-        elif any(word in user_input_lower for word in ['schedule', 'meeting', 'appointment', 'calendar', 'plan']):
-            return handle_schedule(user_input)
-        elif any(word in user_input_lower for word in ['weather', 'temperature', 'forecast', 'rain', 'sunny']):
-            return handle_weather(user_input)
-        elif any(word in user_input_lower for word in ['ai', 'gemini', 'chat', 'ask']):
-            # AI chat integration
-            api_key = os.getenv("GEMINI_API_KEY")
-            ai_response = generate_ai_response(user_input, api_key)
-            return {
-                'status': 'success',
-                'response': format_ai_output(f"🤖 Gemini AI:\n{ai_response}")
-            }
-        else:
-            # Default: pass to Gemini AI
-            api_key = os.getenv("GEMINI_API_KEY")
-            ai_response = generate_ai_response(user_input, api_key)
-            return {
-                'status': 'success',
-                'response': format_ai_output(f"🤖 Principal AI:\n{ai_response}")
-            }
+        parts = split_command(user_input)
+        if len(parts) > 1:
+            return handle_compound(parts)
+        return intent_router.dispatch(user_input, stream=stream)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error in handle_command: {e}")
@@ -548,21 +850,42 @@ def handle_command(user_input):
             'response': f"❌ Unexpected error: {str(e)}"
         }
 
-@app.route('/')
+@bp.before_app_request
+def start_request():
+    g.request_started = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    clear_log_context()
+    bind_log_context(request_id=g.request_id)
+    if request.endpoint != 'static':
+        bind_log_context(user_id=session.get('user_id', 'anonymous'))
+        metrics.start_request(g.request_id, request.method, request.path, force_trace=request.headers.get('X-Trace') == '1')
+
+@bp.after_app_request
+def finish_request(response):
+    response.headers['X-Request-ID'] = g.request_id
+    if request.endpoint != 'static':
+        elapsed = time.perf_counter() - g.request_started
+        metrics.finish_request(request.endpoint, request.method, response.status_code, elapsed)
+        logger.info("Request completed", extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': round(elapsed * 1000, 1)
+        })
+    return response
+
+@bp.teardown_app_request
+def clear_request_context(exc):
+    clear_log_context()
+
+@bp.route('/')
 def home():
     return render_template('index.html')
 
-@app.route('/login')
+@bp.route('/login')
 def login():
     try:
-        flow = Flow.from_client_secrets_file(
-            'credentials.json',
-            scopes=[
-                'https://www.googleapis.com/auth/calendar.events',
-                'https://www.googleapis.com/auth/gmail.modify'
-            ],
-            redirect_uri='http://localhost:5000/oauth2callback'
-        )
+        flow = client_secrets_flow(redirect_uri='http://localhost:5000/oauth2callback')
         authorization_url, state = flow.authorization_url(
             access_type='offline',
             include_granted_scopes='true'
@@ -573,46 +896,43 @@ def login():
         logger.error(f"Login error: {e}")
         return jsonify({'status': 'error', 'response': f"Login failed: {str(e)}"})
 
-@app.route('/oauth2callback')
+@bp.route('/oauth2callback')
 def oauth2callback():
     try:
         state = session.get('state')
-        flow = Flow.from_client_secrets_file(
-            'credentials.json',
-            scopes=[
-                'https://www.googleapis.com/auth/calendar.events',
-                'https://www.googleapis.com/auth/gmail.modify'
-            ],
-            redirect_uri='http://localhost:5000/oauth2callback',
-            state=state
-        )
+        flow = client_secrets_flow(redirect_uri='http://localhost:5000/oauth2callback', state=state)
         flow.fetch_token(authorization_response=request.url)
         credentials = flow.credentials
         session['google_credentials'] = credentials_to_dict(credentials)
         session.permanent = True
         # Optionally fetch user info
         try:
-            user_info_service = build('oauth2', 'v2', credentials=credentials)
-            user_info = user_info_service.userinfo().get().execute()
+            user_info_service = google_services.service('oauth2', 'v2', credentials)
+            with rate_limiter['google'].slot():
+                user_info = user_info_service.userinfo().get().execute(num_retries=current_app.config['GOOGLE_API_RETRIES'])
             session['user_id'] = user_info.get('id')
             session['user_email'] = user_info.get('email')
         except Exception:
             pass
-        return redirect(url_for('dashboard'))
+        if session.get('user_id'):
+            # The calendar sync worker delivers with the stored copy
+            save_google_credentials(session['user_id'], session['google_credentials'])
+            db.session.commit()
+        return redirect(url_for('assistant.dashboard'))
     except Exception as e:
         logger.error(f"OAuth2 callback error: {e}")
         return jsonify({'status': 'error', 'response': f"Authentication failed: {str(e)}"})
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('home'))
+    return redirect(url_for('assistant.home'))
 
-@app.route('/setup')
+@bp.route('/setup')
 def setup():
     return render_template('setup.html')
 
-@app.route('/test-calendar')
+@bp.route('/test-calendar')
 def test_calendar():
     try:
         service = authenticate_google_calendar()
@@ -624,16 +944,17 @@ def test_calendar():
         event = {
             'summary': 'Test Event from AI Assistant',
             'start': {
-                'dateTime': (datetime.now() + rd.relativedelta(hours=1)).isoformat(),
+                'dateTime': (datetime.now() + timedelta(hours=1)).isoformat(),
                 'timeZone': 'Asia/Kolkata',
             },
             'end': {
-                'dateTime': (datetime.now() + rd.relativedelta(hours=2)).isoformat(),
+                'dateTime': (datetime.now() + timedelta(hours=2)).isoformat(),
                 'timeZone': 'Asia/Kolkata',
             },
             'description': 'This is a test event created to verify Google Calendar integration.'
         }
-        event = service.events().insert(calendarId='primary', body=event).execute()
+        with rate_limiter['google'].slot():
+            event = service.events().insert(calendarId='primary', body=event).execute(num_retries=current_app.config['GOOGLE_API_RETRIES'])
         return jsonify({
             'status': 'success',
             'response': f"✅ Test calendar event created! <a href='{event.get('htmlLink')}' target='_blank' style='color: #007bff;'>View in Calendar</a>"
@@ -645,39 +966,73 @@ def test_calendar():
             'response': f"❌ Test calendar error: {str(e)}"
         })
 
-@app.route('/dashboard')
+def current_user_stats(user_id):
+    # Commands still waiting in the history buffer are counted without writing them here
+    now = datetime.now(ZoneInfo(current_app.config['DEFAULT_TIMEZONE']))
+    day_start, day_end = local_day_bounds(now)
+    stats = user_stats(user_id, to_utc_naive(now), day_start, day_end)
+    stats['total_commands'] += len(history_recorder.pending(user_id))
+    return stats
+
+@bp.route('/dashboard')
 def dashboard():
     user_id = session.get('user_id', 'anonymous')
-    stats = {
-        'total_reminders': Reminder.query.filter_by(user_id=user_id).count(),
-        'completed_reminders': Reminder.query.filter_by(user_id=user_id, completed=True).count(),
-        'today_reminders': Reminder.query.filter_by(user_id=user_id).filter(Reminder.time_phrase.ilike('%today%')).count(),
-        'total_commands': CommandHistory.query.filter_by(user_id=user_id).count(),
+    stats = current_user_stats(user_id)
+    stats.update({
         'active_since': datetime.now().strftime("%Y-%m-%d %H:%M"),
         'google_connected': 'google_credentials' in session
-    }
-    reminders = Reminder.query.filter_by(user_id=user_id).all()
+    })
+    cursor = request.args.get('cursor')
+    try:
+        reminders, next_cursor = reminders_page(user_id, 'due', cursor, current_app.config['REMINDERS_PAGE_SIZE'], open_only=True)
+    except ValueError:
+        cursor = None
+        reminders, next_cursor = reminders_page(user_id, 'due', None, current_app.config['REMINDERS_PAGE_SIZE'], open_only=True)
     history = CommandHistory.query.filter_by(user_id=user_id).order_by(CommandHistory.timestamp.desc()).limit(10).all()
-    return render_template('dashboard.html', stats=stats, reminders=reminders, history=history)
+    # Newest first, including commands the history buffer has not written yet
+    history = (history_recorder.pending(user_id)[::-1] + history)[:10]
+    return render_template('dashboard.html', stats=stats, reminders=reminders, history=history, cursor=cursor, next_cursor=next_cursor)
 
-@app.route('/status')
+@bp.route('/status')
 def status_check():
     user_id = session.get('user_id', 'anonymous')
+    stats = current_user_stats(user_id)
     status = {
         'google_connected': 'google_credentials' in session,
-        'total_reminders': Reminder.query.filter_by(user_id=user_id).count(),
-        'total_commands': CommandHistory.query.filter_by(user_id=user_id).count(),
-        'weather_api': 'active' if app.config.get('WEATHER_API_KEY') else 'inactive',
+        'total_reminders': stats['total_reminders'],
+        'total_commands': stats['total_commands'],
+        'weather_api': 'active' if current_app.config.get('WEATHER_API_KEY') else 'inactive',
+        'http_pools': http_pool.stats.snapshot(),
+        'ai_cache': ai_cache.stats(),
+        'weather_cache': {'entries': len(weather_cache), 'coalesced': weather_flights.coalesced + async_weather_flights.coalesced},
+        'intents': intent_router.stats(),
+        'command_history': history_recorder.stats(),
+        'upstream_limits': rate_limiter.stats(),
+        'circuit_breakers': rate_limiter.breaker_stats(),
+        'logging': logging_stats(),
+        'latency': metrics.latency_summary(),
         'app_version': '1.0.0',
-        'environment': app.config['ENV']
+        'environment': current_app.config['ENV']
     }
     return jsonify(status)
 
-@app.route('/api/process_command', methods=['POST'])
+@bp.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/metrics/traces')
+def recent_traces():
+    """Sampled request traces, newest first; send X-Trace: 1 to trace a request."""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    return jsonify({'traces': metrics.recent_traces(limit)})
+
+@bp.route('/api/process_command', methods=['POST'])
 def process_command():
     try:
         user_input = request.json.get('command', '')
-        result = handle_command(user_input)
+        result = handle_command(user_input, stream=wants_stream(request.json))
+        if 'stream' in result:
+            return sse_response(result['stream'], label=result['label'], cached=result['cached'])
         return jsonify(result)
     except Exception as e:
         db.session.rollback()
@@ -687,5 +1042,58 @@ def process_command():
             'response': f"❌ Server error: {str(e)}"
         })
 
+@bp.route('/api/reminders')
+def list_reminders():
+    """
+    Keyset-paginated reminders for the current user.
+    ?cursor= continues a listing (order=created newest first, or order=due
+    soonest first); ?since= returns reminders created after that cursor.
+    """
+    user_id = session.get('user_id', 'anonymous')
+    limit = request.args.get('limit', current_app.config['REMINDERS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['REMINDERS_PAGE_MAX']))
+    order = request.args.get('order', 'created')
+    if order not in REMINDER_ORDERS:
+        return jsonify({'status': 'error', 'response': f"Unknown order '{order}'"}), 400
+    try:
+        since = request.args.get('since')
+        if since:
+            reminders = reminders_since(user_id, since, limit)
+            next_cursor = encode_cursor('created', reminders[-1]) if reminders else since
+        else:
+            reminders, next_cursor = reminders_page(
+                user_id, order, request.args.get('cursor'), limit,
+                open_only=request.args.get('status') == 'open'
+            )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'response': str(e)}), 400
+    return jsonify({
+        'status': 'success',
+        'reminders': [r.to_dict() for r in reminders],
+        'next_cursor': next_cursor
+    })
+
+def create_app(config_object=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    setup_logging(app.config)
+    init_db(app)
+    init_metrics(app)
+    init_session_store(app)
+    init_http_client(app)
+    init_cache(app)
+    init_google_services(app)
+    init_calendar_sync(app)
+    init_history_recorder(app)
+    init_rate_limiter(app)
+    # Shared by every request, so compound commands can't multiply threads without bound
+    app.extensions['compound_executor'] = ThreadPoolExecutor(
+        max_workers=app.config['COMPOUND_MAX_WORKERS'], thread_name_prefix='compound'
+    )
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
\ No newline at end of file
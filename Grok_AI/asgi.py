@@ -0,0 +1,361 @@
+"""
+ASGI serving mode. /api/process_command (weather and Gemini intents) and
+/ask run as coroutines on httpx.AsyncClient, so one process keeps hundreds
+of slow upstream calls in flight without a thread each. Every other
+request, and every other intent, runs on the Flask app in a bounded thread
+pool.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import httpx
+from flask import session
+from app import (
+	app as flask_app, GOOGLE_API_KEY, MISSING_GOOGLE_API_KEY, AI_LABELS, intent_router, history_recorder, split_command,
+	gemini_request, extract_candidate_text, format_response, format_ai_output,
+	normalize_city, weather_city, weather_request, format_weather, remember_weather, degraded_weather, sse_event
+)
+from caching import ai_cache, weather_cache, async_weather_flights
+from http_client import async_http
+from logging_config import bind_log_context, clear_log_context
+from metrics import metrics
+from rate_limit import rate_limiter, RateLimitExceeded
+from circuit_breaker import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+def build_environ(scope, body):
+	"""WSGI environ for an ASGI HTTP scope and its (already read) body."""
+	environ = {
+		'REQUEST_METHOD': scope['method'],
+		'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+		'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+		'QUERY_STRING': scope['query_string'].decode('ascii'),
+		'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+		'SERVER_NAME': scope['server'][0] if scope.get('server') else 'localhost',
+		'SERVER_PORT': str(scope['server'][1]) if scope.get('server') else '80',
+		'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+		'CONTENT_LENGTH': str(len(body)),
+		'wsgi.version': (1, 0),
+		'wsgi.url_scheme': scope.get('scheme', 'http'),
+		'wsgi.input': BytesIO(body),
+		'wsgi.errors': sys.stderr,
+		'wsgi.multithread': True,
+		'wsgi.multiprocess': True,
+		'wsgi.run_once': False
+	}
+	for name, value in scope.get('headers', []):
+		name = name.decode('latin1').upper().replace('-', '_')
+		if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+			name = f'HTTP_{name}'
+		value = value.decode('latin1')
+		environ[name] = f"{environ[name]},{value}" if name in environ and name.startswith('HTTP_') else value
+	return environ
+
+class WsgiBridge:
+	"""
+	Runs the Flask app for one request on a thread pool and relays the
+	response. Responses are buffered; the streaming endpoints are served
+	natively instead.
+	"""
+	def __init__(self, wsgi_app, max_workers):
+		self.wsgi_app = wsgi_app
+		self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+
+	async def run(self, fn, *args):
+		return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+	async def __call__(self, scope, body, send):
+		status, headers, content = await self.run(self._call_app, build_environ(scope, body))
+		await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+		await send({'type': 'http.response.body', 'body': content})
+
+	def _call_app(self, environ):
+		started = {}
+
+		def start_response(status, headers, exc_info=None):
+			started['status'] = int(status.split(' ', 1)[0])
+			started['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+		result = self.wsgi_app(environ, start_response)
+		try:
+			content = b''.join(result)
+		finally:
+			if hasattr(result, 'close'):
+				result.close()
+		return started['status'], started['headers'], content
+
+wsgi = WsgiBridge(flask_app.wsgi_app, flask_app.config['ASGI_WSGI_THREADS'])
+
+async def gemini_generate(prompt, api_key, attempts=3):
+	"""A generateContent call, retried when throttled; successful answers are cached. Raises on HTTP errors."""
+	headers, data = gemini_request(prompt, api_key)
+	url = f"{flask_app.config['GEMINI_API_URL']}:generateContent"
+	async with rate_limiter['gemini'].async_request(lambda: async_http.client.post(url, headers=headers, content=data), attempts=attempts) as response:
+		response.raise_for_status()
+		text = extract_candidate_text(response.json())
+	if text is not None:
+		ai_cache.set(prompt, text)
+	return text
+
+async def generate_ai_response(prompt, api_key, retries=3):
+	"""Coroutine version of app.generate_ai_response, with the same error messages."""
+	if not api_key:
+		return "Error: Gemini API key is missing."
+	try:
+		text = await gemini_generate(prompt, api_key, attempts=retries)
+	except CircuitOpen as e:
+		return f"⚠️ {e}"
+	except RateLimitExceeded as e:
+		return f"⏳ {e}"
+	except httpx.TimeoutException:
+		return "❌ Failed after multiple attempts due to timeout or network issues."
+	except httpx.HTTPError as e:
+		return f"Error: API request failed. Details: {e}"
+	if text is not None:
+		return text
+	return "Error: Could not extract text from the API response."
+
+async def stream_ai_response(prompt, api_key):
+	"""Coroutine version of app.stream_ai_response: yields text chunks as Gemini sends them."""
+	if not api_key:
+		yield "Error: Gemini API key is missing."
+		return
+
+	url = f"{flask_app.config['GEMINI_API_URL']}:streamGenerateContent?alt=sse"
+	headers, data = gemini_request(prompt, api_key)
+	client = async_http.client
+	send = lambda: client.send(client.build_request('POST', url, headers=headers, content=data), stream=True)
+	try:
+		parts = []
+		async with rate_limiter['gemini'].async_request(send) as response:
+			response.raise_for_status()
+			async for line in response.aiter_lines():
+				if not line.startswith('data:'):
+					continue
+				text = extract_candidate_text(json.loads(line[len('data:'):]))
+				if text:
+					parts.append(text)
+					yield text
+		ai_cache.set(prompt, ''.join(parts))
+	except CircuitOpen as e:
+		yield f"⚠️ {e}"
+	except RateLimitExceeded as e:
+		yield f"⏳ {e}"
+	except httpx.TimeoutException:
+		yield "❌ The AI response timed out. Please try again."
+	except httpx.HTTPError as e:
+		yield f"Error: API request failed. Details: {e}"
+
+async def single_chunk(text):
+	yield text
+
+async def get_weather(city="Chennai"):
+	try:
+		city = normalize_city(city)
+		cached = weather_cache.get(city)
+		if cached is not None:
+			return cached
+
+		async def load():
+			url, params = weather_request(city)
+			send = lambda: async_http.client.get(url, params=params, timeout=flask_app.config['WEATHER_API_TIMEOUT'])
+			async with rate_limiter['weather'].async_request(send) as response:
+				message, cacheable = format_weather(city, response.json())
+			if cacheable:
+				remember_weather(city, message)
+			return message
+
+		return await async_weather_flights.do(city, load)
+	except CircuitOpen as e:
+		return degraded_weather(city, e)
+	except Exception as e:
+		logger.error(f"Weather API error: {e}")
+		return f"⚠️ Weather service unavailable. Error: {str(e)}"
+
+async def handle_weather(user_input, stream=False):
+	return {'status': 'success', 'response': await get_weather(weather_city(user_input))}
+
+def ai_chat_handler(label):
+	async def handle_ai_chat(user_input, stream=False):
+		api_key = os.getenv("GEMINI_API_KEY")
+		cached = ai_cache.get(user_input)
+		if stream:
+			return {
+				'status': 'success',
+				'label': label,
+				'cached': cached is not None,
+				'stream': single_chunk(cached) if cached is not None else stream_ai_response(user_input, api_key)
+			}
+		ai_response = cached if cached is not None else await generate_ai_response(user_input, api_key)
+		return {
+			'status': 'success',
+			'response': format_ai_output(f"{label}:\n{ai_response}"),
+			'cached': cached is not None
+		}
+	return handle_ai_chat
+
+# Intents served as coroutines; the rest go through the Flask handlers
+ASYNC_INTENTS = {
+	'weather': handle_weather,
+	'ai_chat': ai_chat_handler(AI_LABELS['ai_chat']),
+	'fallback': ai_chat_handler(AI_LABELS['fallback'])
+}
+
+def request_header(scope, name):
+	name = name.encode('latin1')
+	return ', '.join(value.decode('latin1') for key, value in scope.get('headers', []) if key == name)
+
+def wants_stream(payload, scope):
+	return bool(payload.get('stream')) or 'text/event-stream' in request_header(scope, 'accept')
+
+async def send_json(send, data, status=200, headers=()):
+	body = json.dumps(data).encode()
+	await send({
+		'type': 'http.response.start',
+		'status': status,
+		'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + list(headers)
+	})
+	await send({'type': 'http.response.body', 'body': body})
+
+async def send_events(send, chunks, **start_fields):
+	"""Same event sequence as app.sse_response, from an async chunk iterator."""
+	await send({
+		'type': 'http.response.start',
+		'status': 200,
+		'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+	})
+
+	async def event(data, name=None):
+		await send({'type': 'http.response.body', 'body': sse_event(data, event=name).encode(), 'more_body': True})
+
+	await event({'status': 'success', **start_fields}, 'start')
+	try:
+		async for chunk in chunks:
+			await event({'delta': chunk})
+		await event({'status': 'success'}, 'done')
+	except Exception as e:
+		logger.error(f"Streaming error: {e}")
+		await event({'status': 'error', 'response': f"❌ Streaming error: {str(e)}"}, 'error')
+	await send({'type': 'http.response.body', 'body': b''})
+
+def record_command(scope, body, user_input):
+	# The Flask session (for the user id) is only reachable inside a request context
+	with flask_app.request_context(build_environ(scope, body)):
+		history_recorder.record(user_input, session.get('user_id', 'anonymous'))
+
+async def process_command(scope, body, send):
+	try:
+		payload = json.loads(body or b'{}')
+	except ValueError:
+		payload = None
+	user_input = payload.get('command', '') if isinstance(payload, dict) else ''
+	intent = intent_router.classify(user_input, count=False) if user_input.strip() else None
+	# Compound commands fan out on the Flask side
+	if intent not in ASYNC_INTENTS or len(split_command(user_input)) > 1:
+		return await wsgi(scope, body, send)
+	try:
+		await wsgi.run(record_command, scope, body, user_input)
+		intent_router.record(intent)
+		bind_log_context(intent=intent)
+		result = await ASYNC_INTENTS[intent](user_input, stream=wants_stream(payload, scope))
+	except Exception as e:
+		logger.error(f"Server error in process_command: {e}")
+		return await send_json(send, {'status': 'error', 'response': f"❌ Server error: {str(e)}"})
+	if 'stream' in result:
+		return await send_events(send, result['stream'], label=result['label'], cached=result['cached'])
+	await send_json(send, result)
+
+async def ask(scope, body, send):
+	try:
+		payload = json.loads(body or b'{}')
+		user_input = payload.get("question")
+		if not user_input:
+			return await send_json(send, {"error": "❌ No question provided"}, 400)
+
+		cached = ai_cache.get(user_input)
+		if wants_stream(payload, scope):
+			chunks = single_chunk(cached) if cached is not None else stream_ai_response(user_input, GOOGLE_API_KEY)
+			return await send_events(send, chunks, question=user_input, cached=cached is not None)
+
+		if cached is None and not GOOGLE_API_KEY:
+			# Same answer as the Flask route gives
+			return await send_json(send, {"error": MISSING_GOOGLE_API_KEY}, 500)
+		answer = cached if cached is not None else await gemini_generate(user_input, GOOGLE_API_KEY)
+		await send_json(send, {"response": format_response(user_input, answer), "cached": cached is not None})
+	except CircuitOpen as e:
+		await send_json(send, {"error": f"⚠️ {e}", "degraded": True}, 503, [(b'retry-after', str(math.ceil(e.retry_in)).encode())])
+	except Exception as e:
+		await send_json(send, {"error": str(e)}, 500)
+
+ROUTES = {
+	('POST', '/api/process_command'): process_command,
+	('POST', '/ask'): ask
+}
+
+async def read_body(receive):
+	chunks = []
+	while True:
+		message = await receive()
+		chunks.append(message.get('body', b''))
+		if not message.get('more_body'):
+			return b''.join(chunks)
+
+async def lifespan(receive, send):
+	while True:
+		message = await receive()
+		if message['type'] == 'lifespan.startup':
+			await send({'type': 'lifespan.startup.complete'})
+		elif message['type'] == 'lifespan.shutdown':
+			await async_http.aclose()
+			wsgi.executor.shutdown(wait=False)
+			await send({'type': 'lifespan.shutdown.complete'})
+			return
+
+async def application(scope, receive, send):
+	if scope['type'] == 'lifespan':
+		return await lifespan(receive, send)
+	if scope['type'] != 'http':
+		raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+	body = await read_body(receive)
+	handler = ROUTES.get((scope['method'], scope['path']))
+	if handler is None:
+		return await wsgi(scope, body, send)
+
+	# Same request log fields as the Flask hooks in app.py
+	started = time.perf_counter()
+	request_id = request_header(scope, 'x-request-id') or uuid.uuid4().hex
+	status = {}
+
+	async def send_with_request_id(message):
+		if message['type'] == 'http.response.start':
+			status['code'] = message['status']
+			message = {**message, 'headers': [*message.get('headers', []), (b'x-request-id', request_id.encode('latin1'))]}
+		await send(message)
+
+	bind_log_context(request_id=request_id)
+	metrics.start_request(request_id, scope['method'], scope['path'], force_trace=request_header(scope, 'x-trace') == '1')
+	try:
+		# The helpers shared with app.py read their settings through current_app
+		with flask_app.app_context():
+			await handler(scope, body, send_with_request_id)
+		elapsed = time.perf_counter() - started
+		# Labelled like the Flask endpoints they stand in for
+		metrics.finish_request(f"assistant.{handler.__name__}", scope['method'], status.get('code'), elapsed)
+		logger.info("Request completed", extra={
+			'method': scope['method'],
+			'path': scope['path'],
+			'status': status.get('code'),
+			'latency_ms': round(elapsed * 1000, 1)
+		})
+	finally:
+		clear_log_context()
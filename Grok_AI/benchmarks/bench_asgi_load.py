@@ -0,0 +1,154 @@
+"""
+Load test of /api/process_command on Gemini-bound commands: the Flask app
+on a fixed thread pool (the WSGI path, as under gunicorn --threads) against
+the ASGI mode in asgi.py. Both call stub_upstream, in its own process,
+which answers after --latency seconds and reports how many calls it saw in
+flight at once.
+
+    python benchmarks/bench_asgi_load.py [--requests 1000] [--concurrency 200] [--latency 0.5] [--threads 20]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import STUB_ANSWER, StubUpstream, environment
+
+def wsgi_only_app(threads):
+	"""Every request on the Flask app through a thread pool: the current WSGI path."""
+	from asgi import WsgiBridge, flask_app, read_body
+	wsgi = WsgiBridge(flask_app.wsgi_app, threads)
+
+	async def app(scope, receive, send):
+		if scope['type'] == 'http':
+			await wsgi(scope, await read_body(receive), send)
+	return app
+
+def run_server(port, kind, args, env):
+	os.environ.update(env)
+	import uvicorn
+	if kind == 'stub':
+		app = StubUpstream({'latency': args.latency})
+	elif kind == 'wsgi':
+		app = wsgi_only_app(args.threads)
+	else:
+		from asgi import application as app
+	uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning', lifespan='off', backlog=4096)
+
+def start_server(kind, args, env=None):
+	sock = socket.socket()
+	sock.bind(('127.0.0.1', 0))
+	port = sock.getsockname()[1]
+	sock.close()
+	process = multiprocessing.Process(target=run_server, args=(port, kind, args, env or {}), daemon=True)
+	process.start()
+	deadline = time.monotonic() + 60
+	while time.monotonic() < deadline:
+		try:
+			socket.create_connection(('127.0.0.1', port), timeout=1).close()
+			return process, port
+		except OSError:
+			time.sleep(0.1)
+	raise RuntimeError(f"{kind} server did not start")
+
+async def http_call(reader, writer, method, path, payload=None):
+	"""
+	One request on a kept-alive HTTP/1.1 connection. A bare asyncio client
+	keeps the load generator itself from being the bottleneck.
+	"""
+	body = json.dumps(payload).encode() if payload is not None else b''
+	writer.write(
+		f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+		+ body
+	)
+	await writer.drain()
+	head = await reader.readuntil(b'\r\n\r\n')
+	status = int(head.split(b' ', 2)[1])
+	length = next(int(line.split(b':', 1)[1]) for line in head.split(b'\r\n') if line.lower().startswith(b'content-length:'))
+	return status, await reader.readexactly(length)
+
+async def drive(port, requests, concurrency, label):
+	latencies = []
+	errors = 0
+	counter = iter(range(requests))
+
+	async def connection():
+		nonlocal errors
+		reader, writer = await asyncio.open_connection('127.0.0.1', port)
+		for i in counter:
+			start = time.perf_counter()
+			# Unique prompts so the response cache never answers
+			status, body = await http_call(reader, writer, 'POST', '/api/process_command', {'command': f'{label} question number {i}'})
+			latencies.append(time.perf_counter() - start)
+			if status != 200 or STUB_ANSWER.encode() not in body:
+				errors += 1
+		writer.close()
+
+	start = time.perf_counter()
+	await asyncio.gather(*[connection() for _ in range(concurrency)])
+	elapsed = time.perf_counter() - start
+	latencies.sort()
+	return {
+		'rps': requests / elapsed,
+		'p50': statistics.median(latencies) * 1000,
+		'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+		'errors': errors
+	}
+
+async def stub_peak(port):
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	_, body = await http_call(reader, writer, 'GET', '/_stub/stats')
+	writer.close()
+	return json.loads(body)['peak']
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--requests', type=int, default=1000)
+	parser.add_argument('--concurrency', type=int, default=200)
+	parser.add_argument('--latency', type=float, default=0.5, help='seconds the Gemini stub takes to answer')
+	parser.add_argument('--threads', type=int, default=20, help='WSGI worker threads (and ASGI_WSGI_THREADS)')
+	args = parser.parse_args()
+
+	stub, stub_port = start_server('stub', args)
+	tmpdir = tempfile.mkdtemp()
+	env = {
+		**environment(f"http://127.0.0.1:{stub_port}"),
+		'GEMINI_API_KEY': 'bench',
+		'GOOGLE_API_KEY': os.getenv('GOOGLE_API_KEY', 'bench'),
+		'DATABASE_URL': f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+		'CALENDAR_SYNC_ENABLED': 'false',
+		'DATABASE_PROFILE': 'production',
+		'HTTP_POOL_MAXSIZE': str(args.threads),
+		'ASGI_WSGI_THREADS': str(args.threads),
+		'ASYNC_HTTP_MAX_CONNECTIONS': str(max(args.concurrency, 1)),
+		# Measure the serving modes, not the upstream rate limits
+		'GEMINI_RATE_LIMIT': '0',
+		'GEMINI_MAX_IN_FLIGHT': '0'
+	}
+
+	print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency * 1000:.0f} ms, {args.threads} threads")
+	print(f"{'mode':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'upstream in flight':>19}")
+	try:
+		for mode in ['wsgi', 'asgi']:
+			server, port = start_server(mode, args, env)
+			try:
+				result = asyncio.run(drive(port, args.requests, args.concurrency, mode))
+				peak = asyncio.run(stub_peak(stub_port))
+			finally:
+				server.terminate()
+				server.join()
+			print(f"{mode:>6} {result['rps']:>8.1f} {result['p50']:>8.0f} {result['p95']:>8.0f} {result['errors']:>7} {peak:>19}")
+	finally:
+		stub.terminate()
+		stub.join()
+
+if __name__ == '__main__':
+	main()
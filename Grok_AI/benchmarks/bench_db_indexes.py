@@ -0,0 +1,89 @@
+"""
+Per-user reminder and history queries as the tables grow, with the
+composite (user_id, created_at) / (user_id, timestamp) indexes and, for
+comparison, forced full table scans.
+
+    python benchmarks/bench_db_indexes.py [--rows 1000000] [--users 1000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, text
+from config import Config
+from models import db, Reminder, CommandHistory, init_db
+
+QUERIES = {
+	'history': (
+		"SELECT * FROM command_history{hint} WHERE user_id = :user_id ORDER BY timestamp DESC LIMIT 10"
+	),
+	'recent reminders': (
+		"SELECT * FROM reminder{hint} WHERE user_id = :user_id AND created_at >= :since ORDER BY created_at DESC LIMIT 50"
+	)
+}
+
+def populate(start, count, users, epoch):
+	chunk = 50000
+	for offset in range(start, start + count, chunk):
+		size = min(chunk, start + count - offset)
+		moments = [epoch + timedelta(seconds=offset + i) for i in range(size)]
+		owners = [f"user_{random.randrange(users)}" for _ in range(size)]
+		db.session.execute(insert(CommandHistory), [
+			{'command': 'help', 'timestamp': moment, 'user_id': owner} for moment, owner in zip(moments, owners)
+		])
+		db.session.execute(insert(Reminder), [
+			{'task': 'call mom', 'time_phrase': 'at 5 PM', 'created_at': moment, 'user_id': owner, 'completed': False, 'sync_status': 'local'}
+			for moment, owner in zip(moments, owners)
+		])
+		db.session.commit()
+
+def time_query(sql, users, since, queries):
+	start = time.perf_counter()
+	for _ in range(queries):
+		db.session.execute(text(sql), {'user_id': f"user_{random.randrange(users)}", 'since': since}).all()
+	return (time.perf_counter() - start) / queries * 1000
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--rows', type=int, default=1000000, help='rows per table at the last step')
+	parser.add_argument('--users', type=int, default=1000)
+	parser.add_argument('--queries', type=int, default=200, help='queries timed per measurement')
+	parser.add_argument('--scan-queries', type=int, default=5, help='queries timed without indexes')
+	args = parser.parse_args()
+
+	steps = sorted({n for n in (10000, 100000, args.rows) if n <= args.rows})
+	with tempfile.TemporaryDirectory() as tmpdir:
+		app = Flask(__name__)
+		app.config.from_object(Config)
+		app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+		init_db(app)
+		with app.app_context():
+			for name, sql in QUERIES.items():
+				plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql.format(hint='')), {'user_id': 'user_0', 'since': datetime.now()}).all()
+				print(f"{name}: {' / '.join(row[-1] for row in plan)}")
+			print()
+			print(f"{'rows':>10} {'query':>17} {'indexed ms':>11} {'scan ms':>9}")
+
+			epoch = datetime(2025, 1, 1)
+			loaded = 0
+			for rows in steps:
+				populate(loaded, rows - loaded, args.users, epoch)
+				loaded = rows
+				db.session.execute(text('ANALYZE'))
+				since = epoch + timedelta(seconds=rows * 0.9)
+				for name, sql in QUERIES.items():
+					indexed = time_query(sql.format(hint=''), args.users, since, args.queries)
+					scan = time_query(sql.format(hint=' NOT INDEXED'), args.users, since, args.scan_queries)
+					print(f"{rows:>10,} {name:>17} {indexed:>11.3f} {scan:>9.3f}")
+			db.session.remove()
+			db.engine.dispose()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,319 @@
+"""
+Load test of the command API: drives /api/process_command (weather, AI,
+reminder and Gmail commands), /ask, /dashboard and /status at a fixed
+concurrency against the app served by uvicorn, with stub_upstream standing
+in for Gemini, OpenWeatherMap and Google (the Gmail scenario signs in
+through the stub's OAuth endpoints first). --error-rate, --throttle-rate
+and --slow-rate inject upstream faults to see how the tail behaves. Reports requests/s, p50/p95/p99 latency,
+errors and the server's resident memory per scenario, and compares each
+run with the baselines in baselines.json; a regression beyond --tolerance
+exits with status 1. Baselines are machine specific: record them with
+--save-baseline on the box that runs the comparison.
+
+    python benchmarks/bench_load.py [--mode wsgi|asgi] [--requests 500] [--concurrency 20] [--latency 0.05] [--scenario ask] [--slow-rate 0.01] [--save-baseline]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from stub_upstream import STUB_ANSWER, StubUpstream, environment
+
+BASELINES = os.path.join(BENCH_DIR, 'baselines.json')
+
+def json_field(name, value):
+	return lambda body: json.loads(body).get(name) == value
+
+def contains(text):
+	return lambda body: text.encode() in body
+
+# name: (method, path, payload for request i of run `run`, check of the response body)
+SCENARIOS = {
+	'status': ('GET', '/status', None, contains('app_version')),
+	'dashboard': ('GET', '/dashboard', None, contains('<title>Dashboard')),
+	# A few hundred cities: misses reach the stub, repeats come from the weather cache
+	'command-weather': ('POST', '/api/process_command', lambda run, i: {'command': f'weather in city {i % 200}'}, contains('clear sky')),
+	# Unique prompts so the response cache never answers
+	'command-ai': ('POST', '/api/process_command', lambda run, i: {'command': f'tell me a story, run {run} number {i}'}, contains(STUB_ANSWER)),
+	'command-reminder': ('POST', '/api/process_command', lambda run, i: {'command': f'Remind me to water plant {i} at 6 PM'}, json_field('status', 'success')),
+	'command-email': ('POST', '/api/process_command', lambda run, i: {'command': 'sort my important emails'}, contains('Found 5 emails')),
+	'ask': ('POST', '/ask', lambda run, i: {'question': f'What is {run} plus {i}?'}, contains(STUB_ANSWER))
+}
+# Scenarios sent with the session cookie of a Google-connected user
+SIGNED_IN = {'command-email'}
+FAULTS = ('error_rate', 'throttle_rate', 'slow_rate')
+
+def free_port():
+	sock = socket.socket()
+	sock.bind(('127.0.0.1', 0))
+	port = sock.getsockname()[1]
+	sock.close()
+	return port
+
+def run_server(port, kind, args, env):
+	os.environ.update(env)
+	import uvicorn
+	if kind == 'stub':
+		app = StubUpstream({'latency': args.latency, **{fault: getattr(args, fault) for fault in FAULTS}}, seed=0)
+	elif kind == 'wsgi':
+		from asgi import WsgiBridge, flask_app, read_body
+		wsgi = WsgiBridge(flask_app.wsgi_app, args.threads)
+
+		# Every route on the Flask app through a thread pool, as under gunicorn --threads
+		async def app(scope, receive, send):
+			if scope['type'] == 'http':
+				await wsgi(scope, await read_body(receive), send)
+	else:
+		from asgi import application as app
+	uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning', lifespan='off', backlog=4096)
+
+def start_server(kind, args, env=None):
+	port = free_port()
+	process = multiprocessing.Process(target=run_server, args=(port, kind, args, env or {}), daemon=True)
+	process.start()
+	deadline = time.monotonic() + 60
+	while time.monotonic() < deadline:
+		try:
+			socket.create_connection(('127.0.0.1', port), timeout=1).close()
+			return process, port
+		except OSError:
+			time.sleep(0.1)
+	raise RuntimeError(f"{kind} server did not start")
+
+def stop_server(process):
+	process.terminate()
+	process.join()
+
+def memory(pid):
+	"""Resident and peak resident memory of a process, in MB, from /proc (Linux only)."""
+	values = {}
+	try:
+		with open(f'/proc/{pid}/status') as f:
+			for line in f:
+				key, _, value = line.partition(':')
+				if key in ('VmRSS', 'VmHWM'):
+					values[key] = int(value.split()[0]) / 1024
+	except OSError:
+		pass
+	return values.get('VmRSS'), values.get('VmHWM')
+
+def reset_peak_memory(pid):
+	try:
+		with open(f'/proc/{pid}/clear_refs', 'w') as f:
+			f.write('5')
+	except OSError:
+		pass
+
+async def http_call(reader, writer, method, path, payload=None, cookie=None):
+	"""
+	One request on a kept-alive HTTP/1.1 connection. A bare asyncio client
+	keeps the load generator itself from being the bottleneck. Returns the
+	status, the response headers (lowercased names) and the body.
+	"""
+	body = json.dumps(payload).encode() if payload is not None else b''
+	extra = f"Cookie: {cookie}\r\n" if cookie else ''
+	writer.write(
+		f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n{extra}Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+		+ body
+	)
+	await writer.drain()
+	head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+	status_line, *lines = head.strip().split('\r\n')
+	headers = {}
+	for line in lines:
+		name, _, value = line.partition(':')
+		headers[name.strip().lower()] = value.strip()
+	return int(status_line.split(' ', 2)[1]), headers, await reader.readexactly(int(headers['content-length']))
+
+async def google_login(port):
+	"""
+	Signs in through /login and the stub's OAuth endpoints; returns the
+	session cookie of the now Google-connected user.
+	"""
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	try:
+		status, headers, _ = await http_call(reader, writer, 'GET', '/login')
+		cookie = headers['set-cookie'].split(';', 1)[0]
+		# The stub grants consent at once; hand its code back to the app ourselves
+		state = parse_qs(urlsplit(headers['location']).query)['state'][0]
+		callback = '/oauth2callback?' + urlencode({'code': 'stub-code', 'state': state})
+		status, headers, body = await http_call(reader, writer, 'GET', callback, cookie=cookie)
+		if status != 302:
+			raise RuntimeError(f"Google sign-in through the stub failed: {body[:200]!r}")
+		return headers['set-cookie'].split(';', 1)[0] if 'set-cookie' in headers else cookie
+	finally:
+		writer.close()
+
+async def drive(port, scenario, requests, concurrency, run, cookie=None):
+	method, path, payload, check = SCENARIOS[scenario]
+	latencies = []
+	errors = 0
+	counter = iter(range(requests))
+
+	async def connection():
+		nonlocal errors
+		reader, writer = await asyncio.open_connection('127.0.0.1', port)
+		for i in counter:
+			start = time.perf_counter()
+			try:
+				status, _, body = await http_call(reader, writer, method, path, payload(run, i) if payload else None, cookie)
+				ok = status == 200 and check(body)
+			except (OSError, asyncio.IncompleteReadError, ValueError):
+				writer.close()
+				reader, writer = await asyncio.open_connection('127.0.0.1', port)
+				ok = False
+			latencies.append(time.perf_counter() - start)
+			if not ok:
+				errors += 1
+		writer.close()
+
+	start = time.perf_counter()
+	await asyncio.gather(*[connection() for _ in range(min(concurrency, requests))])
+	elapsed = time.perf_counter() - start
+	latencies.sort()
+
+	def percentile(quantile):
+		return round(latencies[min(int(len(latencies) * quantile), len(latencies) - 1)] * 1000, 1)
+
+	return {
+		'rps': round(requests / elapsed, 1),
+		'p50_ms': percentile(0.5),
+		'p95_ms': percentile(0.95),
+		'p99_ms': percentile(0.99),
+		'errors': errors
+	}
+
+def settings(args):
+	return {
+		'requests': args.requests,
+		'concurrency': args.concurrency,
+		'latency': args.latency,
+		'threads': args.threads,
+		**{fault: getattr(args, fault) for fault in FAULTS}
+	}
+
+def load_baselines():
+	try:
+		with open(BASELINES, encoding='utf-8') as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return {}
+
+def regressions(result, baseline, tolerance, slack_ms):
+	"""
+	What got worse than the baseline by more than the tolerance (p95 also by
+	more than slack_ms). p99 is reported but too noisy over a few hundred
+	requests to gate on.
+	"""
+	found = []
+	if result['rps'] < baseline['rps'] * (1 - tolerance):
+		found.append(f"rps {result['rps']} < {baseline['rps']}")
+	if result['p95_ms'] > baseline['p95_ms'] * (1 + tolerance) + slack_ms:
+		found.append(f"p95_ms {result['p95_ms']} > {baseline['p95_ms']}")
+	if result['peak_rss_mb'] is not None and result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+		found.append(f"peak_rss_mb {result['peak_rss_mb']} > {baseline['peak_rss_mb']}")
+	return found
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi', help='Flask on a thread pool, or the ASGI app in asgi.py')
+	parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+	parser.add_argument('--concurrency', type=int, default=20, help='connections sending requests at once')
+	parser.add_argument('--latency', type=float, default=0.05, help='seconds the upstream stub takes to answer')
+	parser.add_argument('--threads', type=int, default=20, help='WSGI worker threads (and ASGI_WSGI_THREADS)')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls answered 503')
+	parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of upstream calls answered 429')
+	parser.add_argument('--slow-rate', type=float, default=0.0, help='fraction of upstream calls taking 2 s')
+	parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests before each scenario')
+	parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='run only these (repeatable)')
+	parser.add_argument('--rate-limits', action='store_true', help='keep the configured upstream rate limits')
+	parser.add_argument('--tolerance', type=float, default=0.2, help='allowed fraction worse than the baseline')
+	parser.add_argument('--slack-ms', type=float, default=5.0, help='latency noise allowed on top of the tolerance')
+	parser.add_argument('--save-baseline', action='store_true', help=f'record this run in {os.path.basename(BASELINES)}')
+	args = parser.parse_args()
+	scenarios = args.scenario or list(SCENARIOS)
+	injecting = any(getattr(args, fault) for fault in FAULTS)
+
+	stub, stub_port = start_server('stub', args)
+	tmpdir = tempfile.mkdtemp()
+	env = {
+		**environment(f"http://127.0.0.1:{stub_port}"),
+		'OAUTHLIB_INSECURE_TRANSPORT': '1',
+		'GEMINI_API_KEY': 'bench',
+		'GOOGLE_API_KEY': 'bench',
+		'WEATHER_API_KEY': 'bench',
+		'DATABASE_URL': f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+		'LOG_FILE': os.path.join(tmpdir, 'bench.log'),
+		'CALENDAR_SYNC_ENABLED': 'false',
+		'DATABASE_PROFILE': 'production',
+		'HTTP_POOL_MAXSIZE': str(args.threads),
+		'ASGI_WSGI_THREADS': str(args.threads),
+		'ASYNC_HTTP_MAX_CONNECTIONS': str(max(args.concurrency, 1))
+	}
+	if not args.rate_limits:
+		# Measure the app, not the upstream rate limits
+		for provider in ('GEMINI', 'WEATHER', 'GOOGLE'):
+			env.update({f'{provider}_RATE_LIMIT': '0', f'{provider}_MAX_IN_FLIGHT': '0'})
+
+	baselines = load_baselines()
+	baseline = baselines.get(args.mode)
+	if baseline is not None and baseline['settings'] != settings(args):
+		print(f"Baseline for {args.mode} was recorded with {baseline['settings']}; not comparing")
+		baseline = None
+
+	print(f"{args.mode}: {args.requests} requests per scenario, concurrency {args.concurrency}, upstream latency {args.latency * 1000:.0f} ms, {args.threads} threads")
+	if injecting:
+		print(f"Injecting upstream faults: {', '.join(f'{fault} {getattr(args, fault)}' for fault in FAULTS)}; errors are expected")
+	print(f"{'scenario':>17} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'rss MB':>7} {'peak MB':>8}  vs baseline")
+	results = {}
+	failed = False
+	server, port = start_server(args.mode, args, env)
+	try:
+		for run, scenario in enumerate(scenarios):
+			cookie = asyncio.run(google_login(port)) if scenario in SIGNED_IN else None
+			if args.warmup:
+				asyncio.run(drive(port, scenario, args.warmup, args.concurrency, f'warmup{run}', cookie))
+			reset_peak_memory(server.pid)
+			result = asyncio.run(drive(port, scenario, args.requests, args.concurrency, run, cookie))
+			result['rss_mb'], result['peak_rss_mb'] = (round(value, 1) if value is not None else None for value in memory(server.pid))
+			results[scenario] = result
+
+			verdict = '-'
+			previous = (baseline or {}).get('scenarios', {}).get(scenario)
+			if result['errors'] and not injecting:
+				verdict = 'ERRORS'
+				failed = True
+			elif previous is not None:
+				found = regressions(result, previous, args.tolerance, args.slack_ms)
+				verdict = 'REGRESSED: ' + ', '.join(found) if found else 'ok'
+				failed = failed or bool(found)
+			print(
+				f"{scenario:>17} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+				f"{result['errors']:>7} {result['rss_mb'] or 0:>7.1f} {result['peak_rss_mb'] or 0:>8.1f}  {verdict}"
+			)
+	finally:
+		stop_server(server)
+		stop_server(stub)
+
+	if args.save_baseline:
+		recorded = baselines.get(args.mode, {})
+		scenarios_recorded = recorded.get('scenarios', {}) if recorded.get('settings') == settings(args) else {}
+		scenarios_recorded.update({name: {key: value for key, value in result.items() if key not in ('errors', 'rss_mb')} for name, result in results.items()})
+		baselines[args.mode] = {'settings': settings(args), 'scenarios': scenarios_recorded}
+		with open(BASELINES, 'w', encoding='utf-8') as f:
+			json.dump(baselines, f, indent='\t', sort_keys=True)
+			f.write('\n')
+		print(f"Saved {args.mode} baseline to {BASELINES}")
+	sys.exit(1 if failed and not args.save_baseline else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,114 @@
+"""
+Cost of a log call on the request thread: the old logging.basicConfig
+FileHandler (formats and writes inline, under the handler lock) against
+the queue handler from logging_config (the listener thread formats and
+writes). --fsync makes every write durable, standing in for a slow or
+contended disk.
+
+    python benchmarks/bench_logging.py [--threads 8] [--records 5000] [--fsync]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging_config
+from logging_config import TEXT_FORMAT, JsonFormatter, setup_logging, stop_logging, bind_log_context, logging_stats
+
+class FsyncFileHandler(logging.FileHandler):
+	def flush(self):
+		super().flush()
+		if self.stream is not None:
+			os.fsync(self.stream.fileno())
+
+def configure(mode, path, fsync):
+	root = logging.getLogger()
+	for handler in list(root.handlers):
+		root.removeHandler(handler)
+	if mode == 'file':
+		handler = (FsyncFileHandler if fsync else logging.FileHandler)(path)
+		handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+		root.addHandler(handler)
+		root.setLevel(logging.INFO)
+		return
+	setup_logging({
+		'LOG_FILE': path,
+		'LOG_LEVEL': 'INFO',
+		'LOG_FORMAT': 'json',
+		'LOG_QUEUE_SIZE': 100000,
+		'LOG_MAX_BYTES': 1024 ** 3,
+		'LOG_ROTATE_WHEN': '',
+		'LOG_BACKUP_COUNT': 1
+	})
+	if fsync:
+		# Same durable writes, done by the listener thread
+		listener = logging_config._listener
+		for target in listener.handlers:
+			target.close()
+		target = FsyncFileHandler(path)
+		target.setFormatter(JsonFormatter())
+		listener.handlers = (target,)
+
+def run(mode, args):
+	path = os.path.join(tempfile.mkdtemp(), f'{mode}.log')
+	configure(mode, path, args.fsync)
+	logger = logging.getLogger('bench')
+	timings = []
+	lock = threading.Lock()
+
+	def worker(n):
+		bind_log_context(request_id=f'req-{n}', user_id=f'user-{n}', intent='weather')
+		local = []
+		for i in range(args.records):
+			start = time.perf_counter_ns()
+			logger.info("Request completed", extra={'method': 'POST', 'path': '/api/process_command', 'status': 200, 'latency_ms': 12.3})
+			local.append(time.perf_counter_ns() - start)
+		with lock:
+			timings.extend(local)
+
+	threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+	start = time.perf_counter()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	elapsed = time.perf_counter() - start
+	dropped = logging_stats()['dropped'] if mode == 'queue' else 0
+	if mode == 'queue':
+		stop_logging()
+	timings.sort()
+	with open(path, encoding='utf-8') as f:
+		written = sum(1 for _ in f)
+	return {
+		'mean': statistics.fmean(timings) / 1000,
+		'p50': timings[len(timings) // 2] / 1000,
+		'p99': timings[int(len(timings) * 0.99) - 1] / 1000,
+		'calls_per_s': len(timings) / elapsed,
+		'written': written,
+		'dropped': dropped
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--threads', type=int, default=8, help='request threads logging at once')
+	parser.add_argument('--records', type=int, default=5000, help='records per thread')
+	parser.add_argument('--fsync', action='store_true', help='fsync after every record')
+	args = parser.parse_args()
+
+	print(f"{args.threads} threads x {args.records} records{', fsync per record' if args.fsync else ''}")
+	print(f"{'handler':>8} {'mean us':>9} {'p50 us':>8} {'p99 us':>8} {'calls/s':>10} {'written':>9} {'dropped':>8}")
+	for mode in ['file', 'queue']:
+		result = run(mode, args)
+		print(
+			f"{mode:>8} {result['mean']:>9.1f} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+			f"{result['calls_per_s']:>10.0f} {result['written']:>9} {result['dropped']:>8}"
+		)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,77 @@
+"""
+Throughput and accuracy of parse_reminder_text against the golden corpus,
+compared with the previous regex-loop implementation.
+
+    python benchmarks/bench_reminder_parser.py [--rounds 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminder_parser import parse_reminder_text
+from tests.reminder_corpus import cases
+
+def legacy_parse_reminder_text(text):
+	time_patterns = [
+		r'at\s+\d{1,2}(:\d{2})?\s*(am|pm|AM|PM)?',
+		r'tomorrow',
+		r'next\s+\w+',
+		r'in\s+\d+\s+(hours|minutes|days)',
+		r'\d{1,2}(:\d{2})?\s*(am|pm|AM|PM)',
+		r'today',
+		r'this\s+\w+',
+		r'morning',
+		r'afternoon',
+		r'evening',
+		r'night'
+	]
+	time_phrase = None
+	for pattern in time_patterns:
+		match = re.search(pattern, text, re.IGNORECASE)
+		if match:
+			time_phrase = match.group(0)
+			break
+	task = text
+	remove_phrases = [
+		'remind me to', 'please', 'set a reminder for',
+		'can you', 'could you', 'i need to', 'set a reminder to',
+		'remember to', 'don\'t forget to'
+	]
+	for phrase in remove_phrases:
+		task = re.sub(phrase, '', task, flags=re.IGNORECASE)
+	if time_phrase:
+		task = task.replace(time_phrase, '')
+	task = task.strip()
+	task = re.sub(r'^\s*(to|that|about)\s+', '', task)
+	task = re.sub(r'\s+', ' ', task).strip()
+	if not time_phrase:
+		time_phrase = "in 1 hour"
+	return task, time_phrase
+
+def measure(parser, corpus, rounds):
+	correct = sum(parser(text) == (task, time_phrase) for text, task, time_phrase in corpus)
+	best = float('inf')
+	for _ in range(rounds):
+		start = time.perf_counter()
+		for text, _, _ in corpus:
+			parser(text)
+		best = min(best, time.perf_counter() - start)
+	return len(corpus) / best, correct / len(corpus)
+
+def main():
+	arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	arg_parser.add_argument('--rounds', type=int, default=5)
+	args = arg_parser.parse_args()
+
+	corpus = list(cases())
+	print(f"Corpus: {len(corpus)} reminder phrasings, best of {args.rounds} rounds")
+	for name, parser in [('legacy', legacy_parse_reminder_text), ('tokenizer', parse_reminder_text)]:
+		throughput, accuracy = measure(parser, corpus, args.rounds)
+		print(f"{name:>10}: {throughput:>10,.0f} phrases/s  accuracy {accuracy:6.1%}")
+
+if __name__ == '__main__':
+	main()
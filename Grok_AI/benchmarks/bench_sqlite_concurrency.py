@@ -0,0 +1,82 @@
+"""
+Write throughput against one SQLite file as the number of worker processes
+grows (as with several gunicorn workers), for the stock and the production
+DATABASE_PROFILE. Each iteration reads the user's reminder count and then
+inserts and commits a reminder, like a reminder command does.
+
+    python benchmarks/bench_sqlite_concurrency.py [--workers 1,2,4,8] [--duration 5]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from config import Config
+from models import db, Reminder, init_db
+
+def make_app(path, profile):
+	app = Flask(__name__)
+	app.config.from_object(Config)
+	app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+	app.config['DATABASE_PROFILE'] = profile
+	init_db(app)
+	return app
+
+def worker(path, profile, start_at, duration, worker_id):
+	app = make_app(path, profile)
+	commits = 0
+	locked = 0
+	user_id = f"user_{worker_id}"
+	with app.app_context():
+		time.sleep(max(0, start_at - time.time()))
+		deadline = start_at + duration
+		while time.time() < deadline:
+			try:
+				Reminder.query.filter_by(user_id=user_id).count()
+				db.session.add(Reminder(task='call mom', time_phrase='at 5 PM', created_at=datetime.now(), user_id=user_id))
+				db.session.commit()
+				commits += 1
+			except OperationalError as e:
+				db.session.rollback()
+				if 'locked' not in str(e):
+					raise
+				locked += 1
+		db.session.remove()
+		db.engine.dispose()
+	return commits, locked
+
+def run(profile, workers, duration):
+	with tempfile.TemporaryDirectory() as tmpdir:
+		path = os.path.join(tmpdir, 'bench.db')
+		with make_app(path, profile).app_context():
+			db.engine.dispose()
+		# Workers start together once every process has imported and connected
+		start_at = time.time() + 1 + workers * 0.2
+		with multiprocessing.Pool(workers) as pool:
+			results = pool.starmap(worker, [(path, profile, start_at, duration, i) for i in range(workers)])
+	commits = sum(c for c, _ in results)
+	locked = sum(l for _, l in results)
+	return commits / duration, locked
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--workers', default='1,2,4,8', help='comma-separated worker process counts')
+	parser.add_argument('--duration', type=float, default=5, help='seconds per run')
+	parser.add_argument('--profiles', default='default,production')
+	args = parser.parse_args()
+
+	print(f"{'profile':>11} {'workers':>8} {'commits/s':>10} {'locked errors':>14}")
+	for profile in args.profiles.split(','):
+		for workers in [int(n) for n in args.workers.split(',')]:
+			throughput, locked = run(profile, workers, args.duration)
+			print(f"{profile:>11} {workers:>8} {throughput:>10,.0f} {locked:>14}")
+
+if __name__ == '__main__':
+	main()
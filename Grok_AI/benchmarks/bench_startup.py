@@ -0,0 +1,105 @@
+"""
+Cold-start time of `import app` (what a worker pays before it can serve),
+measured with python -X importtime in fresh interpreters. Fails when the
+median import time is over --budget-ms or when one of the SDKs that should
+load lazily was imported at startup.
+
+    python benchmarks/bench_startup.py [--runs 7] [--budget-ms 900] [--top 10] [--eager]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use by app.py, calendar_sync.py and google_services.py
+LAZY_MODULES = ['google.generativeai', 'googleapiclient', 'google_auth_oauthlib', 'google.oauth2', 'httplib2', 'dateutil']
+
+def parse_importtime(stderr):
+	"""[(module, depth, cumulative_us)] from -X importtime output, in the order printed."""
+	rows = []
+	for line in stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		_, cumulative, name = line.split('|', 2)
+		depth = (len(name) - len(name.lstrip()) - 1) // 2
+		rows.append((name.strip(), depth, int(cumulative)))
+	return rows
+
+def statement_import_us(rows):
+	"""Time spent in the statement's own imports: app and whatever follows it at the top level."""
+	start = next(i for i, (module, depth, _) in enumerate(rows) if module == 'app' and depth == 0)
+	return sum(us for _, depth, us in rows[start:] if depth == 0)
+
+def import_once(statement, env):
+	start = time.perf_counter()
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', statement],
+		cwd=APP_DIR, env=env, capture_output=True, text=True
+	)
+	wall = time.perf_counter() - start
+	if result.returncode != 0:
+		raise RuntimeError(f"import failed:\n{result.stderr[-2000:]}")
+	return wall, parse_importtime(result.stderr)
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--runs', type=int, default=7)
+	parser.add_argument('--budget-ms', type=float, default=900, help='maximum median time to import app')
+	parser.add_argument('--top', type=int, default=10, help='slowest direct imports of app to list')
+	parser.add_argument('--eager', action='store_true', help='also time importing the lazy SDKs up front, for comparison')
+	args = parser.parse_args()
+
+	tmpdir = tempfile.mkdtemp()
+	env = dict(os.environ)
+	env.pop('GOOGLE_API_KEY', None)  # the app must boot without it
+	env.update({
+		'DATABASE_URL': f"sqlite:///{os.path.join(tmpdir, 'startup.db')}",
+		'CALENDAR_SYNC_ENABLED': 'false',
+		'SESSION_CLEANUP_INTERVAL': '0'
+	})
+
+	statements = {'lazy': 'import app'}
+	if args.eager:
+		statements['eager'] = 'import app, ' + ', '.join(
+			['google.generativeai', 'googleapiclient.discovery', 'google_auth_oauthlib.flow', 'google.oauth2.credentials', 'httplib2', 'dateutil.parser']
+		)
+
+	print(f"{args.runs} runs per mode, budget {args.budget_ms:.0f} ms")
+	print(f"{'mode':>6} {'import ms':>10} {'process ms':>11}")
+	failures = []
+	for mode, statement in statements.items():
+		import_once(statement, env)  # warm the bytecode cache
+		walls, imports, rows = [], [], []
+		for _ in range(args.runs):
+			wall, rows = import_once(statement, env)
+			walls.append(wall * 1000)
+			imports.append(statement_import_us(rows) / 1000)
+		import_ms = statistics.median(imports)
+		print(f"{mode:>6} {import_ms:>10.0f} {statistics.median(walls):>11.0f}")
+		if mode != 'lazy':
+			continue
+
+		direct = sorted(((us, module) for module, depth, us in rows if depth == 1), reverse=True)[:args.top]
+		print("\nslowest direct imports of app (last run):")
+		for us, module in direct:
+			print(f"  {us / 1000:>8.1f} ms  {module}")
+		loaded = sorted({module for module, _, _ in rows for lazy in LAZY_MODULES if module == lazy or module.startswith(lazy + '.')})
+		if loaded:
+			failures.append(f"SDKs imported at startup: {', '.join(loaded)}")
+		if import_ms > args.budget_ms:
+			failures.append(f"import app took {import_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+	print()
+	for failure in failures:
+		print(f"FAIL: {failure}")
+	if failures:
+		sys.exit(1)
+	print("OK: within budget and no lazy SDK loaded at startup")
+
+if __name__ == '__main__':
+	main()
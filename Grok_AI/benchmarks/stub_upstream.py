@@ -0,0 +1,282 @@
+"""
+Local stand-in for every upstream API the assistant calls, for offline
+load and failure testing: Gemini generateContent and streamGenerateContent
+(SSE with alt=sse, otherwise the JSON array the SDK's REST transport
+reads), OpenWeatherMap current weather, the Google OAuth authorization,
+token and user info endpoints, Gmail messages (list, get and batch) and
+Calendar event inserts.
+
+Faults are injected per call: a base --latency plus up to --jitter, a
+--slow-rate fraction of calls that take --slow-latency instead (the tail),
+a --throttle-rate fraction answered 429 with Retry-After, and an
+--error-rate fraction answered 503. POST /_stub/config with a JSON object
+of the same settings (and optionally "upstream": "gemini", "weather" or
+"google") changes them while the stub runs; GET /_stub/stats reports the
+calls per route, the faults injected and the most calls seen in flight at
+once (and resets that peak).
+
+Point the app at it with the variables it prints on start. OAuth over
+plain HTTP also needs OAUTHLIB_INSECURE_TRANSPORT=1.
+
+    python benchmarks/stub_upstream.py [--port 8090] [--latency 0.1] [--jitter 0] [--slow-rate 0] [--slow-latency 2] [--throttle-rate 0] [--error-rate 0] [--upstream gemini]
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+STUB_ANSWER = 'stub answer'
+UPSTREAMS = ('gemini', 'weather', 'google')
+FAULT_DEFAULTS = {
+	'latency': 0.0,
+	'jitter': 0.0,
+	'slow_rate': 0.0,
+	'slow_latency': 2.0,
+	'throttle_rate': 0.0,
+	'retry_after': 1,
+	'error_rate': 0.0
+}
+
+def gemini_chunk(text):
+	return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}]}
+
+def weather_body(city):
+	return {
+		'cod': 200,
+		'name': city.title(),
+		'main': {'temp': 31.5, 'feels_like': 36.2, 'humidity': 70},
+		'weather': [{'main': 'Clear', 'description': 'clear sky'}],
+		'wind': {'speed': 3.6}
+	}
+
+def json_response(data, status=200, headers=()):
+	return status, [('content-type', 'application/json')] + list(headers), json.dumps(data).encode()
+
+def google_error(status, message):
+	return json_response({'error': {'code': status, 'message': message}}, status)
+
+class StubUpstream:
+	"""
+	An ASGI app answering like the upstream APIs. Routes map a method and a
+	path pattern to (upstream, name, handler); a handler gets the path
+	match, the query and the body and returns (status, headers, body).
+	"""
+	def __init__(self, faults=None, seed=None):
+		self.faults = {upstream: dict(FAULT_DEFAULTS) for upstream in UPSTREAMS}
+		self.configure(**(faults or {}))
+		self.random = random.Random(seed)
+		self.calls = Counter()
+		self.injected = Counter()
+		self.in_flight = 0
+		self.peak = 0
+		self.routes = [
+			('POST', re.compile(r'.*:streamGenerateContent$'), 'gemini', 'gemini.stream', self.gemini_stream),
+			('POST', re.compile(r'.*:generateContent$'), 'gemini', 'gemini.generate', self.gemini_generate),
+			('GET', re.compile(r'.*/weather$'), 'weather', 'weather', self.weather),
+			('GET', re.compile(r'/o/oauth2/auth$'), 'google', 'google.authorize', self.authorize),
+			('POST', re.compile(r'/token$'), 'google', 'google.token', self.token),
+			('GET', re.compile(r'/oauth2/v2/userinfo$'), 'google', 'google.userinfo', self.userinfo),
+			('GET', re.compile(r'/gmail/v1/users/[^/]+/messages$'), 'google', 'gmail.list', self.gmail_list),
+			('GET', re.compile(r'/gmail/v1/users/[^/]+/messages/(?P<id>[^/]+)$'), 'google', 'gmail.get', self.gmail_get),
+			('POST', re.compile(r'/batch(/.*)?$'), 'google', 'google.batch', self.batch),
+			('POST', re.compile(r'/calendar/v3/calendars/[^/]+/events$'), 'google', 'calendar.insert', self.calendar_insert)
+		]
+
+	def configure(self, upstream=None, **settings):
+		"""Changes fault settings for one upstream, or all of them."""
+		unknown = set(settings) - set(FAULT_DEFAULTS)
+		if unknown:
+			raise ValueError(f"Unknown fault settings: {', '.join(sorted(unknown))}")
+		if upstream is not None and upstream not in self.faults:
+			raise ValueError(f"Unknown upstream: {upstream}")
+		for name in ([upstream] if upstream else UPSTREAMS):
+			self.faults[name].update(settings)
+
+	def match(self, method, path):
+		for route_method, pattern, upstream, name, handler in self.routes:
+			found = pattern.match(path) if route_method == method else None
+			if found:
+				return upstream, name, handler, found
+		return None
+
+	async def __call__(self, scope, receive, send):
+		if scope['type'] != 'http':
+			return
+		body = b''
+		while True:
+			message = await receive()
+			body += message.get('body', b'')
+			if not message.get('more_body'):
+				break
+		headers = {key.decode().lower(): value.decode() for key, value in scope['headers']}
+		status, response_headers, response_body = await self.handle(scope['method'], scope['path'], scope['query_string'].decode(), headers, body)
+		await send({
+			'type': 'http.response.start',
+			'status': status,
+			'headers': [(key.encode(), value.encode()) for key, value in response_headers] + [(b'content-length', str(len(response_body)).encode())]
+		})
+		await send({'type': 'http.response.body', 'body': response_body})
+
+	async def handle(self, method, path, query_string, headers, body):
+		if path == '/_stub/stats':
+			stats = {'calls': dict(self.calls), 'injected': dict(self.injected), 'in_flight': self.in_flight, 'peak': self.peak, 'faults': self.faults}
+			self.peak = self.in_flight
+			return json_response(stats)
+		if path == '/_stub/config' and method == 'POST':
+			try:
+				self.configure(**json.loads(body or b'{}'))
+			except (TypeError, ValueError) as e:
+				return json_response({'error': str(e)}, 400)
+			return json_response(self.faults)
+
+		route = self.match(method, path)
+		if route is None:
+			return google_error(404, f"No stub for {method} {path}")
+		upstream, name, handler, found = route
+		self.calls[name] += 1
+		self.in_flight += 1
+		self.peak = max(self.peak, self.in_flight)
+		try:
+			fault = await self.inject(upstream)
+		finally:
+			self.in_flight -= 1
+		if fault is not None:
+			return fault
+		return handler(found, parse_qs(query_string), headers, body)
+
+	async def inject(self, upstream):
+		"""Waits out this call's latency; returns a throttled or failed response, or None."""
+		faults = self.faults[upstream]
+		delay = faults['latency'] + self.random.uniform(0, faults['jitter'])
+		if self.random.random() < faults['slow_rate']:
+			delay = faults['slow_latency']
+			self.injected['slow'] += 1
+		await asyncio.sleep(delay)
+		if self.random.random() < faults['throttle_rate']:
+			self.injected['throttled'] += 1
+			status, headers, body = google_error(429, 'Resource has been exhausted (stub).')
+			return status, headers + [('retry-after', str(faults['retry_after']))], body
+		if self.random.random() < faults['error_rate']:
+			self.injected['errors'] += 1
+			return google_error(503, 'The service is currently unavailable (stub).')
+		return None
+
+	def gemini_generate(self, found, query, headers, body):
+		return json_response(gemini_chunk(STUB_ANSWER))
+
+	def gemini_stream(self, found, query, headers, body):
+		chunks = [gemini_chunk(word) for word in ('stub ', 'answer')]
+		if query.get('alt') == ['sse']:
+			events = ''.join(f"data: {json.dumps(chunk)}\r\n\r\n" for chunk in chunks)
+			return 200, [('content-type', 'text/event-stream')], events.encode()
+		return json_response(chunks)
+
+	def weather(self, found, query, headers, body):
+		return json_response(weather_body(query.get('q', ['Chennai'])[0]))
+
+	def authorize(self, found, query, headers, body):
+		# Consent is granted at once: straight back to the app with a code
+		params = {'code': 'stub-code', 'state': query.get('state', [''])[0]}
+		location = f"{query['redirect_uri'][0]}?{urlencode(params)}"
+		return 302, [('location', location)], b''
+
+	def token(self, found, query, headers, body):
+		return json_response({
+			'access_token': 'stub-access-token',
+			'refresh_token': 'stub-refresh-token',
+			'expires_in': 3600,
+			'token_type': 'Bearer',
+			'scope': 'https://www.googleapis.com/auth/calendar.events https://www.googleapis.com/auth/gmail.modify'
+		})
+
+	def userinfo(self, found, query, headers, body):
+		return json_response({'id': 'stub-user', 'email': 'stub.user@example.com', 'verified_email': True})
+
+	def gmail_list(self, found, query, headers, body):
+		limit = int(query.get('maxResults', ['100'])[0])
+		start = int(query.get('pageToken', ['0'])[0])
+		page = {'messages': [{'id': f'msg{n}', 'threadId': f'thread{n}'} for n in range(start, start + limit)]}
+		if start + limit < 1000:
+			page['nextPageToken'] = str(start + limit)
+		return json_response(page)
+
+	def gmail_get(self, found, query, headers, body):
+		message_id = found.group('id')
+		return json_response({'id': message_id, 'payload': {'headers': [{'name': 'Subject', 'value': f'Stub message {message_id}'}]}})
+
+	def batch(self, found, query, headers, body):
+		"""
+		A multipart/mixed batch: each part is an HTTP request, answered in a
+		part with the matching Content-ID. Parts share the batch call's
+		latency and faults.
+		"""
+		message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {headers.get('content-type', '')}\r\n\r\n".encode() + body)
+		boundary = 'stub_batch_boundary'
+		parts = []
+		for part in message.iter_parts():
+			request_line, _, rest = part.get_payload(decode=True).replace(b'\r\n', b'\n').partition(b'\n')
+			method, target, _ = request_line.decode().split(' ', 2)
+			target = urlsplit(target)
+			route = self.match(method, target.path)
+			if route is None:
+				status, part_headers, part_body = google_error(404, f"No stub for {method} {target.path}")
+			else:
+				self.calls[route[1]] += 1
+				status, part_headers, part_body = route[2](route[3], parse_qs(target.query), {}, rest.partition(b'\n\n')[2])
+			content_id = part['Content-ID'].strip('<>')
+			head = '\r\n'.join(f"{key}: {value}" for key, value in part_headers)
+			parts.append(
+				f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+				f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n{head}\r\n\r\n".encode() + part_body + b'\r\n'
+			)
+		return 200, [('content-type', f'multipart/mixed; boundary={boundary}')], b''.join(parts) + f"--{boundary}--\r\n".encode()
+
+	def calendar_insert(self, found, query, headers, body):
+		event = json.loads(body or b'{}')
+		event_id = f"stub{self.calls['calendar.insert']}"
+		return json_response({**event, 'id': event_id, 'status': 'confirmed', 'htmlLink': f'https://calendar.example.com/event?eid={event_id}'})
+
+def environment(base_url):
+	"""The app settings that send every upstream call to a stub at base_url."""
+	return {
+		'GEMINI_API_URL': f"{base_url}/v1beta/models/gemini-1.5-flash",
+		'WEATHER_API_URL': f"{base_url}/data/2.5/weather",
+		'GOOGLE_AUTH_URI': f"{base_url}/o/oauth2/auth",
+		'GOOGLE_TOKEN_URI': f"{base_url}/token",
+		'GOOGLE_API_ROOT_URL': f"{base_url}/"
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8090)
+	parser.add_argument('--latency', type=float, default=0.1, help='seconds every call takes')
+	parser.add_argument('--jitter', type=float, default=0.0, help='up to this many seconds more, uniformly')
+	parser.add_argument('--slow-rate', type=float, default=0.0, help='fraction of calls that take --slow-latency')
+	parser.add_argument('--slow-latency', type=float, default=2.0)
+	parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls answered 429')
+	parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds on a 429')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered 503')
+	parser.add_argument('--upstream', choices=UPSTREAMS, help='inject the faults into this upstream only')
+	parser.add_argument('--seed', type=int, help='for a repeatable sequence of faults')
+	args = parser.parse_args()
+
+	faults = {key: getattr(args, key) for key in FAULT_DEFAULTS}
+	stub = StubUpstream(seed=args.seed)
+	stub.configure(latency=args.latency)
+	stub.configure(upstream=args.upstream, **faults)
+	for key, value in environment(f"http://{args.host}:{args.port}").items():
+		print(f"{key}={value}")
+	print("OAUTHLIB_INSECURE_TRANSPORT=1")
+
+	import uvicorn
+	uvicorn.run(stub, host=args.host, port=args.port, log_level='warning', lifespan='off', backlog=4096)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_prompt(text):
+	"""
+	Normalizes prompt text for cache keys: case, inner whitespace and trailing
+	punctuation do not change the answer we would get back.
+	"""
+	text = re.sub(r'\s+', ' ', text or '').strip().lower()
+	return text.rstrip('?!.,; ')
+
+def cache_key(namespace, text):
+	return hashlib.sha256(f"{namespace}\x1f{text}".encode('utf-8')).hexdigest()
+
+class MemoryCacheBackend:
+	"""In-process LRU cache with a per-entry TTL."""
+	def __init__(self, max_entries=1000, ttl=3600):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			value, expires_at = entry
+			if expires_at <= time.time():
+				del self._entries[key]
+				return None
+			self._entries.move_to_end(key)
+			return value
+
+	def set(self, key, value, ttl=None):
+		expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+		with self._lock:
+			self._entries[key] = (value, expires_at)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def delete(self, key):
+		with self._lock:
+			self._entries.pop(key, None)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+	def __len__(self):
+		with self._lock:
+			return len(self._entries)
+
+class SQLiteCacheBackend:
+	"""
+	LRU cache with a per-entry TTL stored in its own SQLite file, so entries
+	survive restarts and are shared by every worker on the host.
+	"""
+	def __init__(self, path, max_entries=1000, ttl=3600):
+		self.path = path
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self._local = threading.local()
+		directory = os.path.dirname(os.path.abspath(path))
+		os.makedirs(directory, exist_ok=True)
+		with self._connect() as conn:
+			conn.execute(
+				'CREATE TABLE IF NOT EXISTS response_cache ('
+				'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+				'expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+			)
+			conn.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access)')
+
+	def _connect(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=5)
+			self._local.conn = conn
+		return conn
+
+	def get(self, key):
+		now = time.time()
+		with self._connect() as conn:
+			row = conn.execute(
+				'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+			).fetchone()
+			if row is None:
+				return None
+			if row[1] <= now:
+				conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+				return None
+			conn.execute('UPDATE response_cache SET last_access = ? WHERE key = ?', (now, key))
+			return row[0]
+
+	def set(self, key, value, ttl=None):
+		now = time.time()
+		expires_at = now + (ttl if ttl is not None else self.ttl)
+		with self._connect() as conn:
+			conn.execute(
+				'INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)',
+				(key, value, expires_at, now)
+			)
+			count = conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+			if count > self.max_entries:
+				conn.execute(
+					'DELETE FROM response_cache WHERE key IN ('
+					'SELECT key FROM response_cache ORDER BY last_access LIMIT ?)',
+					(count - self.max_entries,)
+				)
+
+	def delete(self, key):
+		with self._connect() as conn:
+			conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+
+	def clear(self):
+		with self._connect() as conn:
+			conn.execute('DELETE FROM response_cache')
+
+	def __len__(self):
+		return self._connect().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+	def close(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is not None:
+			conn.close()
+			self._local.conn = None
+
+class ResponseCache:
+	"""
+	Prompt -> response cache in front of Gemini, keyed by model and
+	normalized prompt text.
+	"""
+	def __init__(self, app=None):
+		self.enabled = True
+		self.backend = MemoryCacheBackend()
+		self.hits = 0
+		self.misses = 0
+		self._lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.enabled = app.config['AI_CACHE_ENABLED']
+		ttl = app.config['AI_CACHE_TTL']
+		max_entries = app.config['AI_CACHE_MAX_ENTRIES']
+		if app.config['AI_CACHE_BACKEND'] == 'sqlite':
+			path = app.config['AI_CACHE_PATH'] or os.path.join(app.instance_path, 'ai_cache.db')
+			self.backend = SQLiteCacheBackend(path, max_entries=max_entries, ttl=ttl)
+		else:
+			self.backend = MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+		app.extensions['ai_cache'] = self
+
+	def get(self, prompt, namespace='gemini-1.5-flash'):
+		if not self.enabled:
+			return None
+		value = self.backend.get(cache_key(namespace, normalize_prompt(prompt)))
+		with self._lock:
+			if value is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+		return value
+
+	def set(self, prompt, response, namespace='gemini-1.5-flash'):
+		if self.enabled and response:
+			self.backend.set(cache_key(namespace, normalize_prompt(prompt)), response)
+
+	def stats(self):
+		with self._lock:
+			return {'enabled': self.enabled, 'entries': len(self.backend), 'hits': self.hits, 'misses': self.misses}
+
+class _Call:
+	def __init__(self):
+		self.event = threading.Event()
+		self.result = None
+		self.error = None
+
+class SingleFlight:
+	"""
+	Coalesces concurrent calls for the same key: the first caller runs the
+	function and every caller that arrives before it finishes shares its result.
+	"""
+	def __init__(self):
+		self.coalesced = 0
+		self._calls = {}
+		self._lock = threading.Lock()
+
+	def do(self, key, fn):
+		with self._lock:
+			call = self._calls.get(key)
+			leader = call is None
+			if leader:
+				call = self._calls[key] = _Call()
+			else:
+				self.coalesced += 1
+		if not leader:
+			call.event.wait()
+			if call.error is not None:
+				raise call.error
+			return call.result
+		try:
+			call.result = fn()
+		except Exception as e:
+			call.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._calls[key]
+			call.event.set()
+		return call.result
+
+class AsyncSingleFlight:
+	"""
+	SingleFlight for coroutines on one event loop: concurrent awaits for the
+	same key share a single task.
+	"""
+	def __init__(self):
+		self.coalesced = 0
+		self._tasks = {}
+
+	async def do(self, key, fn):
+		task = self._tasks.get(key)
+		if task is None:
+			task = self._tasks[key] = asyncio.ensure_future(fn())
+			task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+		else:
+			self.coalesced += 1
+		# A cancelled waiter must not cancel the call the others share
+		return await asyncio.shield(task)
+
+ai_cache = ResponseCache()
+weather_cache = MemoryCacheBackend()
+# Last reading per city, kept longer, for when the weather API is unavailable
+weather_fallback = MemoryCacheBackend()
+weather_flights = SingleFlight()
+async_weather_flights = AsyncSingleFlight()
+
+def init_cache(app):
+	ai_cache.init_app(app)
+	weather_cache.ttl = app.config['WEATHER_CACHE_TTL']
+	weather_cache.max_entries = app.config['WEATHER_CACHE_MAX_ENTRIES']
+	weather_fallback.ttl = app.config['WEATHER_STALE_TTL']
+	weather_fallback.max_entries = app.config['WEATHER_CACHE_MAX_ENTRIES']
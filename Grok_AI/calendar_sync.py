@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from google_services import google_services, credentials_to_dict, oauth_client, SCOPES
+from models import db, Reminder, CalendarOutbox, GoogleCredential
+from rate_limit import rate_limiter
+from circuit_breaker import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+def build_event(reminder):
+	"""Turns a reminder into a one-hour Google Calendar event at its due time."""
+	start_time = reminder.due_at_local()
+	end_time = start_time + timedelta(hours=1)
+	return {
+		'summary': f"Reminder: {reminder.task}",
+		'start': {
+			'dateTime': start_time.isoformat(),
+			'timeZone': reminder.timezone,
+		},
+		'end': {
+			'dateTime': end_time.isoformat(),
+			'timeZone': reminder.timezone,
+		},
+		'description': f'Created by AI Assistant: {reminder.time_phrase}'
+	}
+
+# Kept per user; the OAuth client's own id and secret come from the app's config
+STORED_CREDENTIAL_FIELDS = ('token', 'refresh_token', 'token_uri', 'scopes', 'expiry')
+
+class MissingCredentials(Exception):
+	"""The user has no stored Google credentials to deliver with."""
+
+def save_google_credentials(user_id, credentials_info):
+	"""Stores (or replaces) a user's Google token for background delivery, in the caller's transaction."""
+	info = {key: credentials_info.get(key) for key in STORED_CREDENTIAL_FIELDS}
+	db.session.merge(GoogleCredential(user_id=user_id, credentials=json.dumps(info)))
+
+def load_google_credentials(user_id):
+	from google.oauth2.credentials import Credentials
+	stored = db.session.get(GoogleCredential, user_id)
+	if stored is None:
+		raise MissingCredentials(f"No Google credentials stored for user {user_id}")
+	client_id, client_secret = oauth_client(current_app.config)
+	return Credentials.from_authorized_user_info(
+		{**json.loads(stored.credentials), 'client_id': client_id, 'client_secret': client_secret}, SCOPES
+	)
+
+def insert_event(user_id, reminder):
+	creds = load_google_credentials(user_id)
+	token = creds.token
+	service = google_services.service('calendar', 'v3', creds)
+	with rate_limiter['google'].slot():
+		event = service.events().insert(calendarId='primary', body=build_event(reminder)).execute()
+	if creds.token != token:
+		# Refreshed on the way; keep the new access token for the next delivery
+		save_google_credentials(user_id, credentials_to_dict(creds))
+	return event.get('htmlLink')
+
+def enqueue_calendar_event(reminder, credentials_info):
+	"""
+	Adds an outbox row for a reminder in the caller's transaction, so the
+	reminder and its pending calendar insert are committed together. The
+	row only references the user; their credentials are stored once, and
+	here only when none are stored yet (a session from before they were).
+	"""
+	reminder.sync_status = 'pending'
+	if db.session.get(GoogleCredential, reminder.user_id) is None:
+		save_google_credentials(reminder.user_id, credentials_info)
+	db.session.add(CalendarOutbox(reminder_id=reminder.id, user_id=reminder.user_id))
+
+class CalendarSyncWorker:
+	"""
+	Background thread that drains the calendar outbox.
+	Failed inserts are retried with exponential backoff; a row is leased by
+	pushing its next_attempt_at forward before delivery, so several workers
+	(or gunicorn processes) never insert the same event twice and a crashed
+	delivery is picked up again once the lease runs out.
+	"""
+	def __init__(self, app=None):
+		self.app = None
+		self.max_attempts = 5
+		self.backoff = 30
+		self.poll_interval = 15
+		self.lease = 300
+		self._wakeup = threading.Event()
+		self._stop = threading.Event()
+		self._thread = None
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		self.max_attempts = app.config['CALENDAR_SYNC_MAX_ATTEMPTS']
+		self.backoff = app.config['CALENDAR_SYNC_BACKOFF']
+		self.poll_interval = app.config['CALENDAR_SYNC_POLL_INTERVAL']
+		self.lease = app.config['CALENDAR_SYNC_LEASE']
+		app.extensions['calendar_sync'] = self
+		if app.config['CALENDAR_SYNC_ENABLED']:
+			self.start()
+
+	def start(self):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name='calendar-sync', daemon=True)
+		self._thread.start()
+		atexit.register(self.stop)
+
+	def stop(self):
+		self._stop.set()
+		self._wakeup.set()
+		if self._thread is not None:
+			self._thread.join(timeout=5)
+
+	def notify(self):
+		self._wakeup.set()
+
+	def _run(self):
+		while not self._stop.is_set():
+			try:
+				with self.app.app_context():
+					self.process_due()
+			except Exception as e:
+				logger.error(f"Calendar sync error: {e}")
+			self._wakeup.wait(self.poll_interval)
+			self._wakeup.clear()
+
+	def process_due(self, limit=20):
+		now = datetime.now()
+		due = CalendarOutbox.query.filter(
+			CalendarOutbox.status == 'pending',
+			CalendarOutbox.next_attempt_at <= now
+		).order_by(CalendarOutbox.next_attempt_at).limit(limit).all()
+		delivered = 0
+		for entry in due:
+			if self._claim(entry, now):
+				self._deliver(entry)
+				delivered += 1
+		return delivered
+
+	def _claim(self, entry, now):
+		claimed = CalendarOutbox.query.filter_by(
+			id=entry.id, status='pending', next_attempt_at=entry.next_attempt_at
+		).update({'next_attempt_at': now + timedelta(seconds=self.lease)}, synchronize_session=False)
+		db.session.commit()
+		return claimed == 1
+
+	def _deliver(self, entry):
+		db.session.refresh(entry)
+		reminder = db.session.get(Reminder, entry.reminder_id)
+		if reminder is None:
+			entry.status = 'failed'
+			entry.last_error = 'Reminder no longer exists'
+			db.session.commit()
+			logger.warning(f"Calendar sync dropped for deleted reminder {entry.reminder_id}")
+			return
+		try:
+			entry.event_link = insert_event(entry.user_id, reminder)
+		except CircuitOpen as e:
+			# Google is down: wait for the breaker without using up an attempt
+			entry.last_error = str(e)[:500]
+			entry.next_attempt_at = datetime.now() + timedelta(seconds=e.retry_in)
+			logger.info(f"Calendar sync for reminder {reminder.id} deferred: {e}")
+		except Exception as e:
+			entry.attempts += 1
+			entry.last_error = str(e)[:500]
+			if entry.attempts >= self.max_attempts or isinstance(e, MissingCredentials):
+				entry.status = 'failed'
+				reminder.sync_status = 'failed'
+			else:
+				delay = self.backoff * 2 ** (entry.attempts - 1)
+				entry.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+			logger.warning(f"Calendar sync failed for reminder {reminder.id} (attempt {entry.attempts}): {e}")
+		else:
+			entry.status = 'synced'
+			reminder.sync_status = 'synced'
+		db.session.commit()
+
+calendar_sync = CalendarSyncWorker()
+
+def init_calendar_sync(app):
+	calendar_sync.init_app(app)
@@ -0,0 +1,159 @@
+import logging
+import sys
+import threading
+import time
+from collections import deque
+import httpx
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpen(Exception):
+	"""Raised instead of calling an upstream while its breaker is open."""
+	def __init__(self, provider, retry_in):
+		super().__init__(f"{provider} is temporarily unavailable. Please try again in {max(retry_in, 1):.0f}s.")
+		self.provider = provider
+		self.retry_in = retry_in
+
+def upstream_status(error):
+	"""The HTTP status an upstream client's exception carries (requests, httpx, googleapiclient, google.api_core), or None."""
+	response = getattr(error, 'response', None)
+	if response is None:
+		response = getattr(error, 'resp', None)
+	status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+	if status is None:
+		status = getattr(error, 'code', None)
+	return status if isinstance(status, int) else None
+
+def transport_errors():
+	"""Exception types for an upstream that could not be reached or did not answer in time."""
+	errors = (requests.exceptions.RequestException, httpx.TransportError, OSError)
+	# googleapiclient's transport; only loaded once a Google client has been built
+	httplib2 = sys.modules.get('httplib2')
+	return errors + (httplib2.HttpLib2Error,) if httplib2 else errors
+
+def counts_as_failure(error):
+	"""
+	Connection errors, timeouts, throttling and 5xx count against an
+	upstream. Its other 4xx answers do not, and neither do errors raised
+	on our side (a missing API key, a bad argument), which say nothing
+	about the upstream's health.
+	"""
+	status = upstream_status(error)
+	if status is not None:
+		return status == 429 or status >= 500
+	return isinstance(error, transport_errors())
+
+class CircuitBreaker:
+	"""
+	Per-upstream circuit breaker. While closed, the outcome of the last
+	`window` calls is kept; once at least `min_calls` are in, the breaker
+	opens when the share of failed calls reaches `failure_rate` or the
+	share of calls slower than `slow_call` seconds reaches `slow_rate`.
+	While open, calls fail at once with CircuitOpen. After `open_seconds`
+	it is half open: up to `half_open_calls` probes go through, and the
+	first probe to finish closes it again (fast success) or reopens it.
+	"""
+	def __init__(self, name, window=20, min_calls=10, failure_rate=0.5, slow_call=10.0, slow_rate=0.8,
+			open_seconds=30.0, half_open_calls=1, enabled=True, clock=time.monotonic):
+		self.name = name
+		self.min_calls = min_calls
+		self.failure_rate = failure_rate
+		self.slow_call = slow_call
+		self.slow_rate = slow_rate
+		self.open_seconds = open_seconds
+		self.half_open_calls = max(half_open_calls, 1)
+		self.enabled = enabled
+		self.clock = clock
+		self.state = CLOSED
+		self.opened = 0
+		self.short_circuited = 0
+		self._calls = deque(maxlen=window)
+		self._opened_at = 0.0
+		self._probes = 0
+		self._lock = threading.Lock()
+
+	def allow(self):
+		"""
+		Admits a call or raises CircuitOpen. Returns True when the call is a
+		half-open probe; pass that on to record() or cancel().
+		"""
+		if not self.enabled:
+			return False
+		with self._lock:
+			if self.state == OPEN:
+				retry_in = self._opened_at + self.open_seconds - self.clock()
+				if retry_in > 0:
+					self.short_circuited += 1
+					raise CircuitOpen(self.name, retry_in)
+				self._transition(HALF_OPEN)
+			if self.state == HALF_OPEN:
+				if self._probes >= self.half_open_calls:
+					self.short_circuited += 1
+					raise CircuitOpen(self.name, self.open_seconds)
+				self._probes += 1
+				return True
+			return False
+
+	def cancel(self, probe):
+		"""For an admitted call that never reached the upstream (e.g. rejected by the rate limiter)."""
+		if probe:
+			with self._lock:
+				self._probes = max(self._probes - 1, 0)
+
+	def record(self, failed, seconds, probe=False):
+		if not self.enabled:
+			return
+		slow = not failed and seconds >= self.slow_call
+		with self._lock:
+			if probe:
+				self._probes = max(self._probes - 1, 0)
+				if self.state == HALF_OPEN:
+					self._transition(OPEN if failed or slow else CLOSED)
+				return
+			if self.state != CLOSED:
+				# A call admitted before the breaker opened
+				return
+			self._calls.append((failed, slow))
+			if len(self._calls) < self.min_calls:
+				return
+			failures = sum(1 for call_failed, _ in self._calls if call_failed) / len(self._calls)
+			slow_calls = sum(1 for _, call_slow in self._calls if call_slow) / len(self._calls)
+			if failures >= self.failure_rate or slow_calls >= self.slow_rate:
+				self._transition(OPEN)
+
+	def _transition(self, state):
+		previous, self.state = self.state, state
+		if state == OPEN:
+			self.opened += 1
+			self._opened_at = self.clock()
+			self._probes = 0
+			logger.warning(f"{self.name} circuit opened", extra={'upstream': self.name, 'previous_state': previous})
+		elif state == CLOSED:
+			self._calls.clear()
+			logger.info(f"{self.name} circuit closed", extra={'upstream': self.name})
+
+	def reset(self):
+		with self._lock:
+			self.state = CLOSED
+			self._calls.clear()
+			self._probes = 0
+
+	def snapshot(self):
+		with self._lock:
+			calls = len(self._calls)
+			snapshot = {
+				'state': self.state if self.enabled else 'disabled',
+				'recent_calls': calls,
+				'failure_rate': round(sum(1 for failed, _ in self._calls if failed) / calls, 2) if calls else 0.0,
+				'slow_rate': round(sum(1 for _, slow in self._calls if slow) / calls, 2) if calls else 0.0,
+				'opened': self.opened,
+				'short_circuited': self.short_circuited
+			}
+			if self.state == OPEN:
+				snapshot['retry_in_s'] = round(max(self._opened_at + self.open_seconds - self.clock(), 0.0), 1)
+			return snapshot
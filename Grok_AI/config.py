@@ -6,19 +6,136 @@ class Config:
 	SECRET_KEY = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
     
 	# Session configuration
-	SESSION_TYPE = 'filesystem'
+	SESSION_TYPE = os.getenv('SESSION_TYPE', 'sqlalchemy')  # 'sqlalchemy' (sessions table in the app database) or 'redis'
+	SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+	SESSION_SERIALIZATION_FORMAT = 'msgpack'
+	SESSION_CLEANUP_INTERVAL = int(os.getenv('SESSION_CLEANUP_INTERVAL', 3600))  # seconds between expired-row sweeps; 0 disables
 	PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
 	# Google OAuth configuration
 	GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 	GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
+	GOOGLE_AUTH_URI = os.getenv('GOOGLE_AUTH_URI', 'https://accounts.google.com/o/oauth2/auth')
+	GOOGLE_TOKEN_URI = os.getenv('GOOGLE_TOKEN_URI', 'https://oauth2.googleapis.com/token')
+	GOOGLE_API_ROOT_URL = os.getenv('GOOGLE_API_ROOT_URL', '')  # Gmail, Calendar and user info; empty keeps each API's own host
+	GOOGLE_API_TIMEOUT = float(os.getenv('GOOGLE_API_TIMEOUT', 30))
+    
+	# Background Google Calendar sync (outbox worker). Off unless enabled, so imports and test runs
+	# start no thread; reminders still queue up in the outbox until a worker with it enabled runs
+	CALENDAR_SYNC_ENABLED = os.getenv('CALENDAR_SYNC_ENABLED', 'false').lower() == 'true'
+	CALENDAR_SYNC_MAX_ATTEMPTS = int(os.getenv('CALENDAR_SYNC_MAX_ATTEMPTS', 5))
+	CALENDAR_SYNC_BACKOFF = int(os.getenv('CALENDAR_SYNC_BACKOFF', 30))  # seconds, doubled per retry
+	CALENDAR_SYNC_POLL_INTERVAL = int(os.getenv('CALENDAR_SYNC_POLL_INTERVAL', 15))  # seconds
+	CALENDAR_SYNC_LEASE = int(os.getenv('CALENDAR_SYNC_LEASE', 300))  # seconds a claimed row stays hidden
+    
+	# Gemini REST API (model endpoint; :generateContent is appended)
+	GEMINI_API_URL = os.getenv('GEMINI_API_URL', 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash')
     
 	# Weather API
+	WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5/weather')
 	WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'f2a0dd0e25fb5b4ce4c6b00cc4f6aff4')
+	WEATHER_API_TIMEOUT = float(os.getenv('WEATHER_API_TIMEOUT', 10))
+	WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 600))  # seconds per city
+	WEATHER_CACHE_MAX_ENTRIES = int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 500))
+	WEATHER_STALE_TTL = int(os.getenv('WEATHER_STALE_TTL', 21600))  # seconds a reading can stand in while the API is down
+    
+	# Gmail sorting
+	EMAIL_SORT_MAX_RESULTS = int(os.getenv('EMAIL_SORT_MAX_RESULTS', 5))
+	GMAIL_LIST_PAGE_SIZE = int(os.getenv('GMAIL_LIST_PAGE_SIZE', 100))  # ids per messages.list page
+    
+	# Outbound HTTP connection pools (shared keep-alive client)
+	HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # hosts kept pooled
+	HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))  # keep-alive connections per host
+	HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+	HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+	HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+    
+	# Upstream rate limits, per process (rate in requests/second; 0 turns a limit off)
+	GEMINI_RATE_LIMIT = float(os.getenv('GEMINI_RATE_LIMIT', 5))
+	GEMINI_BURST = int(os.getenv('GEMINI_BURST', 10))
+	GEMINI_MAX_IN_FLIGHT = int(os.getenv('GEMINI_MAX_IN_FLIGHT', 16))
+	WEATHER_RATE_LIMIT = float(os.getenv('WEATHER_RATE_LIMIT', 10))
+	WEATHER_BURST = int(os.getenv('WEATHER_BURST', 20))
+	WEATHER_MAX_IN_FLIGHT = int(os.getenv('WEATHER_MAX_IN_FLIGHT', 10))
+	GOOGLE_RATE_LIMIT = float(os.getenv('GOOGLE_RATE_LIMIT', 10))  # Gmail, Calendar and OAuth user info
+	GOOGLE_BURST = int(os.getenv('GOOGLE_BURST', 20))
+	GOOGLE_MAX_IN_FLIGHT = int(os.getenv('GOOGLE_MAX_IN_FLIGHT', 10))
+	RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 10))  # seconds queued before giving up
+	RETRY_BACKOFF_BASE = float(os.getenv('RETRY_BACKOFF_BASE', 0.5))  # seconds, doubled per retry, with jitter
+	RETRY_BACKOFF_MAX = float(os.getenv('RETRY_BACKOFF_MAX', 8))
+	RETRY_MAX_SLEEP = float(os.getenv('RETRY_MAX_SLEEP', 1))  # longest pause a worker thread takes between attempts; longer fails fast
+	GOOGLE_API_RETRIES = int(os.getenv('GOOGLE_API_RETRIES', 2))  # num_retries for googleapiclient calls
+    
+	# Upstream circuit breakers, per process: open when too many recent calls fail or are slow
+	BREAKER_ENABLED = os.getenv('BREAKER_ENABLED', 'true').lower() == 'true'
+	BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', 20))  # recent calls judged per upstream
+	BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 10))  # calls in the window before it can open
+	BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))  # errors, timeouts, 429s and 5xx
+	BREAKER_SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', 0.8))
+	BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 30))  # failing fast before a half-open probe
+	BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', 1))  # probes let through at once
+	GEMINI_SLOW_CALL = float(os.getenv('GEMINI_SLOW_CALL', 15))  # seconds; includes streaming the answer
+	WEATHER_SLOW_CALL = float(os.getenv('WEATHER_SLOW_CALL', 3))
+	GOOGLE_SLOW_CALL = float(os.getenv('GOOGLE_SLOW_CALL', 10))
+    
+	# ASGI mode (asgi.py): async upstream client and the thread pool for Flask routes
+	ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 200))  # upstream calls in flight
+	ASYNC_HTTP_MAX_KEEPALIVE = int(os.getenv('ASYNC_HTTP_MAX_KEEPALIVE', 50))
+	ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 20))  # threads serving the remaining Flask routes
+    
+	# Gemini response cache ('memory' or 'sqlite' next to assistant.db)
+	AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+	AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'memory')
+	AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 3600))  # seconds
+	AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 1000))
+	AI_CACHE_PATH = os.getenv('AI_CACHE_PATH')  # defaults to instance/ai_cache.db
     
 	# Database
 	SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///assistant.db')
 	SQLALCHEMY_TRACK_MODIFICATIONS = False
+	STATS_COUNTERS_ENABLED = os.getenv('STATS_COUNTERS_ENABLED', 'false').lower() == 'true'  # materialized per-user counters
+	DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'default')  # 'production' (set it in deployments) applies the tuning below; 'default' leaves stock settings
+	SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # readers no longer block the writer
+	SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # fsync at checkpoints, not every commit
+	SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # ms a writer waits for the lock
+	SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes of the file read through mmap
+	DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+	DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+	DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+	DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+    
+	# Command history (buffered, written in batches off the request path)
+	HISTORY_BUFFER_ENABLED = os.getenv('HISTORY_BUFFER_ENABLED', 'true').lower() == 'true'
+	HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', 10000))  # entries held before new ones are dropped
+	HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 100))
+	HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 2))  # seconds
+    
+	# Compound commands ("remind me ... and what's the weather ...") run their parts in parallel
+	COMPOUND_COMMANDS_ENABLED = os.getenv('COMPOUND_COMMANDS_ENABLED', 'true').lower() == 'true'
+	COMPOUND_MAX_PARTS = int(os.getenv('COMPOUND_MAX_PARTS', 4))  # the rest stays with the last part
+	COMPOUND_MAX_WORKERS = int(os.getenv('COMPOUND_MAX_WORKERS', 8))  # threads shared by all requests
+    
+	# Timezone reminder time phrases are resolved in
+	DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Asia/Kolkata')
+    
+	# Reminders API (keyset pagination)
+	REMINDERS_PAGE_SIZE = int(os.getenv('REMINDERS_PAGE_SIZE', 20))
+	REMINDERS_PAGE_MAX = int(os.getenv('REMINDERS_PAGE_MAX', 100))  # largest ?limit= accepted
+    
+	# Logging (written by a background thread; JSON lines or the plain text format)
+	LOG_FILE = os.getenv('LOG_FILE', 'assistant.log')
+	LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+	LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text'
+	LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records held before new ones are dropped
+	LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # size-based rotation
+	LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')  # e.g. 'midnight' rotates by time instead of size
+	LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    
+	# Latency metrics (/metrics) and sampled request traces (/metrics/traces)
+	METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+	METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', 2048))  # recent observations behind the /status percentiles
+	TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))  # share of requests traced; X-Trace: 1 forces one
+	TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 100))  # most recent traces kept
     
 	# Environment
 	ENV = os.getenv('FLASK_ENV', 'development')
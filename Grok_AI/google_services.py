@@ -0,0 +1,95 @@
+import json
+import threading
+from urllib.parse import urljoin
+
+SCOPES = ['https://www.googleapis.com/auth/calendar.events', 'https://www.googleapis.com/auth/gmail.modify']
+
+class GoogleServiceRegistry:
+	"""
+	Per-process registry of Google API clients.
+	The discovery document bundled with google-api-python-client is parsed
+	once per API; each call only binds the caller's credentials. Sockets are
+	kept alive on a thread-local httplib2.Http because httplib2 is not
+	thread-safe, so connections are reused but never shared between threads.
+	googleapiclient is imported on first use, since it is slow to import and
+	only Google-connected users need it. With GOOGLE_API_ROOT_URL set, the
+	documents are rebased so every client (and its batch endpoint) calls
+	that host instead, e.g. a local stub.
+	"""
+	def __init__(self, app=None):
+		self.timeout = 30
+		self.root_url = ''
+		self._documents = {}
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.timeout = app.config['GOOGLE_API_TIMEOUT']
+		self.root_url = app.config['GOOGLE_API_ROOT_URL']
+		self._documents = {}
+		app.extensions['google_services'] = self
+
+	def document(self, api, version):
+		key = (api, version)
+		document = self._documents.get(key)
+		if document is None:
+			with self._lock:
+				document = self._documents.get(key)
+				if document is None:
+					from googleapiclient.discovery_cache import get_static_doc
+					content = get_static_doc(api, version)
+					if content is None:
+						raise ValueError(f"No bundled discovery document for {api} {version}")
+					document = self._documents[key] = self._rebase(json.loads(content))
+		return document
+
+	def _rebase(self, document):
+		if not self.root_url:
+			return document
+		root = self.root_url.rstrip('/') + '/'
+		return {**document, 'rootUrl': root, 'mtlsRootUrl': root, 'baseUrl': urljoin(root, document['servicePath'])}
+
+	def _http(self):
+		http = getattr(self._local, 'http', None)
+		if http is None:
+			import httplib2
+			http = self._local.http = httplib2.Http(timeout=self.timeout)
+		return http
+
+	def service(self, api, version, credentials):
+		import google_auth_httplib2
+		from googleapiclient.discovery import build_from_document
+		authorized_http = google_auth_httplib2.AuthorizedHttp(credentials, http=self._http())
+		return build_from_document(self.document(api, version), http=authorized_http)
+
+google_services = GoogleServiceRegistry()
+
+def credentials_to_dict(credentials):
+	return {
+		'token': credentials.token,
+		'refresh_token': credentials.refresh_token,
+		'token_uri': credentials.token_uri,
+		'client_id': credentials.client_id,
+		'client_secret': credentials.client_secret,
+		'scopes': credentials.scopes,
+		# Without an expiry, Credentials.from_authorized_user_info treats the token as expired
+		'expiry': credentials.expiry.isoformat() + 'Z' if credentials.expiry else None
+	}
+
+def oauth_client(config):
+	"""
+	(client_id, client_secret) of the app's OAuth client: the one in
+	credentials.json that users sign in through, else GOOGLE_CLIENT_ID and
+	GOOGLE_CLIENT_SECRET.
+	"""
+	try:
+		with open('credentials.json', encoding='utf-8') as f:
+			client = next(iter(json.load(f).values()))
+		return client['client_id'], client['client_secret']
+	except (OSError, ValueError, KeyError, StopIteration):
+		return config['GOOGLE_CLIENT_ID'], config['GOOGLE_CLIENT_SECRET']
+
+def init_google_services(app):
+	google_services.init_app(app)
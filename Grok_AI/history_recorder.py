@@ -0,0 +1,128 @@
+import atexit
+import logging
+import queue
+import threading
+from datetime import datetime
+from models import db, CommandHistory
+
+logger = logging.getLogger(__name__)
+
+class HistoryRecorder:
+	"""
+	Buffers CommandHistory rows in memory and writes them in batches from a
+	background thread, so recording a command never commits on the request.
+	A batch is flushed once batch_size entries are waiting or every
+	flush_interval seconds, and whatever is left is flushed on shutdown.
+	The queue is bounded: when it is full new entries are dropped and counted
+	rather than blocking the request.
+	"""
+	def __init__(self, app=None):
+		self.app = None
+		self.buffered = True
+		self.batch_size = 100
+		self.flush_interval = 2.0
+		self._queue = queue.Queue(maxsize=10000)
+		self._wakeup = threading.Event()
+		self._stop = threading.Event()
+		self._thread = None
+		self._counts_lock = threading.Lock()
+		self._counts = {'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		self.buffered = app.config['HISTORY_BUFFER_ENABLED']
+		self.batch_size = app.config['HISTORY_BATCH_SIZE']
+		self.flush_interval = app.config['HISTORY_FLUSH_INTERVAL']
+		self._queue = queue.Queue(maxsize=app.config['HISTORY_QUEUE_SIZE'])
+		app.extensions['history_recorder'] = self
+		if self.buffered:
+			self.start()
+
+	def start(self):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name='history-recorder', daemon=True)
+		self._thread.start()
+		atexit.register(self.stop)
+
+	def stop(self):
+		self._stop.set()
+		self._wakeup.set()
+		if self._thread is not None:
+			self._thread.join(timeout=5)
+		with self.app.app_context():
+			self.flush()
+
+	def record(self, command, user_id):
+		entry = {'command': command, 'timestamp': datetime.now(), 'user_id': user_id}
+		if not self.buffered:
+			self._write([entry])
+			return
+		try:
+			self._queue.put_nowait(entry)
+		except queue.Full:
+			self._count('dropped')
+			logger.warning("Command history queue is full; dropping entry")
+			return
+		if self._queue.qsize() >= self.batch_size:
+			self._wakeup.set()
+
+	def flush(self):
+		"""Writes everything queued so far; returns the number of rows written."""
+		written = 0
+		while True:
+			batch = []
+			while len(batch) < self.batch_size:
+				try:
+					batch.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+			if not batch:
+				return written
+			written += self._write(batch)
+
+	def pending(self, user_id):
+		"""A user's entries still waiting in the buffer, oldest first, without writing them."""
+		with self._queue.mutex:
+			return [entry for entry in self._queue.queue if entry['user_id'] == user_id]
+
+	def stats(self):
+		with self._counts_lock:
+			return dict(self._counts, queued=self._queue.qsize())
+
+	def _count(self, name, amount=1):
+		with self._counts_lock:
+			self._counts[name] += amount
+
+	def _write(self, batch):
+		# ORM objects rather than a bulk insert, so the stats counter
+		# listeners on CommandHistory still fire
+		try:
+			db.session.add_all([CommandHistory(**entry) for entry in batch])
+			db.session.commit()
+		except Exception as e:
+			db.session.rollback()
+			self._count('failed', len(batch))
+			logger.error(f"Failed to write {len(batch)} command history entries: {e}")
+			return 0
+		self._count('written', len(batch))
+		self._count('batches')
+		return len(batch)
+
+	def _run(self):
+		while not self._stop.is_set():
+			self._wakeup.wait(self.flush_interval)
+			self._wakeup.clear()
+			try:
+				with self.app.app_context():
+					self.flush()
+			except Exception as e:
+				logger.error(f"Command history flush error: {e}")
+
+history_recorder = HistoryRecorder()
+
+def init_history_recorder(app):
+	history_recorder.init_app(app)
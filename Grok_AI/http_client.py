@@ -0,0 +1,183 @@
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+class PoolStats:
+	"""
+	Per-host counters for the outbound connection pools.
+	A hit is a request served on a kept-alive connection, a miss is a request
+	that had to open a new TCP (and TLS) connection.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._hosts = {}
+
+	def _counters(self, host):
+		return self._hosts.setdefault(host, {'requests': 0, 'new_connections': 0})
+
+	def record_request(self, host):
+		with self._lock:
+			self._counters(host)['requests'] += 1
+
+	def record_new_connection(self, host):
+		with self._lock:
+			self._counters(host)['new_connections'] += 1
+
+	def snapshot(self):
+		with self._lock:
+			return {
+				host: {
+					'requests': counters['requests'],
+					'hits': max(counters['requests'] - counters['new_connections'], 0),
+					'misses': counters['new_connections']
+				}
+				for host, counters in self._hosts.items()
+			}
+
+class _CountingPoolMixin:
+	stats = None
+
+	def urlopen(self, *args, **kwargs):
+		if self.stats is not None:
+			self.stats.record_request(self.host)
+		return super().urlopen(*args, **kwargs)
+
+	def _new_conn(self):
+		if self.stats is not None:
+			self.stats.record_new_connection(self.host)
+		return super()._new_conn()
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+	pass
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+	pass
+
+class _CountingPoolManager(PoolManager):
+	def __init__(self, *args, stats=None, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.stats = stats
+		self.pool_classes_by_scheme = {
+			'http': _CountingHTTPConnectionPool,
+			'https': _CountingHTTPSConnectionPool
+		}
+
+	def _new_pool(self, scheme, host, port, request_context=None):
+		pool = super()._new_pool(scheme, host, port, request_context)
+		pool.stats = self.stats
+		return pool
+
+class PooledAdapter(HTTPAdapter):
+	"""HTTPAdapter whose per-host urllib3 pools report hits and misses."""
+	def __init__(self, stats, **kwargs):
+		self.stats = stats
+		super().__init__(**kwargs)
+
+	def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+		self._pool_connections = connections
+		self._pool_maxsize = maxsize
+		self._pool_block = block
+		self.poolmanager = _CountingPoolManager(
+			num_pools=connections,
+			maxsize=maxsize,
+			block=block,
+			stats=self.stats,
+			**pool_kwargs
+		)
+
+class HttpClient:
+	"""
+	Shared keep-alive HTTP client for every outbound API call.
+	One requests.Session per process; urllib3 keeps a connection pool per host.
+	"""
+	def __init__(self, app=None):
+		self.stats = PoolStats()
+		self.pool_connections = 10
+		self.pool_maxsize = 10
+		self.pool_block = False
+		self.timeout = (3.05, 30)
+		self._session = None
+		self._lock = threading.Lock()
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.pool_connections = app.config['HTTP_POOL_CONNECTIONS']
+		self.pool_maxsize = app.config['HTTP_POOL_MAXSIZE']
+		self.pool_block = app.config['HTTP_POOL_BLOCK']
+		self.timeout = (app.config['HTTP_CONNECT_TIMEOUT'], app.config['HTTP_READ_TIMEOUT'])
+		self.close()
+		app.extensions['http_client'] = self
+
+	@property
+	def session(self):
+		if self._session is None:
+			with self._lock:
+				if self._session is None:
+					session = requests.Session()
+					adapter = PooledAdapter(
+						self.stats,
+						pool_connections=self.pool_connections,
+						pool_maxsize=self.pool_maxsize,
+						pool_block=self.pool_block
+					)
+					session.mount('http://', adapter)
+					session.mount('https://', adapter)
+					self._session = session
+		return self._session
+
+	def request(self, method, url, timeout=None, **kwargs):
+		return self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+
+	def get(self, url, **kwargs):
+		return self.request('GET', url, **kwargs)
+
+	def post(self, url, **kwargs):
+		return self.request('POST', url, **kwargs)
+
+	def close(self):
+		with self._lock:
+			if self._session is not None:
+				self._session.close()
+				self._session = None
+
+class AsyncHttpClient:
+	"""
+	Shared httpx.AsyncClient for the coroutine handlers in asgi.py. Created
+	on first use, inside the server's event loop, and closed on shutdown.
+	"""
+	def __init__(self, app=None):
+		self.limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+		self.timeout = httpx.Timeout(30, connect=3.05)
+		self._client = None
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.limits = httpx.Limits(
+			max_connections=app.config['ASYNC_HTTP_MAX_CONNECTIONS'],
+			max_keepalive_connections=app.config['ASYNC_HTTP_MAX_KEEPALIVE']
+		)
+		self.timeout = httpx.Timeout(app.config['HTTP_READ_TIMEOUT'], connect=app.config['HTTP_CONNECT_TIMEOUT'])
+		app.extensions['async_http_client'] = self
+
+	@property
+	def client(self):
+		if self._client is None:
+			self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+		return self._client
+
+	async def aclose(self):
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
+
+http_pool = HttpClient()
+async_http = AsyncHttpClient()
+
+def init_http_client(app):
+	http_pool.init_app(app)
+	async_http.init_app(app)
@@ -0,0 +1,123 @@
+import re
+import threading
+from logging_config import bind_log_context
+from metrics import metrics
+
+# Separators between the sub-commands of a compound command
+SPLIT_RE = re.compile(r'\s*;\s*|,?\s+(?:and\s+then|and|then)\s+', re.IGNORECASE)
+
+class IntentRouter:
+	"""
+	Keyword intent router for handle_command.
+	Every registered keyword is compiled into one case-insensitive regex with
+	word boundaries, so a command is classified in a single scan. When
+	keywords of several intents appear, the intent registered first wins,
+	matching the order of the old if/elif chain. Commands with no keyword go
+	to the default intent.
+	"""
+	def __init__(self):
+		self._intents = []
+		self._handlers = {}
+		self._continues = {}
+		self._default = None
+		self._pattern = None
+		self._hits = {}
+		self._lock = threading.Lock()
+
+	def register(self, name, keywords, handler, streaming=False, continues=None):
+		"""
+		Registers an intent. Keywords also match their plural (-s/-es);
+		streaming handlers additionally receive the stream= option.
+		continues(command, piece), if given, tells split() that `piece`
+		finishes a command of this intent even though it has keywords of
+		another ("remind me to email Sam and plan the move at 5 pm").
+		"""
+		with self._lock:
+			self._intents.append((name, list(keywords)))
+			self._handlers[name] = (handler, streaming)
+			self._continues[name] = continues
+			self._hits.setdefault(name, 0)
+			self._pattern = None
+
+	def set_default(self, name, handler, streaming=False):
+		with self._lock:
+			self._handlers[name] = (handler, streaming)
+			self._hits.setdefault(name, 0)
+			self._default = name
+
+	def _keyword_regex(self, keyword):
+		escaped = re.escape(keyword.lower())
+		return escaped.replace(r'\ ', r'\s+').replace("'", "['’]")
+
+	def _compile(self):
+		groups = []
+		for index, (name, keywords) in enumerate(self._intents):
+			alternation = '|'.join(self._keyword_regex(k) for k in sorted(keywords, key=len, reverse=True))
+			groups.append(f"(?P<i{index}>{alternation})")
+		return re.compile(rf"\b(?:{'|'.join(groups)})(?:s|es)?\b", re.IGNORECASE)
+
+	def classify(self, text, count=True):
+		"""Returns the intent for `text`; count=False leaves the hit counters alone."""
+		pattern = self._pattern
+		if pattern is None:
+			with self._lock:
+				pattern = self._pattern = self._compile()
+		best = None
+		for match in pattern.finditer(text):
+			priority = int(match.lastgroup[1:])
+			if best is None or priority < best:
+				best = priority
+				if best == 0:
+					break
+		intent = self._intents[best][0] if best is not None else self._default
+		if count:
+			self.record(intent)
+		return intent
+
+	def record(self, intent):
+		with self._lock:
+			self._hits[intent] = self._hits.get(intent, 0) + 1
+
+	def split(self, text, max_parts=None):
+		"""
+		Splits a compound command on 'and', 'then' and ';' into a list of
+		(intent, command). A piece without an intent keyword of its own
+		("... bread and milk") stays with the piece before it, as does one the
+		previous intent's continues() claims, so only real sub-commands are
+		separated; at most max_parts are returned.
+		"""
+		pieces = []
+		start = 0
+		for match in SPLIT_RE.finditer(text):
+			pieces.append((text[start:match.start()], match.group(0)))
+			start = match.end()
+		pieces.append((text[start:], ''))
+
+		parts = []  # [intent, command, separator after it]
+		for piece, separator in pieces:
+			intent = self.classify(piece, count=False)
+			if parts and (intent == self._default or len(parts) == max_parts or self._continued(parts[-1], intent, piece)):
+				parts[-1][1] += parts[-1][2] + piece
+				parts[-1][2] = separator
+			else:
+				parts.append([intent, piece, separator])
+		return [(intent, command.strip()) for intent, command, _ in parts if command.strip()]
+
+	def _continued(self, part, intent, piece):
+		previous, command, _ = part
+		continues = self._continues.get(previous)
+		return continues is not None and intent != previous and continues(command, piece)
+
+	def dispatch(self, text, **options):
+		with metrics.span('intent.classify'):
+			intent = self.classify(text)
+		bind_log_context(intent=intent)
+		handler, streaming = self._handlers[intent]
+		with metrics.span(f'intent.{intent}'):
+			if streaming:
+				return handler(text, **options)
+			return handler(text)
+
+	def stats(self):
+		with self._lock:
+			return dict(self._hits)
@@ -1,11 +1,140 @@
+import atexit
+import copy
+import json
 import logging
-import os
+import logging.handlers
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime
 
-def setup_logging():
-	logging.basicConfig(
-		filename='assistant.log',
-		level=logging.INFO,
-		format='%(asctime)s - %(levelname)s - %(message)s'
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Fields bound for the current request (request_id, user_id, intent, ...)
+_log_context = ContextVar('log_context', default={})
+
+# Attributes every LogRecord has; anything else on a record came from extra= or the context
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+def bind_log_context(**fields):
+	"""Adds fields to every record logged from this thread or task until clear_log_context()."""
+	_log_context.set({**_log_context.get(), **fields})
+
+def clear_log_context():
+	_log_context.set({})
+
+def current_log_context():
+	return dict(_log_context.get())
+
+class ContextFilter(logging.Filter):
+	def filter(self, record):
+		for key, value in _log_context.get().items():
+			if not hasattr(record, key):
+				setattr(record, key, value)
+		return True
+
+class JsonFormatter(logging.Formatter):
+	"""One JSON object per line: time, level, logger, message, then context and extra fields."""
+	def format(self, record):
+		entry = {
+			'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+			'level': record.levelname,
+			'logger': record.name,
+			'message': record.getMessage()
+		}
+		for key, value in vars(record).items():
+			if key not in _RECORD_ATTRIBUTES:
+				entry[key] = value
+		if record.exc_info:
+			entry['exc_info'] = self.formatException(record.exc_info)
+		elif record.exc_text:
+			entry['exc_info'] = record.exc_text
+		return json.dumps(entry, default=str, ensure_ascii=False)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+	"""
+	Hands records to the listener thread; the caller only pays for building
+	the record. When the queue is full, records are dropped and counted
+	rather than blocking the request.
+	"""
+	def __init__(self, log_queue):
+		super().__init__(log_queue)
+		self.dropped = 0
+
+	def prepare(self, record):
+		# Merge the message and render the traceback here, where args and exc_info are still
+		# valid. Work on a copy, as QueueHandler does, so handlers that see the record after
+		# this one still get its args and exc_info.
+		record = copy.copy(record)
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		return record
+
+	def enqueue(self, record):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+def file_handler(config):
+	"""Rotates by time when LOG_ROTATE_WHEN is set (e.g. 'midnight'), otherwise by size."""
+	if config['LOG_ROTATE_WHEN']:
+		return logging.handlers.TimedRotatingFileHandler(
+			config['LOG_FILE'], when=config['LOG_ROTATE_WHEN'], backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8'
+		)
+	return logging.handlers.RotatingFileHandler(
+		config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8'
 	)
-	logger = logging.getLogger()
-	return logger
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+def setup_logging(config=None):
+	"""
+	Root logging through a bounded queue: request threads enqueue records
+	and a background QueueListener formats them (JSON or text) and writes
+	them to a rotating log file. Safe to call again; the previous listener
+	is flushed and replaced.
+	"""
+	global _handler, _listener
+	if config is None:
+		from config import Config
+		config = {key: getattr(Config, key) for key in dir(Config) if key.startswith('LOG_')}
+
+	target = file_handler(config)
+	target.setFormatter(JsonFormatter() if config['LOG_FORMAT'] == 'json' else logging.Formatter(TEXT_FORMAT))
+	handler = DroppingQueueHandler(queue.Queue(maxsize=config['LOG_QUEUE_SIZE']))
+	handler.addFilter(ContextFilter())
+	listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+
+	root = logging.getLogger()
+	with _lock:
+		if _handler is not None:
+			root.removeHandler(_handler)
+			if _listener._thread is not None:
+				_listener.stop()
+			for previous in _listener.handlers:
+				previous.close()
+		root.setLevel(config['LOG_LEVEL'])
+		root.addHandler(handler)
+		listener.start()
+		if _listener is None:
+			atexit.register(stop_logging)
+		_handler, _listener = handler, listener
+	return root
+
+def stop_logging():
+	"""Writes out queued records and stops the listener thread."""
+	with _lock:
+		if _listener is not None and _listener._thread is not None:
+			_listener.stop()
+
+def logging_stats():
+	handler = _handler
+	if handler is None:
+		return {'queued': 0, 'dropped': 0}
+	return {'queued': handler.queue.qsize(), 'dropped': handler.dropped}
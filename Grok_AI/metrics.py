@@ -0,0 +1,207 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Seconds; upper bounds of the Prometheus histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# The sampled trace of the current request, if any
+_trace = ContextVar('trace', default=None)
+
+def _escape(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+	"""
+	A Prometheus histogram per label set, plus the last `window`
+	observations of each for live percentiles.
+	"""
+	def __init__(self, name, description, labelnames, buckets=DEFAULT_BUCKETS, window=2048):
+		self.name = name
+		self.description = description
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(buckets)
+		self.window = window
+		self._series = {}
+		self._lock = threading.Lock()
+
+	def observe(self, seconds, *labels):
+		with self._lock:
+			series = self._series.get(labels)
+			if series is None:
+				series = self._series[labels] = {
+					'counts': [0] * len(self.buckets),
+					'sum': 0.0,
+					'count': 0,
+					'recent': deque(maxlen=self.window)
+				}
+			for index, bound in enumerate(self.buckets):
+				if seconds <= bound:
+					series['counts'][index] += 1
+					break
+			series['sum'] += seconds
+			series['count'] += 1
+			series['recent'].append(seconds)
+
+	def percentiles(self):
+		"""{labels: {'count', 'p50_ms', 'p95_ms', 'p99_ms'}} over each label set's recent window."""
+		with self._lock:
+			snapshot = {labels: (series['count'], sorted(series['recent'])) for labels, series in self._series.items()}
+		result = {}
+		for labels, (count, recent) in snapshot.items():
+			summary = {'count': count}
+			for quantile in QUANTILES:
+				value = recent[min(int(len(recent) * quantile), len(recent) - 1)] if recent else 0.0
+				summary[f'p{int(quantile * 100)}_ms'] = round(value * 1000, 1)
+			result[labels] = summary
+		return result
+
+	def render(self):
+		lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+		with self._lock:
+			series = sorted((labels, list(s['counts']), s['sum'], s['count']) for labels, s in self._series.items())
+		for labels, counts, total, count in series:
+			pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+			cumulative = 0
+			for bound, bucket_count in zip(self.buckets, counts):
+				cumulative += bucket_count
+				bucket_labels = ','.join(pairs + [f'le="{bound}"'])
+				lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+			bucket_labels = ','.join(pairs + ['le="+Inf"'])
+			lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+			label_text = f"{{{','.join(pairs)}}}" if pairs else ''
+			lines.append(f"{self.name}_sum{label_text} {total}")
+			lines.append(f"{self.name}_count{label_text} {count}")
+		return lines
+
+class Metrics:
+	"""
+	Request and span latency histograms, exported in the Prometheus text
+	format, and optional per-request traces. A span times one step of a
+	request (an intent handler, an upstream call, a database statement);
+	when the request is sampled (TRACE_SAMPLE_RATE, or an X-Trace: 1
+	header), its spans are also kept in order, with their offsets, in a
+	buffer of the last TRACE_BUFFER_SIZE traces.
+	"""
+	def __init__(self, app=None):
+		self.enabled = True
+		self.sample_rate = 0.0
+		self.requests = Histogram('assistant_request_duration_seconds', 'Time to handle an HTTP request.', ['endpoint', 'method', 'status'])
+		self.spans = Histogram('assistant_span_duration_seconds', 'Time spent in one step of a request.', ['span'])
+		self.traces = deque(maxlen=100)
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.enabled = app.config['METRICS_ENABLED']
+		self.sample_rate = app.config['TRACE_SAMPLE_RATE']
+		self.requests.window = self.spans.window = app.config['METRICS_WINDOW']
+		self.traces = deque(maxlen=app.config['TRACE_BUFFER_SIZE'])
+		app.extensions['metrics'] = self
+		if self.enabled:
+			from models import db
+			with app.app_context():
+				self._instrument_engine(db.engine)
+
+	def _instrument_engine(self, engine):
+		if event.contains(engine, 'before_cursor_execute', self._before_execute):
+			return
+		event.listen(engine, 'before_cursor_execute', self._before_execute)
+		event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+	def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+		# Statements on one connection run one at a time
+		conn.info['metrics_started'] = time.perf_counter()
+
+	def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+		started = conn.info.pop('metrics_started', None)
+		if started is None:
+			return
+		operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'statement'
+		self.observe_span(f'db.{operation}', time.perf_counter() - started, started)
+
+	def observe_span(self, name, seconds, started=None):
+		if not self.enabled:
+			return
+		self.spans.observe(seconds, name)
+		trace = _trace.get()
+		if trace is not None:
+			offset = (started - trace['started']) if started is not None else None
+			trace['spans'].append({
+				'span': name,
+				'offset_ms': round(offset * 1000, 2) if offset is not None else None,
+				'duration_ms': round(seconds * 1000, 2)
+			})
+
+	@contextmanager
+	def span(self, name):
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe_span(name, time.perf_counter() - started, started)
+
+	def current_trace(self):
+		return _trace.get()
+
+	def resume_trace(self, trace):
+		"""Continues a request's trace where its work carries on, e.g. in a streamed body."""
+		_trace.set(trace)
+
+	def start_request(self, request_id, method, path, force_trace=False):
+		"""Begins a trace for this request when it is sampled."""
+		if not self.enabled:
+			return
+		if force_trace or (self.sample_rate > 0 and random.random() < self.sample_rate):
+			_trace.set({
+				'request_id': request_id,
+				'method': method,
+				'path': path,
+				'started': time.perf_counter(),
+				'spans': []
+			})
+		else:
+			_trace.set(None)
+
+	def finish_request(self, endpoint, method, status, seconds):
+		if not self.enabled:
+			return
+		self.requests.observe(seconds, endpoint or 'unknown', method, str(status))
+		trace = _trace.get()
+		if trace is not None:
+			_trace.set(None)
+			self.traces.append({
+				'request_id': trace['request_id'],
+				'method': trace['method'],
+				'path': trace['path'],
+				'status': status,
+				'duration_ms': round(seconds * 1000, 2),
+				# Spans of a streamed body are still being added after the headers are sent
+				'spans': trace['spans']
+			})
+
+	def recent_traces(self, limit=20):
+		return list(self.traces)[-limit:][::-1]
+
+	def latency_summary(self):
+		"""Live p50/p95/p99 per endpoint and per span, over the recent window."""
+		endpoints = {}
+		for (endpoint, method, status), summary in self.requests.percentiles().items():
+			endpoints[f"{method} {endpoint} {status}"] = summary
+		return {
+			'requests': endpoints,
+			'spans': {span: summary for (span,), summary in self.spans.percentiles().items()}
+		}
+
+	def render_prometheus(self):
+		return '\n'.join(self.requests.render() + self.spans.render()) + '\n'
+
+metrics = Metrics()
+
+def init_metrics(app):
+	metrics.init_app(app)
@@ -1,4 +1,14 @@
+import base64
+import json
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DateTime, case, event, func, inspect, make_url, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm.attributes import get_history
+from reminder_parser import resolve_time_phrase, to_utc_naive
 
 db = SQLAlchemy()
 
@@ -6,17 +16,390 @@ class Reminder(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
 	task = db.Column(db.String(200), nullable=False)
 	time_phrase = db.Column(db.String(100), nullable=False)
-	created_at = db.Column(db.String(50), nullable=False)
+	created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 	completed = db.Column(db.Boolean, default=False)
 	user_id = db.Column(db.String(100), nullable=True)  # For user-specific data
+	sync_status = db.Column(db.String(20), nullable=False, default='local')  # local, pending, synced or failed
+	due_at = db.Column(db.DateTime, nullable=True)  # naive UTC, resolved once from time_phrase
+	timezone = db.Column(db.String(50), nullable=True)  # IANA name the time phrase was resolved in
+
+	__table_args__ = (
+		db.Index('ix_reminder_user_created', 'user_id', 'created_at'),
+		db.Index('ix_reminder_user_due', 'user_id', 'due_at'),
+		db.Index('ix_reminder_user_open_due', 'user_id', 'completed', 'due_at'),
+	)
+
+	def due_at_local(self):
+		if self.due_at is None:
+			return None
+		return self.due_at.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(self.timezone or 'UTC'))
+
+	def to_dict(self):
+		due_at = self.due_at_local()
+		return {
+			'id': self.id,
+			'task': self.task,
+			'time_phrase': self.time_phrase,
+			'created_at': self.created_at.isoformat(),
+			'completed': self.completed,
+			'sync_status': self.sync_status,
+			'due_at': due_at.isoformat() if due_at else None
+		}
+
+class GoogleCredential(db.Model):
+	"""
+	A user's Google OAuth token, one row per user, for work done outside
+	their requests (the calendar outbox). The OAuth client id and secret
+	are not stored; they are added back from the app's client config.
+	"""
+	user_id = db.Column(db.String(100), primary_key=True)
+	credentials = db.Column(db.Text, nullable=False)  # token, refresh_token, token_uri, scopes and expiry as JSON
+	updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+class CalendarOutbox(db.Model):
+	"""Durable queue of Google Calendar inserts, drained by calendar_sync."""
+	id = db.Column(db.Integer, primary_key=True)
+	reminder_id = db.Column(db.Integer, db.ForeignKey('reminder.id'), nullable=False, index=True)
+	user_id = db.Column(db.String(100), nullable=False)  # whose GoogleCredential delivers it
+	status = db.Column(db.String(20), nullable=False, default='pending')  # pending, synced or failed
+	attempts = db.Column(db.Integer, nullable=False, default=0)
+	next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+	last_error = db.Column(db.String(500), nullable=True)
+	event_link = db.Column(db.String(500), nullable=True)
+	created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+	__table_args__ = (db.Index('ix_calendar_outbox_due', 'status', 'next_attempt_at'),)
 
 class CommandHistory(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
 	command = db.Column(db.String(200), nullable=False)
-	timestamp = db.Column(db.String(50), nullable=False)
+	timestamp = db.Column(db.DateTime, nullable=False, default=datetime.now)
 	user_id = db.Column(db.String(100), nullable=True)
 
+	__table_args__ = (db.Index('ix_command_history_user_timestamp', 'user_id', 'timestamp'),)
+
+class UserStats(db.Model):
+	"""
+	Materialized per-user counters, kept current on ORM inserts, updates and
+	deletes when STATS_COUNTERS_ENABLED (bulk Query.delete() bypasses them).
+	"""
+	user_id = db.Column(db.String(100), primary_key=True)
+	total_reminders = db.Column(db.Integer, nullable=False, default=0)
+	completed_reminders = db.Column(db.Integer, nullable=False, default=0)
+	total_commands = db.Column(db.Integer, nullable=False, default=0)
+
+def stats_counters_enabled():
+	return current_app.config.get('STATS_COUNTERS_ENABLED', False)
+
+def _bump_user_stats(connection, user_id, **deltas):
+	# Only existing rows are bumped; a missing row is seeded from the
+	# aggregate query the first time the user's stats are read
+	table = UserStats.__table__
+	connection.execute(
+		table.update()
+		.where(table.c.user_id == user_id)
+		.values({table.c[name]: table.c[name] + delta for name, delta in deltas.items()})
+	)
+
+@event.listens_for(Reminder, 'after_insert')
+def _reminder_inserted(mapper, connection, target):
+	if stats_counters_enabled():
+		_bump_user_stats(connection, target.user_id, total_reminders=1, completed_reminders=1 if target.completed else 0)
+
+@event.listens_for(Reminder, 'after_update')
+def _reminder_updated(mapper, connection, target):
+	if stats_counters_enabled():
+		history = get_history(target, 'completed')
+		if history.has_changes():
+			_bump_user_stats(connection, target.user_id, completed_reminders=1 if target.completed else -1)
+
+@event.listens_for(Reminder, 'after_delete')
+def _reminder_deleted(mapper, connection, target):
+	if stats_counters_enabled():
+		_bump_user_stats(connection, target.user_id, total_reminders=-1, completed_reminders=-1 if target.completed else 0)
+
+@event.listens_for(CommandHistory, 'after_insert')
+def _command_inserted(mapper, connection, target):
+	if stats_counters_enabled():
+		_bump_user_stats(connection, target.user_id, total_commands=1)
+
+@event.listens_for(CommandHistory, 'after_delete')
+def _command_deleted(mapper, connection, target):
+	if stats_counters_enabled():
+		_bump_user_stats(connection, target.user_id, total_commands=-1)
+
+def _insert_ignoring_conflicts(model, values):
+	"""INSERT ... ON CONFLICT DO NOTHING (INSERT IGNORE on MySQL), so racing inserts of one row don't fail."""
+	dialect = db.engine.dialect.name
+	if dialect in ('sqlite', 'postgresql'):
+		insert = (sqlite if dialect == 'sqlite' else postgresql).insert(model).values(values)
+		return insert.on_conflict_do_nothing()
+	return model.__table__.insert().values(values).prefix_with('IGNORE')
+
+def user_stats(user_id, now_utc, day_start, day_end):
+	"""
+	Dashboard and /status numbers for one user in a single SELECT.
+	Without counters: conditional counts over the user's reminders plus a
+	scalar subquery for commands. With counters: the totals come from the
+	user_stats row and only the time-dependent counts touch reminder, as
+	index range counts on (user_id, completed, due_at).
+	"""
+	open_reminder = (Reminder.completed == False) | (Reminder.completed.is_(None))
+	is_today = (Reminder.due_at >= day_start) & (Reminder.due_at < day_end)
+	counters = stats_counters_enabled()
+	if counters:
+		def reminder_count(*criteria):
+			return select(func.count()).select_from(Reminder).where(Reminder.user_id == user_id, *criteria).scalar_subquery()
+
+		row = db.session.execute(
+			select(
+				UserStats.total_reminders,
+				UserStats.completed_reminders,
+				reminder_count(is_today).label('today_reminders'),
+				reminder_count(open_reminder, Reminder.due_at >= now_utc).label('upcoming_reminders'),
+				reminder_count(open_reminder, Reminder.due_at < now_utc).label('overdue_reminders'),
+				UserStats.total_commands
+			).where(UserStats.user_id == user_id)
+		).mappings().first()
+		if row is not None:
+			return dict(row)
+
+	commands = select(func.count(CommandHistory.id)).where(CommandHistory.user_id == user_id).scalar_subquery()
+	row = db.session.execute(
+		select(
+			func.count(Reminder.id).label('total_reminders'),
+			func.coalesce(func.sum(case((Reminder.completed == True, 1), else_=0)), 0).label('completed_reminders'),
+			func.coalesce(func.sum(case((is_today, 1), else_=0)), 0).label('today_reminders'),
+			func.coalesce(func.sum(case((open_reminder & (Reminder.due_at >= now_utc), 1), else_=0)), 0).label('upcoming_reminders'),
+			func.coalesce(func.sum(case((open_reminder & (Reminder.due_at < now_utc), 1), else_=0)), 0).label('overdue_reminders'),
+			commands.label('total_commands')
+		).where(Reminder.user_id == user_id)
+	).mappings().one()
+	stats = dict(row)
+	if counters:
+		# Another request may be seeding the same user; the first row in wins
+		db.session.execute(_insert_ignoring_conflicts(UserStats, {
+			'user_id': user_id,
+			'total_reminders': stats['total_reminders'],
+			'completed_reminders': stats['completed_reminders'],
+			'total_commands': stats['total_commands']
+		}))
+		db.session.commit()
+	return stats
+
+# Keyset orderings for reminder pages: (column, newest/latest first)
+REMINDER_ORDERS = {
+	'created': (Reminder.created_at, True),
+	'due': (Reminder.due_at, False)
+}
+
+def encode_cursor(order, reminder):
+	"""Opaque cursor pointing just past `reminder` in the given ordering."""
+	column, _ = REMINDER_ORDERS[order]
+	payload = json.dumps([order, getattr(reminder, column.key).isoformat(), reminder.id])
+	return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order):
+	try:
+		payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+		cursor_order, value, reminder_id = json.loads(payload)
+		if cursor_order != order:
+			raise ValueError(f"cursor is for '{cursor_order}' order")
+		return datetime.fromisoformat(value), int(reminder_id)
+	except (ValueError, TypeError) as e:
+		raise ValueError(f"Invalid cursor: {e}")
+
+def reminders_page(user_id, order='created', cursor=None, limit=20, open_only=False):
+	"""
+	One page of a user's reminders and the cursor for the next page (None on
+	the last one). Pages continue from the (sort key, id) of the previous
+	page's last row, so every page is an index range scan however deep it is.
+	"""
+	column, descending = REMINDER_ORDERS[order]
+	query = Reminder.query.filter(Reminder.user_id == user_id)
+	if open_only:
+		query = query.filter(Reminder.completed == False)
+	key = tuple_(column, Reminder.id)
+	if cursor:
+		position = tuple_(*decode_cursor(cursor, order))
+		query = query.filter(key < position if descending else key > position)
+	if descending:
+		query = query.order_by(column.desc(), Reminder.id.desc())
+	else:
+		query = query.order_by(column, Reminder.id)
+	rows = query.limit(limit + 1).all()
+	next_cursor = encode_cursor(order, rows[limit - 1]) if len(rows) > limit else None
+	return rows[:limit], next_cursor
+
+def reminders_since(user_id, cursor, limit=100):
+	"""Reminders created after `cursor` (a 'created' cursor), oldest first."""
+	position = tuple_(*decode_cursor(cursor, 'created'))
+	return (
+		Reminder.query
+		.filter(Reminder.user_id == user_id, tuple_(Reminder.created_at, Reminder.id) > position)
+		.order_by(Reminder.created_at, Reminder.id)
+		.limit(limit)
+		.all()
+	)
+
+def add_missing_columns(table, columns):
+	"""
+	create_all() never alters existing tables, so columns added to a model
+	after a database was created are added here.
+	"""
+	existing = {column['name'] for column in inspect(db.engine).get_columns(table)}
+	with db.engine.begin() as conn:
+		for name, ddl in columns.items():
+			if name not in existing:
+				conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+def rebuild_sqlite_table(model, conversions):
+	"""
+	SQLite cannot change a column's type in place, so the table is rebuilt:
+	a copy is created from the model, rows are copied across through the SQL
+	expressions in `conversions` (which can also fill columns the old table
+	lacks), and the copy replaces the original.
+	Indexes go with the old table and are recreated by create_missing_indexes().
+	"""
+	table = model.__table__
+	existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+	columns = [column.name for column in table.columns if column.name in existing or column.name in conversions]
+	ddl = str(CreateTable(table).compile(db.engine)).replace(f'CREATE TABLE {table.name} (', f'CREATE TABLE {table.name}_new (', 1)
+	selected = ', '.join(conversions.get(name, name) for name in columns)
+	with db.engine.begin() as conn:
+		conn.execute(text(ddl))
+		conn.execute(text(f'INSERT INTO {table.name}_new ({", ".join(columns)}) SELECT {selected} FROM {table.name}'))
+		conn.execute(text(f'DROP TABLE {table.name}'))
+		conn.execute(text(f'ALTER TABLE {table.name}_new RENAME TO {table.name}'))
+
+def convert_text_timestamps():
+	"""
+	Reminder.created_at and CommandHistory.timestamp used to be text. Old
+	reminder values are full "%Y-%m-%d %H:%M:%S" strings; old history values
+	are only "%H:%M:%S", so they are dated to the day of the migration.
+	Values are rewritten in the format SQLAlchemy stores DateTime in.
+	"""
+	if db.engine.dialect.name != 'sqlite':
+		return
+	targets = [
+		(Reminder, 'created_at', "CASE WHEN length(created_at) = 19 THEN created_at || '.000000' ELSE created_at END"),
+		(CommandHistory, 'timestamp', "CASE WHEN length(timestamp) = 8 THEN date('now', 'localtime') || ' ' || timestamp || '.000000' ELSE timestamp END")
+	]
+	for model, column, conversion in targets:
+		types = {c['name']: c['type'] for c in inspect(db.engine).get_columns(model.__tablename__)}
+		if not isinstance(types[column], DateTime):
+			rebuild_sqlite_table(model, {column: conversion})
+
+def create_missing_indexes(model):
+	for index in model.__table__.indexes:
+		index.create(db.engine, checkfirst=True)
+
+def backfill_due_at(default_timezone, batch_size=500):
+	"""
+	Resolves due_at for reminders created before it existed, relative to
+	their created_at in the default timezone.
+	"""
+	tz = ZoneInfo(default_timezone)
+	while True:
+		reminders = Reminder.query.filter(Reminder.due_at.is_(None)).limit(batch_size).all()
+		if not reminders:
+			break
+		for reminder in reminders:
+			created = reminder.created_at.replace(tzinfo=tz)
+			reminder.due_at = to_utc_naive(resolve_time_phrase(reminder.time_phrase, created))
+			reminder.timezone = default_timezone
+		db.session.commit()
+
+def move_outbox_credentials():
+	"""
+	Outbox rows used to carry a full copy of the user's credentials. The
+	newest copy for each user still waiting on the outbox is kept as their
+	GoogleCredential (without the client id and secret), and the column is
+	dropped in favour of a user_id reference.
+	"""
+	columns = {column['name'] for column in inspect(db.engine).get_columns('calendar_outbox')}
+	if 'credentials' not in columns:
+		return
+	rows = db.session.execute(text(
+		"SELECT coalesce(r.user_id, 'anonymous'), o.credentials FROM calendar_outbox o JOIN reminder r ON r.id = o.reminder_id "
+		"WHERE o.status = 'pending' AND o.credentials != '' ORDER BY o.id"
+	)).all()
+	for user_id, credentials in rows:
+		info = {key: value for key, value in json.loads(credentials).items() if key not in ('client_id', 'client_secret')}
+		db.session.merge(GoogleCredential(user_id=user_id, credentials=json.dumps(info)))
+	db.session.commit()
+	user_id = "coalesce((SELECT user_id FROM reminder WHERE reminder.id = calendar_outbox.reminder_id), 'anonymous')"
+	if db.engine.dialect.name == 'sqlite':
+		rebuild_sqlite_table(CalendarOutbox, {'user_id': user_id})
+		create_missing_indexes(CalendarOutbox)
+	else:
+		with db.engine.begin() as conn:
+			conn.execute(text('ALTER TABLE calendar_outbox ADD COLUMN user_id VARCHAR(100)'))
+			conn.execute(text(f'UPDATE calendar_outbox SET user_id = {user_id}'))
+			conn.execute(text('ALTER TABLE calendar_outbox DROP COLUMN credentials'))
+
+def migrate_db(app):
+	add_missing_columns('reminder', {
+		'sync_status': "VARCHAR(20) NOT NULL DEFAULT 'local'",
+		'due_at': 'DATETIME',
+		'timezone': 'VARCHAR(50)'
+	})
+	convert_text_timestamps()
+	create_missing_indexes(Reminder)
+	create_missing_indexes(CommandHistory)
+	move_outbox_credentials()
+	backfill_due_at(app.config['DEFAULT_TIMEZONE'])
+	if not app.config['STATS_COUNTERS_ENABLED']:
+		# Counters are not maintained while disabled; drop them so they are reseeded
+		UserStats.query.delete()
+		db.session.commit()
+
+def is_memory_sqlite(uri):
+	url = make_url(uri)
+	return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def production_engine_options(config):
+	"""
+	Sized, recycled connection pool. In-memory SQLite keeps Flask-SQLAlchemy's
+	single shared connection, since every new connection would be a new database.
+	"""
+	if is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+		return {}
+	return {
+		'pool_size': config['DB_POOL_SIZE'],
+		'max_overflow': config['DB_MAX_OVERFLOW'],
+		'pool_timeout': config['DB_POOL_TIMEOUT'],
+		'pool_recycle': config['DB_POOL_RECYCLE'],
+		'pool_pre_ping': True
+	}
+
+def apply_sqlite_pragmas(engine, config):
+	"""Sets the production PRAGMAs on every new SQLite connection."""
+	pragmas = {
+		'journal_mode': config['SQLITE_JOURNAL_MODE'],
+		'synchronous': config['SQLITE_SYNCHRONOUS'],
+		'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+		'mmap_size': config['SQLITE_MMAP_SIZE']
+	}
+
+	@event.listens_for(engine, 'connect')
+	def set_pragmas(dbapi_connection, connection_record):
+		cursor = dbapi_connection.cursor()
+		for name, value in pragmas.items():
+			cursor.execute(f'PRAGMA {name} = {value}')
+		cursor.close()
+
 def init_db(app):
+	production = app.config['DATABASE_PROFILE'] == 'production'
+	if production:
+		# Explicit SQLALCHEMY_ENGINE_OPTIONS win over the profile
+		app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+			**production_engine_options(app.config),
+			**app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+		}
 	db.init_app(app)
 	with app.app_context():
+		if production and db.engine.dialect.name == 'sqlite':
+			apply_sqlite_pragmas(db.engine, app.config)
 		db.create_all()
+		migrate_db(app)
@@ -0,0 +1,376 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+import requests
+from circuit_breaker import CircuitBreaker, counts_as_failure
+from metrics import metrics
+
+# Upstreams with their own limits; each reads <NAME>_RATE_LIMIT, <NAME>_BURST and <NAME>_MAX_IN_FLIGHT
+PROVIDERS = ('gemini', 'weather', 'google')
+
+# Answers worth retrying after a pause: throttled, or briefly unavailable
+RETRY_STATUSES = {429, 502, 503, 504}
+TIMEOUTS = (requests.exceptions.Timeout, httpx.TimeoutException)
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+	"""Raised when a call would have to queue longer than the provider's max wait."""
+	def __init__(self, provider, wait):
+		super().__init__(f"{provider} is busy; a slot would take {wait:.1f}s. Please try again shortly.")
+		self.provider = provider
+		self.wait = wait
+
+class TokenBucket:
+	"""
+	`rate` tokens per second, holding at most `burst`. Callers reserve a
+	token and are told how long to wait for it, so the same bucket paces
+	worker threads (time.sleep) and coroutines (asyncio.sleep). A rate of 0
+	or less means unlimited.
+	"""
+	def __init__(self, rate, burst):
+		self.rate = rate
+		self.burst = max(burst, 1)
+		self._tokens = float(self.burst)
+		self._updated = time.monotonic()
+		self._lock = threading.Lock()
+
+	def reserve(self, max_wait=None):
+		"""Takes a token; returns seconds until it is usable, or None if that is over max_wait."""
+		if self.rate <= 0:
+			return 0.0
+		with self._lock:
+			now = time.monotonic()
+			self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+			self._updated = now
+			wait = max(0.0, (1 - self._tokens) / self.rate)
+			if max_wait is not None and wait > max_wait:
+				return None
+			# Tokens go negative while callers are queued, so later callers wait longer
+			self._tokens -= 1
+			return wait
+
+	def refund(self):
+		"""Gives back a reserved token that was never used."""
+		if self.rate <= 0:
+			return
+		with self._lock:
+			self._tokens = min(self.burst, self._tokens + 1)
+
+class LimiterStats:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.calls = 0
+		self.in_flight = 0
+		self.throttled = 0
+		self.retries = 0
+		self.rejected = 0
+		self.queue_time_total = 0.0
+		self.queue_time_max = 0.0
+
+	def record_start(self, queued):
+		with self._lock:
+			self.calls += 1
+			self.in_flight += 1
+			self.queue_time_total += queued
+			self.queue_time_max = max(self.queue_time_max, queued)
+
+	def record_end(self):
+		with self._lock:
+			self.in_flight -= 1
+
+	def record_retry(self, status=None):
+		with self._lock:
+			self.retries += 1
+			if status == 429:
+				self.throttled += 1
+
+	def record_rejected(self):
+		with self._lock:
+			self.rejected += 1
+
+	def snapshot(self):
+		with self._lock:
+			return {
+				'calls': self.calls,
+				'in_flight': self.in_flight,
+				'throttled': self.throttled,
+				'retries': self.retries,
+				'rejected': self.rejected,
+				'queue_ms_avg': round(self.queue_time_total / self.calls * 1000, 1) if self.calls else 0.0,
+				'queue_ms_max': round(self.queue_time_max * 1000, 1)
+			}
+
+class CallOutcome:
+	"""Yielded by slot(); a caller that got a failed answer (429, 5xx) without an exception sets failed."""
+	__slots__ = ('failed',)
+
+	def __init__(self):
+		self.failed = False
+
+def retry_after_seconds(value):
+	"""Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+	if not value:
+		return None
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+	try:
+		return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+	except (TypeError, ValueError):
+		return None
+
+class ProviderLimiter:
+	"""
+	Limits for one upstream: a token bucket for the request rate and a cap
+	on calls in flight. slot() waits for both, up to max_wait seconds in
+	total, and records the time spent queued. request() also retries
+	timeouts and 429/5xx answers with jittered exponential backoff, or after
+	the upstream's Retry-After when it sends one. It sleeps between attempts
+	without holding a slot, but a worker thread never sleeps longer than
+	max_retry_sleep: a longer pause fails with RateLimitExceeded instead.
+	Every call is first admitted by the upstream's
+	circuit breaker, which fails it at once with CircuitOpen during an
+	outage, and its outcome and latency are recorded there.
+	"""
+	def __init__(self, name, rate=0, burst=1, max_in_flight=0, max_wait=10.0, backoff_base=0.5, backoff_max=8.0, max_retry_sleep=1.0, breaker=None):
+		self.name = name
+		self.breaker = breaker or CircuitBreaker(name, enabled=False)
+		self.bucket = TokenBucket(rate, burst)
+		self.max_in_flight = max_in_flight
+		self.max_wait = max_wait
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.max_retry_sleep = max_retry_sleep
+		self.stats = LimiterStats()
+		self._semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+		# Coroutines queue on their own semaphore, one per event loop
+		self._async_semaphores = weakref.WeakKeyDictionary()
+
+	def backoff(self, attempt, retry_after=None):
+		"""Delay before retry number `attempt` (0-based): Retry-After if given, else full jitter."""
+		delay = retry_after_seconds(retry_after)
+		if delay is not None:
+			return min(delay, self.max_wait)
+		return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+	def _finish_call(self, queued, started, outcome, probe):
+		elapsed = time.perf_counter() - started
+		self.breaker.record(outcome.failed, elapsed, probe)
+		metrics.observe_span(f'upstream.{self.name}', elapsed, started)
+		logger.info(f"{self.name} call finished", extra={
+			'upstream': self.name,
+			'latency_ms': round(elapsed * 1000, 1),
+			'queued_ms': round(queued * 1000, 1)
+		})
+
+	def _log_retry(self, attempt, delay, status=None):
+		logger.warning(f"Retrying {self.name} call in {delay:.2f}s", extra={'upstream': self.name, 'attempt': attempt + 1, 'status': status})
+
+	def _reserve(self):
+		wait = self.bucket.reserve(self.max_wait)
+		if wait is None:
+			self.stats.record_rejected()
+			raise RateLimitExceeded(self.name, self.max_wait)
+		return wait
+
+	@contextmanager
+	def slot(self):
+		probe = self.breaker.allow()
+		start = time.monotonic()
+		try:
+			wait = self._reserve()
+			if wait:
+				time.sleep(wait)
+			if self._semaphore is not None:
+				remaining = self.max_wait - (time.monotonic() - start)
+				if not self._semaphore.acquire(timeout=max(remaining, 0)):
+					# The call is not made, so its token goes back to the bucket
+					self.bucket.refund()
+					self.stats.record_rejected()
+					raise RateLimitExceeded(self.name, time.monotonic() - start)
+		except RateLimitExceeded:
+			self.breaker.cancel(probe)
+			raise
+		queued = time.monotonic() - start
+		self.stats.record_start(queued)
+		outcome = CallOutcome()
+		started = time.perf_counter()
+		try:
+			yield outcome
+		except Exception as e:
+			outcome.failed = outcome.failed or counts_as_failure(e)
+			raise
+		finally:
+			self.stats.record_end()
+			self._finish_call(queued, started, outcome, probe)
+			if self._semaphore is not None:
+				self._semaphore.release()
+
+	@contextmanager
+	def request(self, send, attempts=3):
+		"""
+		Yields the response of send(), holding the slot until the block
+		exits so streamed bodies count as in flight. The last attempt's
+		response or timeout is passed through as is.
+		"""
+		for attempt in range(attempts):
+			last = attempt == attempts - 1
+			with self.slot() as outcome:
+				try:
+					response = send()
+				except TIMEOUTS:
+					if last:
+						raise
+					outcome.failed = True
+					self.stats.record_retry()
+					delay = self.backoff(attempt)
+					self._log_retry(attempt, delay)
+				else:
+					outcome.failed = response.status_code == 429 or response.status_code >= 500
+					if last or response.status_code not in RETRY_STATUSES:
+						with response:
+							yield response
+						return
+					self.stats.record_retry(response.status_code)
+					delay = self.backoff(attempt, response.headers.get('Retry-After'))
+					self._log_retry(attempt, delay, response.status_code)
+					response.close()
+			if delay > self.max_retry_sleep:
+				# Don't park the worker thread; the caller reports the upstream as busy
+				self.stats.record_rejected()
+				raise RateLimitExceeded(self.name, delay)
+			time.sleep(delay)
+
+	def _async_semaphore(self):
+		loop = asyncio.get_running_loop()
+		semaphore = self._async_semaphores.get(loop)
+		if semaphore is None:
+			semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+		return semaphore
+
+	@asynccontextmanager
+	async def async_slot(self):
+		probe = self.breaker.allow()
+		start = time.monotonic()
+		semaphore = self._async_semaphore() if self.max_in_flight > 0 else None
+		reserved = False
+		try:
+			wait = self._reserve()
+			reserved = True
+			if wait:
+				await asyncio.sleep(wait)
+			if semaphore is not None:
+				try:
+					await asyncio.wait_for(semaphore.acquire(), max(self.max_wait - (time.monotonic() - start), 0))
+				except asyncio.TimeoutError:
+					self.stats.record_rejected()
+					raise RateLimitExceeded(self.name, time.monotonic() - start)
+		except BaseException:
+			# Rejected or cancelled while queued: the call never reached the upstream
+			self.breaker.cancel(probe)
+			if reserved:
+				self.bucket.refund()
+			raise
+		queued = time.monotonic() - start
+		self.stats.record_start(queued)
+		outcome = CallOutcome()
+		started = time.perf_counter()
+		try:
+			yield outcome
+		except Exception as e:
+			outcome.failed = outcome.failed or counts_as_failure(e)
+			raise
+		finally:
+			self.stats.record_end()
+			self._finish_call(queued, started, outcome, probe)
+			if semaphore is not None:
+				semaphore.release()
+
+	@asynccontextmanager
+	async def async_request(self, send, attempts=3):
+		"""Coroutine version of request(); send() returns an awaitable httpx response."""
+		for attempt in range(attempts):
+			last = attempt == attempts - 1
+			async with self.async_slot() as outcome:
+				try:
+					response = await send()
+				except TIMEOUTS:
+					if last:
+						raise
+					outcome.failed = True
+					self.stats.record_retry()
+					delay = self.backoff(attempt)
+					self._log_retry(attempt, delay)
+				else:
+					outcome.failed = response.status_code == 429 or response.status_code >= 500
+					if last or response.status_code not in RETRY_STATUSES:
+						try:
+							yield response
+						finally:
+							await response.aclose()
+						return
+					self.stats.record_retry(response.status_code)
+					delay = self.backoff(attempt, response.headers.get('Retry-After'))
+					self._log_retry(attempt, delay, response.status_code)
+					await response.aclose()
+			await asyncio.sleep(delay)
+
+class RateLimiter:
+	"""
+	Per-process registry of upstream limiters and their circuit breakers,
+	configured from <PROVIDER>_* and BREAKER_* settings.
+	"""
+	def __init__(self, app=None):
+		self._limiters = {name: ProviderLimiter(name) for name in PROVIDERS}
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		config = app.config
+		for name in PROVIDERS:
+			prefix = name.upper()
+			self._limiters[name] = ProviderLimiter(
+				name,
+				rate=config[f'{prefix}_RATE_LIMIT'],
+				burst=config[f'{prefix}_BURST'],
+				max_in_flight=config[f'{prefix}_MAX_IN_FLIGHT'],
+				max_wait=config['RATE_LIMIT_MAX_WAIT'],
+				backoff_base=config['RETRY_BACKOFF_BASE'],
+				backoff_max=config['RETRY_BACKOFF_MAX'],
+				max_retry_sleep=config['RETRY_MAX_SLEEP'],
+				breaker=CircuitBreaker(
+					name,
+					window=config['BREAKER_WINDOW'],
+					min_calls=config['BREAKER_MIN_CALLS'],
+					failure_rate=config['BREAKER_FAILURE_RATE'],
+					slow_call=config[f'{prefix}_SLOW_CALL'],
+					slow_rate=config['BREAKER_SLOW_RATE'],
+					open_seconds=config['BREAKER_OPEN_SECONDS'],
+					half_open_calls=config['BREAKER_HALF_OPEN_CALLS'],
+					enabled=config['BREAKER_ENABLED']
+				)
+			)
+		app.extensions['rate_limiter'] = self
+
+	def __getitem__(self, name):
+		return self._limiters[name]
+
+	def stats(self):
+		return {name: limiter.stats.snapshot() for name, limiter in self._limiters.items()}
+
+	def breaker_stats(self):
+		return {name: limiter.breaker.snapshot() for name, limiter in self._limiters.items()}
+
+rate_limiter = RateLimiter()
+
+def init_rate_limiter(app):
+	rate_limiter.init_app(app)
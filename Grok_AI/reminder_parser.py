@@ -0,0 +1,174 @@
+import re
+from datetime import datetime, time, timedelta, timezone
+
+DEFAULT_TIME_PHRASE = "in 1 hour"
+
+# Ordered by priority: when separate time phrases appear, the earliest pattern wins
+TIME_PATTERNS = [
+	r'at\s+\d{1,2}(?::\d{2})?(?:\s*[ap]m)?',
+	r'tomorrow',
+	r'next\s+\w+',
+	r'in\s+\d+\s+(?:hours?|minutes?|days?)',
+	r'\d{1,2}(?::\d{2})?\s*[ap]m',
+	r'today',
+	r'tonight',
+	r'this\s+\w+',
+	r'morning',
+	r'afternoon',
+	r'evening',
+	r'night'
+]
+
+FILLER_PHRASES = [
+	'remind me', 'please', 'set a reminder', 'can you', 'could you',
+	'i need', 'remember', "don't forget"
+]
+
+def _phrase_regex(phrase):
+	return re.escape(phrase).replace(r'\ ', r'\s+').replace("'", "['’]")
+
+# One tokenizer for filler phrases and every time pattern, scanned once per reminder
+TOKEN_RE = re.compile(
+	r'\b(?:(?P<filler>' + '|'.join(_phrase_regex(p) for p in sorted(FILLER_PHRASES, key=len, reverse=True)) + ')|'
+	+ '|'.join(f'(?P<t{i}>{pattern})' for i, pattern in enumerate(TIME_PATTERNS))
+	+ r')\b',
+	re.IGNORECASE
+)
+GAP_RE = re.compile(r'\s*')
+# What may sit between the pieces of the leading command ("Set a reminder for tomorrow to ...")
+FILLER_GAP_RE = re.compile(r'[\s,]*')
+TIME_GAP_RE = re.compile(r'[\s,]*(?:(?:for|at|on)\s+)?')
+LEADING_RE = re.compile(r'^(?:(?:to|for|that|about)\s+)+', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+def _time_runs(matches, text):
+	"""
+	Groups adjacent time matches ("tomorrow at 7 PM") into runs of
+	(priority, start, end), keeping the best priority seen in each run.
+	"""
+	runs = []
+	for priority, match in matches:
+		if runs and GAP_RE.fullmatch(text, runs[-1][2], match.start()):
+			best, start, _ = runs[-1]
+			runs[-1] = (min(best, priority), start, match.end())
+		else:
+			runs.append((priority, match.start(), match.end()))
+	return runs
+
+def parse_reminder_text(text):
+	"""
+	Splits a reminder command into (task, time_phrase).
+	Filler phrases and the time phrase are found in a single scan and cut out
+	by position, so the original casing of the text never matters. Filler is
+	only cut from the leading command ("Please remind me to"); the same words
+	inside the task ("remind me to remember my keys") are part of it.
+	"""
+	fillers = []
+	times = []
+	command_end = 0
+	for match in TOKEN_RE.finditer(text):
+		in_command = command_end is not None
+		if match.lastgroup == 'filler':
+			if in_command and FILLER_GAP_RE.fullmatch(text, command_end, match.start()):
+				fillers.append((match.start(), match.end()))
+				command_end = match.end()
+			else:
+				command_end = None
+		else:
+			times.append((int(match.lastgroup[1:]), match))
+			if in_command and TIME_GAP_RE.fullmatch(text, command_end, match.start()):
+				command_end = match.end()
+			else:
+				command_end = None
+
+	removed = list(fillers)
+	time_phrase = None
+	if times:
+		_, start, end = min(_time_runs(times, text), key=lambda run: run[0])
+		time_phrase = text[start:end]
+		removed.append((start, end))
+
+	pieces = []
+	position = 0
+	for start, end in sorted(removed):
+		pieces.append(text[position:start])
+		position = end
+	pieces.append(text[position:])
+
+	task = WHITESPACE_RE.sub(' ', ' '.join(pieces)).strip()
+	task = LEADING_RE.sub('', task).strip(' .!?,')
+	return task, time_phrase or DEFAULT_TIME_PHRASE
+
+def has_time_phrase(text):
+	"""True when `text` names a time of its own, rather than falling back to the default."""
+	return any(match.lastgroup != 'filler' for match in TOKEN_RE.finditer(text))
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+PART_OF_DAY = {'morning': time(9), 'afternoon': time(14), 'evening': time(18), 'night': time(21), 'tonight': time(21)}
+RELATIVE_RE = re.compile(r'\bin\s+(\d+)\s+(hour|minute|day)s?\b', re.IGNORECASE)
+CLOCK_RE = re.compile(r'\b(?:at\s+(\d{1,2})(?::(\d{2}))?(?:\s*([ap]m))?|(\d{1,2})(?::(\d{2}))?\s*([ap]m))\b', re.IGNORECASE)
+DAY_RE = re.compile(r'\b(today|tonight|tomorrow|next\s+\w+|this\s+\w+)\b', re.IGNORECASE)
+PART_RE = re.compile(r'\b(morning|afternoon|evening|night|tonight)\b', re.IGNORECASE)
+
+def _clock(match):
+	hour, minute, meridiem = (match.group(1), match.group(2), match.group(3)) if match.group(1) else match.group(4, 5, 6)
+	hour, minute = int(hour), int(minute or 0)
+	if meridiem:
+		hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+	if hour > 23 or minute > 59:
+		return None
+	return time(hour, minute)
+
+def _day_offset(word, today):
+	"""Days from today named by 'tomorrow', 'next friday', 'this week'..."""
+	word = ' '.join(word.lower().split())
+	if word in ('today', 'tonight'):
+		return 0
+	if word == 'tomorrow':
+		return 1
+	kind, _, name = word.partition(' ')
+	if name in WEEKDAYS:
+		ahead = (WEEKDAYS.index(name) - today.weekday()) % 7
+		return ahead if kind == 'this' else (ahead or 7)
+	if kind == 'next' and name == 'week':
+		return 7
+	if kind == 'next' and name == 'month':
+		return 30
+	return 0
+
+def resolve_time_phrase(time_phrase, now):
+	"""
+	Resolves a parsed time phrase to a datetime, relative to `now` (an aware
+	datetime in the user's timezone). Days without a clock time default to
+	9 AM; a bare clock time that has already passed today means tomorrow.
+	"""
+	relative = RELATIVE_RE.search(time_phrase)
+	if relative:
+		amount, unit = int(relative.group(1)), relative.group(2).lower()
+		return now + timedelta(**{f"{unit}s": amount})
+
+	day = DAY_RE.search(time_phrase)
+	clock = CLOCK_RE.search(time_phrase)
+	part = PART_RE.search(time_phrase)
+	at = _clock(clock) if clock else None
+	if at is None and part:
+		at = PART_OF_DAY[part.group(1).lower()]
+
+	if day:
+		offset = _day_offset(day.group(1), now)
+		if at is None:
+			return now + timedelta(hours=1) if offset == 0 else datetime.combine(now.date() + timedelta(days=offset), time(9), now.tzinfo)
+		return datetime.combine(now.date() + timedelta(days=offset), at, now.tzinfo)
+	if at is not None:
+		due = datetime.combine(now.date(), at, now.tzinfo)
+		return due if due > now else due + timedelta(days=1)
+	return now + timedelta(hours=1)
+
+def to_utc_naive(moment):
+	"""Due times are stored as naive UTC datetimes next to the user's timezone name."""
+	return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def local_day_bounds(now):
+	"""Naive UTC bounds of the local calendar day containing `now`."""
+	start = datetime.combine(now.date(), time(0), now.tzinfo)
+	return to_utc_naive(start), to_utc_naive(start + timedelta(days=1))
@@ -0,0 +1,75 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+from flask_session import Session
+from models import db
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+	"""
+	Server-side sessions through Flask-Session, in the app database
+	(SESSION_TYPE='sqlalchemy', a 'sessions' table) or a Redis-protocol
+	server (SESSION_TYPE='redis'). Session data is serialized as msgpack.
+	Redis expires keys through their TTL; table rows are expired by a
+	background thread every SESSION_CLEANUP_INTERVAL seconds.
+	"""
+	def __init__(self, app=None):
+		self.app = None
+		self.cleanup_interval = 3600
+		self._stop = threading.Event()
+		self._thread = None
+		if app is not None:
+			self.init_app(app)
+
+	def init_app(self, app):
+		self.app = app
+		self.cleanup_interval = app.config['SESSION_CLEANUP_INTERVAL']
+		backend = app.config['SESSION_TYPE']
+		if backend == 'sqlalchemy':
+			app.config.setdefault('SESSION_SQLALCHEMY', db)
+		elif backend == 'redis' and app.config.get('SESSION_REDIS') is None:
+			import redis
+			app.config['SESSION_REDIS'] = redis.Redis.from_url(app.config['SESSION_REDIS_URL'])
+		Session(app)
+		app.extensions['session_store'] = self
+		if backend == 'sqlalchemy' and self.cleanup_interval > 0:
+			self.start()
+
+	def start(self):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name='session-cleanup', daemon=True)
+		self._thread.start()
+		atexit.register(self.stop)
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout=5)
+
+	def delete_expired(self):
+		"""Deletes expired session rows; returns how many were removed."""
+		interface = self.app.session_interface
+		model = interface.sql_session_model
+		# Flask-Session stores expiry as naive UTC
+		deleted = model.query.filter(model.expiry <= datetime.utcnow()).delete(synchronize_session=False)
+		interface.client.session.commit()
+		return deleted
+
+	def _run(self):
+		while not self._stop.wait(self.cleanup_interval):
+			try:
+				with self.app.app_context():
+					deleted = self.delete_expired()
+				if deleted:
+					logger.info(f"Deleted {deleted} expired sessions")
+			except Exception as e:
+				logger.error(f"Session cleanup error: {e}")
+
+session_store = SessionStore()
+
+def init_session_store(app):
+	session_store.init_app(app)
@@ -0,0 +1,12 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# app.py builds its app with create_app() at import time, from the environment. Point that app
+# at a throwaway database and log file before any test imports it, so test runs never touch
+# (or drop_all) the real assistant.db and assistant.log.
+_tmpdir = tempfile.mkdtemp(prefix='assistant-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'assistant.db')}"
+os.environ['LOG_FILE'] = os.path.join(_tmpdir, 'assistant.log')
+atexit.register(shutil.rmtree, _tmpdir, ignore_errors=True)
@@ -0,0 +1,50 @@
+"""
+Golden corpus for parse_reminder_text: every combination of task, time
+phrase and phrasing template below, with the expected (task, time_phrase).
+"""
+from itertools import product
+
+TASKS = [
+	'call mom', 'submit the report', 'buy groceries', 'water the plants',
+	'pay the electricity bill', 'study for the exam', 'book train tickets',
+	'email the professor', 'pick up the laundry', 'finish the assignment',
+	'renew my passport', 'take my medicine', 'feed the cat', 'back up my laptop',
+	'practice the demo', 'call the bank', 'order a birthday cake',
+	'clean the kitchen', 'send the invoice', 'return the library books'
+]
+
+TIME_PHRASES = [
+	'at 7 PM', 'at 7:30 am', 'AT 10 PM', 'at 9', 'tomorrow', 'Tomorrow',
+	'TOMORROW', 'next Monday', 'next week', 'in 2 hours', 'in 30 minutes',
+	'in 1 hour', 'in 3 days', '5 pm', '6:45 PM', 'today', 'Today', 'tonight',
+	'this evening', 'this Friday', 'tomorrow at 8 am', 'next Monday at 9 AM',
+	'today at 6:30 pm', 'this evening at 7 pm'
+]
+
+TEMPLATES = [
+	'Remind me to {task} {time}',
+	'remind me to {task} {time}',
+	'Please remind me to {task} {time}',
+	'Can you remind me to {task} {time}',
+	'Set a reminder to {task} {time}',
+	'Remember to {task} {time}',
+	"Don't forget to {task} {time}",
+	'I need to {task} {time}',
+	'Remind me {time} to {task}',
+	'Set a reminder for {time} to {task}',
+	'{time} remind me to {task}'
+]
+
+UNTIMED_TEMPLATES = [
+	'Remind me to {task}',
+	'Please remind me to {task}.',
+	'Set a reminder to {task}',
+	"Don't forget to {task}!"
+]
+
+def cases():
+	"""Yields (text, expected_task, expected_time_phrase)."""
+	for template, task, time_phrase in product(TEMPLATES, TASKS, TIME_PHRASES):
+		yield template.format(task=task, time=time_phrase), task, time_phrase
+	for template, task in product(UNTIMED_TEMPLATES, TASKS):
+		yield template.format(task=task), task, 'in 1 hour'
@@ -1,10 +1,13 @@
+import threading
 import unittest
-from app import app, db, Reminder, CommandHistory
+from unittest import mock
+from app import app, db, split_command, Reminder, CommandHistory
+from logging_config import current_log_context
 
 class TestApp(unittest.TestCase):
 	def setUp(self):
+		# The app's database is a temporary file; see tests/__init__.py
 		app.config['TESTING'] = True
-		app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
 		self.app = app.test_client()
 		with app.app_context():
 			db.create_all()
@@ -20,6 +23,100 @@ class TestApp(unittest.TestCase):
 		self.assertEqual(data['status'], 'success')
 		self.assertIn('Reminder Created Successfully', data['response'])
 
+	def test_reminder_creation_returns_only_unseen_reminders(self):
+		first = self.app.post('/api/process_command', json={'command': 'Remind me to study at 7 PM'}).get_json()
+		self.assertEqual(first['reminder']['task'], 'study')
+		self.assertNotIn('reminders', first)
+		second = self.app.post('/api/process_command', json={
+			'command': 'Remind me to call mom tomorrow',
+			'reminders_since': first['reminders_cursor']
+		}).get_json()
+		self.assertEqual([r['task'] for r in second['reminders']], ['call mom'])
+
+	def test_reminders_api_keyset_pagination(self):
+		tasks = ['read', 'walk', 'cook', 'swim', 'nap']
+		for task in tasks:
+			self.app.post('/api/process_command', json={'command': f'Remind me to {task} tomorrow'})
+		seen = []
+		url = '/api/reminders?limit=2'
+		while url:
+			page = self.app.get(url).get_json()
+			self.assertLessEqual(len(page['reminders']), 2)
+			seen.extend(r['task'] for r in page['reminders'])
+			url = f"/api/reminders?limit=2&cursor={page['next_cursor']}" if page['next_cursor'] else None
+		self.assertEqual(seen, tasks[::-1])
+		self.assertEqual(self.app.get('/api/reminders?cursor=bogus').status_code, 400)
+
+	def test_compound_command_runs_parts_concurrently(self):
+		# Both branches must be inside their handler at the same time to pass the barrier
+		barrier = threading.Barrier(2, timeout=5)
+
+		def slow_weather(city):
+			barrier.wait()
+			return f"🌤️ {city.title()}: 30°C"
+
+		def slow_ai(prompt, api_key):
+			barrier.wait()
+			return 'Because of Rayleigh scattering.', False
+
+		with mock.patch('app.get_weather', side_effect=slow_weather), mock.patch('app.cached_ai_response', side_effect=slow_ai):
+			response = self.app.post('/api/process_command', json={
+				'command': "Remind me to submit report at 5 PM and remind me to call the bank at 6 PM and what's the weather in Delhi and ask AI why the sky is blue"
+			})
+		data = response.get_json()
+		self.assertEqual([part['intent'] for part in data['parts']], ['reminder', 'reminder', 'weather', 'ai_chat'])
+		self.assertTrue(all(part['status'] == 'success' for part in data['parts']))
+		self.assertNotIn('error', data['response'].lower())
+		self.assertEqual(data['response'].count('Reminder Created Successfully'), 2)
+		self.assertIn('Delhi: 30°C', data['response'])
+		self.assertIn('Rayleigh', data['response'])
+		self.assertIn('reminders_cursor', data)
+		with app.app_context():
+			self.assertEqual(sorted(reminder.task for reminder in Reminder.query.all()), ['call the bank', 'submit report'])
+
+	def test_trailing_time_keeps_a_reminder_whole(self):
+		with app.app_context():
+			for command in (
+				'remind me to email the landlord and plan the move tomorrow at 5 pm',
+				'remind me to buy an umbrella and check the forecast at 7 am'
+			):
+				self.assertEqual(split_command(command), [('reminder', command)])
+			self.assertEqual(split_command("remind me to buy an umbrella and what's the weather tomorrow"), [
+				('reminder', 'remind me to buy an umbrella'),
+				('weather', "what's the weather tomorrow")
+			])
+		response = self.app.post('/api/process_command', json={'command': 'remind me to email the landlord and plan the move tomorrow at 5 pm'})
+		data = response.get_json()
+		self.assertNotIn('parts', data)
+		self.assertIn('email the landlord and plan the move', data['response'])
+		self.assertIn('tomorrow at 5 pm', data['response'])
+
+	def test_compound_reminder_parts_use_their_own_sessions(self):
+		# Parts sharing one session fail intermittently, so run a few rounds
+		seen = []
+
+		def weather(city):
+			seen.append(current_log_context().get('request_id'))
+			return f"🌤️ {city.title()}: 30°C"
+
+		with mock.patch('app.get_weather', side_effect=weather):
+			for round in range(5):
+				response = self.app.post('/api/process_command', headers={'X-Request-ID': f'round-{round}'}, json={
+					'command': "remind me to pay rent at 5 PM and remind me to call mom at 6 PM and remind me to water plants at 7 PM and weather in Delhi"
+				})
+				data = response.get_json()
+				self.assertEqual([part['status'] for part in data['parts']], ['success'] * 4, data['response'])
+		self.assertEqual(seen, [f'round-{round}' for round in range(5)])
+		with app.app_context():
+			self.assertEqual(Reminder.query.count(), 15)
+
+	def test_status_counts_buffered_commands_without_writing_them(self):
+		# With flush() stubbed out, the new command can only be counted from the buffer
+		with mock.patch('app.history_recorder.flush', return_value=0):
+			before = self.app.get('/status').get_json()['total_commands']
+			self.app.post('/api/process_command', json={'command': 'help'})
+			self.assertEqual(self.app.get('/status').get_json()['total_commands'], before + 1)
+
 	def test_weather_command(self):
 		response = self.app.post('/api/process_command', json={'command': 'Weather in Chennai'})
 		self.assertEqual(response.status_code, 200)
@@ -27,5 +124,16 @@ class TestApp(unittest.TestCase):
 		self.assertEqual(data['status'], 'success')
 		self.assertIn('Chennai', data['response'])
 
+	def test_ai_answer_streams_as_server_sent_events(self):
+		with mock.patch('app.stream_ai_response', return_value=iter(['Hello', ' world'])):
+			response = self.app.post('/api/process_command', json={'command': 'Tell me a joke', 'stream': True})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.mimetype, 'text/event-stream')
+		body = response.get_data(as_text=True)
+		self.assertIn('event: start', body)
+		self.assertIn('data: {"delta": "Hello"}', body)
+		self.assertIn('data: {"delta": " world"}', body)
+		self.assertIn('event: done', body)
+
 if __name__ == '__main__':
 	unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+import httpx
+from asgi import application, flask_app
+from caching import weather_cache, async_weather_flights
+from http_client import async_http
+from models import db
+
+class TestAsgiApplication(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.upstream_calls = []
+		async_http._client = httpx.AsyncClient(transport=httpx.MockTransport(self.upstream))
+		self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url='http://testserver')
+		weather_cache.clear()
+		with flask_app.app_context():
+			db.create_all()
+
+	async def asyncTearDown(self):
+		await self.client.aclose()
+		await async_http.aclose()
+
+	async def upstream(self, request):
+		self.upstream_calls.append(request.url)
+		if 'openweathermap' in request.url.host:
+			await asyncio.sleep(0.05)
+			return httpx.Response(200, json={
+				'cod': 200, 'main': {'temp': 31, 'humidity': 70},
+				'weather': [{'description': 'haze'}], 'wind': {'speed': 4}
+			})
+		if request.url.path.endswith(':streamGenerateContent'):
+			events = ''.join(f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': t}]}}]})}\n\n" for t in ['Hi', ' there'])
+			return httpx.Response(200, text=events, headers={'content-type': 'text/event-stream'})
+		return httpx.Response(200, json={'candidates': [{'content': {'parts': [{'text': 'Paris'}]}}]})
+
+	async def test_weather_runs_on_the_async_client(self):
+		response = await self.client.post('/api/process_command', json={'command': 'Weather in Chennai'})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('Chennai: 31°C, haze', response.json()['response'])
+
+	async def test_concurrent_weather_misses_share_one_call(self):
+		coalesced = async_weather_flights.coalesced
+		await asyncio.gather(*[
+			self.client.post('/api/process_command', json={'command': 'Weather in Madurai'}) for _ in range(5)
+		])
+		self.assertEqual(len(self.upstream_calls), 1)
+		self.assertEqual(async_weather_flights.coalesced - coalesced, 4)
+
+	async def test_ai_answer_streams_as_server_sent_events(self):
+		with mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'}):
+			response = await self.client.post('/api/process_command', json={'command': 'Tell me an async joke', 'stream': True})
+		self.assertEqual(response.headers['content-type'], 'text/event-stream')
+		self.assertIn('data: {"delta": "Hi"}', response.text)
+		self.assertIn('data: {"delta": " there"}', response.text)
+		self.assertIn('event: done', response.text)
+
+	async def test_ask(self):
+		with mock.patch('asgi.GOOGLE_API_KEY', 'test-key'):
+			response = await self.client.post('/ask', json={'question': 'Capital of France (async)?'})
+		self.assertIn('Paris', response.json()['response'])
+		self.assertEqual((await self.client.post('/ask', json={})).status_code, 400)
+
+	async def test_ask_without_an_api_key(self):
+		with mock.patch('asgi.GOOGLE_API_KEY', None):
+			response = await self.client.post('/ask', json={'question': 'Is the key set (async)?'})
+		self.assertEqual(response.status_code, 500)
+		self.assertIn('GOOGLE_API_KEY is missing', response.json()['error'])
+		self.assertEqual(self.upstream_calls, [])
+
+	async def test_other_routes_go_to_flask(self):
+		response = await self.client.get('/status')
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('intents', response.json())
+		response = await self.client.post('/api/process_command', json={'command': 'help'})
+		self.assertIn('AI Personal Assistant', response.json()['response'])
+		self.assertEqual(self.upstream_calls, [])
+
+if __name__ == '__main__':
+	unittest.main()
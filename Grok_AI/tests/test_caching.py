@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from abc import ABC, abstractmethod
+from caching import MemoryCacheBackend, SQLiteCacheBackend, SingleFlight, normalize_prompt
+
+class TestNormalizePrompt(unittest.TestCase):
+	def test_equivalent_prompts_share_a_key(self):
+		self.assertEqual(normalize_prompt('What can you do?'), normalize_prompt('  what  CAN you do '))
+
+class BackendContract(ABC):
+	"""Tests every cache backend must pass; mixed into one TestCase per backend."""
+	@abstractmethod
+	def make_backend(self, max_entries, ttl):
+		"""A fresh backend holding at most max_entries, with a default ttl in seconds."""
+
+	def test_get_returns_stored_value(self):
+		backend = self.make_backend(10, 60)
+		backend.set('a', 'answer')
+		self.assertEqual(backend.get('a'), 'answer')
+		self.assertIsNone(backend.get('missing'))
+
+	def test_expired_entries_are_not_returned(self):
+		backend = self.make_backend(10, 60)
+		backend.set('a', 'answer', ttl=0.01)
+		time.sleep(0.02)
+		self.assertIsNone(backend.get('a'))
+
+	def test_least_recently_used_entry_is_evicted(self):
+		backend = self.make_backend(2, 60)
+		backend.set('a', '1')
+		time.sleep(0.01)
+		backend.set('b', '2')
+		time.sleep(0.01)
+		backend.get('a')
+		time.sleep(0.01)
+		backend.set('c', '3')
+		self.assertEqual(backend.get('a'), '1')
+		self.assertIsNone(backend.get('b'))
+		self.assertEqual(len(backend), 2)
+
+class TestMemoryCacheBackend(BackendContract, unittest.TestCase):
+	def make_backend(self, max_entries, ttl):
+		return MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+
+class TestSQLiteCacheBackend(BackendContract, unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.backend = None
+
+	def tearDown(self):
+		if self.backend is not None:
+			self.backend.close()
+		self.tmpdir.cleanup()
+
+	def make_backend(self, max_entries, ttl):
+		self.backend = SQLiteCacheBackend(os.path.join(self.tmpdir.name, 'cache.db'), max_entries=max_entries, ttl=ttl)
+		return self.backend
+
+class TestSingleFlight(unittest.TestCase):
+	def test_concurrent_calls_share_one_upstream_call(self):
+		flights = SingleFlight()
+		calls = []
+		results = []
+
+		def fetch():
+			calls.append(1)
+			time.sleep(0.1)
+			return 'sunny'
+
+		threads = [threading.Thread(target=lambda: results.append(flights.do('chennai', fetch))) for _ in range(5)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(results, ['sunny'] * 5)
+		self.assertEqual(flights.coalesced, 4)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,86 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from flask import Flask
+from calendar_sync import CalendarSyncWorker, enqueue_calendar_event
+from config import Config
+from models import db, Reminder, CalendarOutbox, GoogleCredential, init_db
+
+class TestCalendarSyncWorker(unittest.TestCase):
+	def setUp(self):
+		self.app = Flask(__name__)
+		self.app.config.from_object(Config)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+		self.app.config['CALENDAR_SYNC_ENABLED'] = False
+		init_db(self.app)
+		self.worker = CalendarSyncWorker(self.app)
+		self.ctx = self.app.app_context()
+		self.ctx.push()
+		reminder = Reminder(task='call mom', time_phrase='at 5 PM', created_at=datetime(2025, 1, 1, 10, 0), user_id='u1')
+		db.session.add(reminder)
+		db.session.flush()
+		enqueue_calendar_event(reminder, {'token': 'test-token', 'refresh_token': 'refresh', 'client_id': 'id', 'client_secret': 'secret'})
+		db.session.commit()
+		self.reminder_id = reminder.id
+
+	def tearDown(self):
+		db.session.remove()
+		db.drop_all()
+		self.ctx.pop()
+
+	def test_successful_delivery_marks_reminder_synced(self):
+		with mock.patch('calendar_sync.insert_event', return_value='https://calendar/event') as insert:
+			self.assertEqual(self.worker.process_due(), 1)
+		insert.assert_called_once()
+		entry = CalendarOutbox.query.one()
+		self.assertEqual(entry.status, 'synced')
+		self.assertEqual(entry.event_link, 'https://calendar/event')
+		self.assertEqual(insert.call_args.args[0], 'u1')
+		self.assertEqual(db.session.get(Reminder, self.reminder_id).sync_status, 'synced')
+
+	def test_credentials_are_stored_once_per_user_without_the_client_secret(self):
+		reminder = Reminder(task='feed the cat', time_phrase='at 6 PM', created_at=datetime(2025, 1, 1, 10, 0), user_id='u1')
+		db.session.add(reminder)
+		db.session.flush()
+		enqueue_calendar_event(reminder, {'token': 'other-token'})
+		db.session.commit()
+		stored, = GoogleCredential.query.all()
+		self.assertEqual(json.loads(stored.credentials)['token'], 'test-token')
+		self.assertNotIn('client_secret', stored.credentials)
+		self.assertEqual([entry.user_id for entry in CalendarOutbox.query], ['u1', 'u1'])
+
+	def test_deleted_reminder_fails_its_entry(self):
+		Reminder.query.filter_by(id=self.reminder_id).delete()
+		db.session.commit()
+		with mock.patch('calendar_sync.insert_event') as insert:
+			self.assertEqual(self.worker.process_due(), 1)
+		insert.assert_not_called()
+		entry = CalendarOutbox.query.one()
+		self.assertEqual((entry.status, entry.last_error), ('failed', 'Reminder no longer exists'))
+
+	def test_missing_credentials_fail_without_retrying(self):
+		GoogleCredential.query.delete()
+		db.session.commit()
+		self.worker.process_due()
+		entry = CalendarOutbox.query.one()
+		self.assertEqual((entry.status, entry.attempts), ('failed', 1))
+		self.assertIn('No Google credentials', entry.last_error)
+
+	def test_failures_back_off_then_give_up(self):
+		self.worker.max_attempts = 2
+		with mock.patch('calendar_sync.insert_event', side_effect=RuntimeError('calendar down')):
+			self.worker.process_due()
+			entry = CalendarOutbox.query.one()
+			self.assertEqual(entry.attempts, 1)
+			self.assertGreater(entry.next_attempt_at, datetime.now())
+			self.assertEqual(self.worker.process_due(), 0)
+			entry.next_attempt_at = datetime.now() - timedelta(seconds=1)
+			db.session.commit()
+			self.worker.process_due()
+		entry = CalendarOutbox.query.one()
+		self.assertEqual(entry.status, 'failed')
+		self.assertEqual(db.session.get(Reminder, self.reminder_id).sync_status, 'failed')
+
+if __name__ == '__main__':
+	unittest.main()
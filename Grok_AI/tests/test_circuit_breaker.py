@@ -0,0 +1,149 @@
+import io
+import unittest
+from unittest import mock
+import requests
+from circuit_breaker import CircuitBreaker, CircuitOpen, counts_as_failure
+from rate_limit import ProviderLimiter, rate_limiter
+from caching import weather_cache, weather_fallback
+from app import app, db, get_weather
+
+def make_response(status):
+	response = requests.Response()
+	response.status_code = status
+	response.raw = io.BytesIO(b'')
+	return response
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+class TestCircuitBreaker(unittest.TestCase):
+	def setUp(self):
+		self.clock = FakeClock()
+		self.breaker = CircuitBreaker('test', window=4, min_calls=4, failure_rate=0.5, slow_call=1.0, slow_rate=0.5, open_seconds=10, clock=self.clock)
+
+	def trip(self):
+		for failed in (False, False, True, True):
+			self.breaker.allow()
+			self.breaker.record(failed, 0.1)
+
+	def test_opens_on_failure_rate_and_fails_fast(self):
+		self.breaker.record(True, 0.1)
+		self.breaker.record(False, 0.1)
+		self.breaker.record(True, 0.1)
+		self.assertEqual(self.breaker.state, 'closed')
+		self.breaker.record(False, 0.1)
+		self.assertEqual(self.breaker.state, 'open')
+		with self.assertRaises(CircuitOpen) as raised:
+			self.breaker.allow()
+		self.assertEqual(raised.exception.retry_in, 10)
+		self.assertEqual(self.breaker.snapshot()['short_circuited'], 1)
+
+	def test_slow_calls_open_it(self):
+		for seconds in (2.0, 0.1, 2.0, 0.1):
+			self.breaker.record(False, seconds)
+		self.assertEqual(self.breaker.state, 'open')
+
+	def test_half_open_probe_closes_it_or_opens_it_again(self):
+		self.trip()
+		self.clock.now += 10
+		self.assertTrue(self.breaker.allow())
+		self.assertEqual(self.breaker.state, 'half_open')
+		# One probe at a time
+		with self.assertRaises(CircuitOpen):
+			self.breaker.allow()
+		self.breaker.record(True, 0.1, probe=True)
+		self.assertEqual(self.breaker.state, 'open')
+
+		self.clock.now += 10
+		probe = self.breaker.allow()
+		self.breaker.record(False, 0.1, probe)
+		self.assertEqual(self.breaker.state, 'closed')
+		self.assertFalse(self.breaker.allow())
+		self.assertEqual(self.breaker.snapshot()['opened'], 2)
+
+	def test_client_errors_do_not_count(self):
+		self.assertFalse(counts_as_failure(requests.HTTPError(response=make_response(404))))
+		self.assertTrue(counts_as_failure(requests.HTTPError(response=make_response(503))))
+		self.assertTrue(counts_as_failure(requests.HTTPError(response=make_response(429))))
+		self.assertTrue(counts_as_failure(requests.exceptions.ConnectTimeout()))
+		self.assertTrue(counts_as_failure(TimeoutError()))
+
+	def test_errors_on_our_side_do_not_count(self):
+		self.assertFalse(counts_as_failure(ValueError("GOOGLE_API_KEY is missing")))
+		self.assertFalse(counts_as_failure(KeyError('text')))
+
+	def test_limiter_stops_calling_an_upstream_that_keeps_failing(self):
+		breaker = CircuitBreaker('weather', window=2, min_calls=2, open_seconds=60)
+		limiter = ProviderLimiter('weather', backoff_base=0, breaker=breaker)
+		calls = []
+
+		def send():
+			calls.append(1)
+			return make_response(503)
+
+		with limiter.request(send, attempts=2) as response:
+			self.assertEqual(response.status_code, 503)
+		self.assertEqual(breaker.state, 'open')
+		with self.assertRaises(CircuitOpen):
+			with limiter.request(send, attempts=2):
+				pass
+		self.assertEqual(len(calls), 2)
+
+class TestDegradedResponses(unittest.TestCase):
+	def setUp(self):
+		self.client = app.test_client()
+		with app.app_context():
+			db.create_all()
+		# A configured model, so /ask gets as far as the breaker without a real key
+		self.model = mock.patch('app._gemini_model', mock.Mock())
+		self.model.start()
+		for name in ('weather', 'gemini'):
+			breaker = rate_limiter[name].breaker
+			for _ in range(breaker.min_calls):
+				breaker.record(True, 0.1)
+
+	def tearDown(self):
+		self.model.stop()
+		for name in ('weather', 'gemini'):
+			rate_limiter[name].breaker.reset()
+		weather_cache.clear()
+		weather_fallback.clear()
+
+	def test_weather_falls_back_to_the_last_reading(self):
+		weather_fallback.set('madurai', "🌤️ Madurai: 33°C, clear sky")
+		with app.app_context():
+			self.assertEqual(get_weather('Madurai'), "🌤️ Madurai: 33°C, clear sky (last known reading; live weather is unavailable right now)")
+			self.assertIn('weather is temporarily unavailable', get_weather('Salem'))
+
+	def test_ask_fails_fast_and_status_shows_the_breakers(self):
+		response = self.client.post('/ask', json={'question': 'What is a circuit breaker?'})
+		self.assertEqual(response.status_code, 503)
+		self.assertTrue(response.get_json()['degraded'])
+		self.assertIn('Retry-After', response.headers)
+
+		breakers = self.client.get('/status').get_json()['circuit_breakers']
+		self.assertEqual(breakers['gemini']['state'], 'open')
+		self.assertGreaterEqual(breakers['gemini']['short_circuited'], 1)
+		self.assertEqual(breakers['google']['state'], 'closed')
+
+class TestMissingApiKey(unittest.TestCase):
+	def tearDown(self):
+		rate_limiter['gemini'].breaker.reset()
+
+	def test_missing_key_does_not_trip_the_breaker(self):
+		client = app.test_client()
+		breaker = rate_limiter['gemini'].breaker
+		with mock.patch('app.GOOGLE_API_KEY', None), mock.patch('app._gemini_model', None):
+			for _ in range(breaker.min_calls + 1):
+				response = client.post('/ask', json={'question': 'Is the key set?'})
+				self.assertEqual(response.status_code, 500)
+				self.assertIn('GOOGLE_API_KEY is missing', response.get_json()['error'])
+		self.assertEqual(breaker.state, 'closed')
+		self.assertEqual(breaker.snapshot()['recent_calls'], 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from app import list_message_ids, fetch_subjects
+
+class FakeRequest:
+	def __init__(self, result):
+		self.result = result
+
+	def execute(self, num_retries=0):
+		return self.result
+
+class FakeMessages:
+	def __init__(self, pages):
+		self.pages = pages
+		self.list_calls = []
+		self.get_calls = []
+
+	def list(self, **kwargs):
+		self.list_calls.append(kwargs)
+		return FakeRequest(self.pages[kwargs['pageToken']])
+
+	def get(self, **kwargs):
+		self.get_calls.append(kwargs)
+		headers = [{'name': 'Subject', 'value': f"Subject {kwargs['id']}"}]
+		return FakeRequest({'payload': {'headers': headers}})
+
+class FakeBatch:
+	def __init__(self, service, callback):
+		self.service = service
+		self.callback = callback
+		self.requests = []
+
+	def add(self, request, request_id):
+		self.requests.append((request_id, request))
+
+	def execute(self):
+		self.service.batches.append(len(self.requests))
+		for request_id, request in self.requests:
+			self.callback(request_id, request.execute(), None)
+
+class FakeGmailService:
+	def __init__(self, pages):
+		self.messages_resource = FakeMessages(pages)
+		self.batches = []
+
+	def users(self):
+		return self
+
+	def messages(self):
+		return self.messages_resource
+
+	def new_batch_http_request(self, callback):
+		return FakeBatch(self, callback)
+
+class TestGmailFetching(unittest.TestCase):
+	def setUp(self):
+		self.service = FakeGmailService({
+			None: {'messages': [{'id': 'a'}, {'id': 'b'}], 'nextPageToken': 'page2'},
+			'page2': {'messages': [{'id': 'c'}, {'id': 'd'}]}
+		})
+
+	def test_list_follows_page_tokens_up_to_limit(self):
+		ids = list_message_ids(self.service, 'label:INBOX', limit=3, page_size=2)
+		self.assertEqual(ids, ['a', 'b', 'c'])
+		self.assertEqual(len(self.service.messages_resource.list_calls), 2)
+		self.assertEqual(self.service.messages_resource.list_calls[1]['maxResults'], 1)
+
+	def test_subjects_are_fetched_in_one_metadata_batch(self):
+		subjects = fetch_subjects(self.service, ['a', 'b', 'c'])
+		self.assertEqual(subjects, ['Subject a', 'Subject b', 'Subject c'])
+		self.assertEqual(self.service.batches, [3])
+		for call in self.service.messages_resource.get_calls:
+			self.assertEqual(call['format'], 'metadata')
+			self.assertEqual(call['metadataHeaders'], ['Subject'])
+
+if __name__ == '__main__':
+	unittest.main()
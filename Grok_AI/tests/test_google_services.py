@@ -0,0 +1,28 @@
+import threading
+import unittest
+from google.oauth2.credentials import Credentials
+from google_services import GoogleServiceRegistry
+
+class TestGoogleServiceRegistry(unittest.TestCase):
+	def setUp(self):
+		self.registry = GoogleServiceRegistry()
+		self.credentials = Credentials(token='test-token')
+
+	def test_discovery_document_is_parsed_once(self):
+		first = self.registry.service('calendar', 'v3', self.credentials)
+		second = self.registry.service('calendar', 'v3', Credentials(token='other-token'))
+		self.assertIs(self.registry.document('calendar', 'v3'), self.registry.document('calendar', 'v3'))
+		self.assertIsNot(first, second)
+		self.assertTrue(hasattr(first, 'events'))
+
+	def test_each_thread_gets_its_own_connection(self):
+		main_http = self.registry.service('gmail', 'v1', self.credentials)._http.http
+		worker_http = []
+		thread = threading.Thread(target=lambda: worker_http.append(self.registry.service('gmail', 'v1', self.credentials)._http.http))
+		thread.start()
+		thread.join()
+		self.assertIs(self.registry.service('gmail', 'v1', self.credentials)._http.http, main_http)
+		self.assertIsNot(worker_http[0], main_http)
+
+if __name__ == '__main__':
+	unittest.main()
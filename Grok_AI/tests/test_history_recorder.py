@@ -0,0 +1,71 @@
+import time
+import unittest
+from flask import Flask
+from config import Config
+from history_recorder import HistoryRecorder
+from models import db, CommandHistory, init_db
+
+class TestHistoryRecorder(unittest.TestCase):
+	def setUp(self):
+		self.app = Flask(__name__)
+		self.app.config.from_object(Config)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+		self.app.config['CALENDAR_SYNC_ENABLED'] = False
+		self.app.config['HISTORY_QUEUE_SIZE'] = 3
+		self.app.config['HISTORY_BATCH_SIZE'] = 2
+		self.app.config['HISTORY_FLUSH_INTERVAL'] = 60
+		init_db(self.app)
+		self.ctx = self.app.app_context()
+		self.ctx.push()
+
+	def tearDown(self):
+		self.recorder.stop()
+		db.session.remove()
+		db.drop_all()
+		self.ctx.pop()
+
+	def wait_for_rows(self, count, timeout=2):
+		deadline = time.monotonic() + timeout
+		while time.monotonic() < deadline:
+			db.session.rollback()
+			if CommandHistory.query.count() >= count:
+				break
+			time.sleep(0.01)
+		return CommandHistory.query.count()
+
+	def test_batch_size_triggers_background_flush(self):
+		self.recorder = HistoryRecorder(self.app)
+		self.recorder.record('help', 'u1')
+		self.assertEqual(CommandHistory.query.count(), 0)
+		self.recorder.record('weather in Chennai', 'u1')
+		self.assertEqual(self.wait_for_rows(2), 2)
+		self.assertEqual(self.recorder.stats()['batches'], 1)
+
+	def test_full_queue_drops_and_shutdown_flushes(self):
+		self.app.config['HISTORY_BATCH_SIZE'] = 100
+		self.recorder = HistoryRecorder(self.app)
+		for i in range(5):
+			self.recorder.record(f'command {i}', 'u1')
+		self.assertEqual(self.recorder.stats()['dropped'], 2)
+		self.recorder.stop()
+		self.assertEqual([row.command for row in CommandHistory.query.order_by(CommandHistory.id)], ['command 0', 'command 1', 'command 2'])
+		self.assertEqual(self.recorder.stats()['queued'], 0)
+
+	def test_pending_entries_are_read_without_writing_them(self):
+		self.app.config['HISTORY_BATCH_SIZE'] = 100
+		self.recorder = HistoryRecorder(self.app)
+		self.recorder.record('help', 'u1')
+		self.recorder.record('weather in Chennai', 'u2')
+		self.recorder.record('joke', 'u1')
+		self.assertEqual([entry['command'] for entry in self.recorder.pending('u1')], ['help', 'joke'])
+		self.assertEqual(CommandHistory.query.count(), 0)
+		self.assertEqual(self.recorder.stats()['queued'], 3)
+
+	def test_unbuffered_mode_writes_immediately(self):
+		self.app.config['HISTORY_BUFFER_ENABLED'] = False
+		self.recorder = HistoryRecorder(self.app)
+		self.recorder.record('help', 'u1')
+		self.assertEqual(CommandHistory.query.count(), 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,42 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import HttpClient
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		body = b'{"ok": true}'
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+class TestHttpClient(unittest.TestCase):
+	def setUp(self):
+		self.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		self.url = f"http://127.0.0.1:{self.server.server_port}/"
+		self.client = HttpClient()
+
+	def tearDown(self):
+		self.client.close()
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_connections_are_reused_across_requests(self):
+		for _ in range(3):
+			response = self.client.get(self.url)
+			self.assertEqual(response.json(), {'ok': True})
+		stats = self.client.stats.snapshot()['127.0.0.1']
+		self.assertEqual(stats['requests'], 3)
+		self.assertEqual(stats['misses'], 1)
+		self.assertEqual(stats['hits'], 2)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from intent_router import IntentRouter
+
+class TestIntentRouter(unittest.TestCase):
+	def setUp(self):
+		self.router = IntentRouter()
+		self.router.register('reminder', ['remind', "don't forget"], lambda text: 'reminder')
+		self.router.register('schedule', ['plan', 'meeting'], lambda text: 'schedule')
+		self.router.register('ai_chat', ['ai', 'ask'], lambda text, stream=False: ('ai_chat', stream), streaming=True)
+		self.router.set_default('fallback', lambda text, stream=False: ('fallback', stream), streaming=True)
+
+	def test_keywords_match_whole_words_only(self):
+		self.assertEqual(self.router.classify('Explain the rainbow to me'), 'fallback')
+		self.assertEqual(self.router.classify('What is AI?'), 'ai_chat')
+
+	def test_earlier_intent_wins_regardless_of_position(self):
+		self.assertEqual(self.router.classify('Plan the trip and remind me at 5 PM'), 'reminder')
+
+	def test_plurals_and_phrases_match(self):
+		self.assertEqual(self.router.classify('Any meetings today?'), 'schedule')
+		self.assertEqual(self.router.classify('Don’t  forget the milk'), 'reminder')
+
+	def test_dispatch_passes_options_to_streaming_handlers(self):
+		self.assertEqual(self.router.dispatch('remind me to call mom', stream=True), 'reminder')
+		self.assertEqual(self.router.dispatch('tell me a joke', stream=True), ('fallback', True))
+
+	def test_new_intents_can_be_registered_and_are_counted(self):
+		self.router.register('weather', ['weather'], lambda text: 'weather')
+		self.assertEqual(self.router.dispatch('Weather in Delhi'), 'weather')
+		self.router.classify('remind me')
+		self.assertEqual(self.router.stats()['weather'], 1)
+		self.assertEqual(self.router.stats()['reminder'], 1)
+	def test_split_compound_commands(self):
+		self.assertEqual(self.router.split('remind me to call mom at 5 PM and then plan the meeting; ask AI about rust'), [
+			('reminder', 'remind me to call mom at 5 PM'),
+			('schedule', 'plan the meeting'),
+			('ai_chat', 'ask AI about rust')
+		])
+		self.assertEqual(self.router.stats()['reminder'], 0)
+
+	def test_split_keeps_pieces_without_keywords_together(self):
+		self.assertEqual(self.router.split('remind me to buy bread and milk'), [('reminder', 'remind me to buy bread and milk')])
+		self.assertEqual(self.router.split('plan a trip and remind me and ask AI', max_parts=2), [
+			('schedule', 'plan a trip'),
+			('reminder', 'remind me and ask AI')
+		])
+
+	def test_split_lets_an_intent_claim_the_next_piece(self):
+		router = IntentRouter()
+		router.register('reminder', ['remind'], lambda text: 'reminder', continues=lambda command, piece: piece.endswith('5 pm'))
+		router.register('schedule', ['plan'], lambda text: 'schedule')
+		self.assertEqual(router.split('remind me to email Sam and plan the move at 5 pm'), [
+			('reminder', 'remind me to email Sam and plan the move at 5 pm')
+		])
+		self.assertEqual(router.split('remind me to email Sam and plan the move'), [
+			('reminder', 'remind me to email Sam'),
+			('schedule', 'plan the move')
+		])
+
+if __name__ == '__main__':
+	unittest.main()
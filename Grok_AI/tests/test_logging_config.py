@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import unittest
+import logging_config
+from logging_config import setup_logging, stop_logging, bind_log_context, clear_log_context, DroppingQueueHandler
+
+def make_config(path, **overrides):
+	config = {
+		'LOG_FILE': path,
+		'LOG_LEVEL': 'INFO',
+		'LOG_FORMAT': 'json',
+		'LOG_QUEUE_SIZE': 1000,
+		'LOG_MAX_BYTES': 1024 * 1024,
+		'LOG_ROTATE_WHEN': '',
+		'LOG_BACKUP_COUNT': 2
+	}
+	config.update(overrides)
+	return config
+
+class TestLoggingPipeline(unittest.TestCase):
+	def setUp(self):
+		self.path = os.path.join(tempfile.mkdtemp(), 'test.log')
+		self.logger = logging.getLogger('test_logging_config')
+
+	def tearDown(self):
+		clear_log_context()
+		# Back to the configuration the app runs with
+		setup_logging()
+
+	def read_records(self):
+		stop_logging()
+		with open(self.path, encoding='utf-8') as f:
+			return [json.loads(line) for line in f]
+
+	def test_records_are_json_with_request_context(self):
+		setup_logging(make_config(self.path))
+		bind_log_context(request_id='req-1', user_id='u1')
+		bind_log_context(intent='weather')
+		self.logger.info("Upstream %s answered", 'weather', extra={'upstream': 'weather', 'latency_ms': 12.5})
+		clear_log_context()
+		self.logger.info("No context")
+		first, second = self.read_records()
+		self.assertEqual(first['message'], 'Upstream weather answered')
+		self.assertEqual(first['level'], 'INFO')
+		self.assertEqual(
+			{key: first[key] for key in ('request_id', 'user_id', 'intent', 'upstream', 'latency_ms')},
+			{'request_id': 'req-1', 'user_id': 'u1', 'intent': 'weather', 'upstream': 'weather', 'latency_ms': 12.5}
+		)
+		self.assertNotIn('request_id', second)
+
+	def test_exceptions_keep_their_traceback(self):
+		setup_logging(make_config(self.path))
+		try:
+			raise ValueError('boom')
+		except ValueError:
+			self.logger.exception("Handler failed")
+		record, = self.read_records()
+		self.assertIn('ValueError: boom', record['exc_info'])
+
+	def test_size_based_rotation(self):
+		setup_logging(make_config(self.path, LOG_MAX_BYTES=2000))
+		for i in range(100):
+			self.logger.info(f"line {i}")
+		stop_logging()
+		self.assertTrue(os.path.exists(self.path + '.1'))
+		self.assertLessEqual(os.path.getsize(self.path), 2000)
+
+	def test_full_queue_drops_instead_of_blocking(self):
+		handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+		for i in range(3):
+			handler.handle(logging.makeLogRecord({'msg': f'record {i}'}))
+		self.assertEqual(handler.dropped, 2)
+		self.assertEqual(handler.queue.get_nowait().msg, 'record 0')
+
+	def test_queueing_leaves_the_record_intact(self):
+		handler = DroppingQueueHandler(queue.Queue())
+		try:
+			raise ValueError('boom')
+		except ValueError as e:
+			record = logging.makeLogRecord({'msg': 'failed %s', 'args': ('here',), 'exc_info': (ValueError, e, e.__traceback__)})
+		handler.handle(record)
+		queued = handler.queue.get_nowait()
+		self.assertEqual(queued.msg, 'failed here')
+		self.assertIn('ValueError: boom', queued.exc_text)
+		self.assertEqual(record.args, ('here',))
+		self.assertIsNotNone(record.exc_info)
+
+	def test_reconfiguring_replaces_the_handler(self):
+		setup_logging(make_config(self.path))
+		setup_logging(make_config(self.path))
+		root = logging.getLogger()
+		self.assertEqual(sum(isinstance(h, DroppingQueueHandler) for h in root.handlers), 1)
+		self.assertIs(logging_config._handler, root.handlers[-1])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from metrics import Histogram, Metrics
+from app import app, db
+
+class TestHistogram(unittest.TestCase):
+	def test_buckets_are_cumulative(self):
+		histogram = Histogram('test_seconds', 'Test.', ['span'], buckets=(0.1, 1.0))
+		for value in (0.05, 0.5, 0.7, 5):
+			histogram.observe(value, 'db')
+		lines = histogram.render()
+		self.assertIn('test_seconds_bucket{span="db",le="0.1"} 1', lines)
+		self.assertIn('test_seconds_bucket{span="db",le="1.0"} 3', lines)
+		self.assertIn('test_seconds_bucket{span="db",le="+Inf"} 4', lines)
+		self.assertIn('test_seconds_count{span="db"} 4', lines)
+		self.assertIn('# TYPE test_seconds histogram', lines)
+
+	def test_percentiles_cover_the_recent_window(self):
+		histogram = Histogram('test_seconds', 'Test.', ['span'], window=100)
+		for ms in range(1, 1001):
+			histogram.observe(ms / 1000, 'gemini')
+		summary = histogram.percentiles()[('gemini',)]
+		self.assertEqual(summary['count'], 1000)
+		self.assertEqual((summary['p50_ms'], summary['p95_ms'], summary['p99_ms']), (951.0, 996.0, 1000.0))
+
+class TestTraces(unittest.TestCase):
+	def test_only_sampled_requests_are_traced(self):
+		metrics = Metrics()
+		metrics.start_request('a', 'GET', '/status')
+		with metrics.span('intent.help'):
+			pass
+		metrics.finish_request('assistant.status_check', 'GET', 200, 0.01)
+		metrics.start_request('b', 'GET', '/status', force_trace=True)
+		with metrics.span('intent.help'):
+			pass
+		metrics.finish_request('assistant.status_check', 'GET', 200, 0.01)
+		traces = metrics.recent_traces()
+		self.assertEqual([trace['request_id'] for trace in traces], ['b'])
+		self.assertEqual([span['span'] for span in traces[0]['spans']], ['intent.help'])
+		self.assertEqual(metrics.spans.percentiles()[('intent.help',)]['count'], 2)
+
+class TestMetricsEndpoints(unittest.TestCase):
+	def setUp(self):
+		self.client = app.test_client()
+		with app.app_context():
+			db.create_all()
+
+	def test_command_spans_reach_metrics_traces_and_status(self):
+		self.client.post('/api/process_command', json={'command': 'Remind me to water plants at 6 PM'}, headers={'X-Trace': '1'})
+		trace = self.client.get('/metrics/traces').get_json()['traces'][0]
+		self.assertEqual(trace['path'], '/api/process_command')
+		spans = [span['span'] for span in trace['spans']]
+		for span in ('intent.classify', 'intent.reminder', 'db.commit', 'db.insert'):
+			self.assertIn(span, spans)
+
+		response = self.client.get('/metrics')
+		self.assertTrue(response.content_type.startswith('text/plain'))
+		text = response.get_data(as_text=True)
+		self.assertIn('assistant_request_duration_seconds_count{endpoint="assistant.process_command",method="POST",status="200"}', text)
+		self.assertIn('assistant_span_duration_seconds_bucket{span="intent.reminder",le="+Inf"}', text)
+
+		latency = self.client.get('/status').get_json()['latency']
+		self.assertIn('POST assistant.process_command 200', latency['requests'])
+		self.assertIn('p99_ms', latency['spans']['intent.reminder'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import DateTime, inspect, text
+from config import Config
+import models
+from models import db, Reminder, CommandHistory, CalendarOutbox, GoogleCredential, UserStats, init_db, user_stats
+
+class TestMigrations(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		path = os.path.join(self.tmpdir.name, 'assistant.db')
+		# Schema and a row from the original assistant.db
+		conn = sqlite3.connect(path)
+		conn.executescript("""
+			CREATE TABLE reminder (
+				id INTEGER NOT NULL, task VARCHAR(200) NOT NULL, time_phrase VARCHAR(100) NOT NULL,
+				created_at VARCHAR(50) NOT NULL, completed BOOLEAN, user_id VARCHAR(100), PRIMARY KEY (id)
+			);
+			CREATE TABLE command_history (
+				id INTEGER NOT NULL, command VARCHAR(200) NOT NULL, timestamp VARCHAR(50) NOT NULL,
+				user_id VARCHAR(100), PRIMARY KEY (id)
+			);
+			INSERT INTO reminder VALUES (1, 'call mom', 'at 5 PM', '2025-08-24 03:56:51', 0, 'u1');
+			INSERT INTO command_history VALUES (1, 'help', '03:57:10', 'u1');
+			CREATE TABLE calendar_outbox (
+				id INTEGER NOT NULL, reminder_id INTEGER NOT NULL, credentials TEXT NOT NULL, status VARCHAR(20) NOT NULL,
+				attempts INTEGER NOT NULL, next_attempt_at DATETIME NOT NULL, last_error VARCHAR(500), event_link VARCHAR(500),
+				created_at DATETIME NOT NULL, PRIMARY KEY (id), FOREIGN KEY(reminder_id) REFERENCES reminder (id)
+			);
+			INSERT INTO calendar_outbox VALUES (
+				1, 1, '{"token": "t", "refresh_token": "r", "client_id": "id", "client_secret": "secret"}', 'pending',
+				0, '2025-08-24 03:56:51.000000', NULL, NULL, '2025-08-24 03:56:51.000000'
+			);
+		""")
+		conn.close()
+		self.app = Flask(__name__)
+		self.app.config.from_object(Config)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+		self.app.config['DEFAULT_TIMEZONE'] = 'Asia/Kolkata'
+		init_db(self.app)
+
+	def tearDown(self):
+		with self.app.app_context():
+			db.session.remove()
+			db.engine.dispose()
+		self.tmpdir.cleanup()
+
+	def test_existing_reminders_are_backfilled(self):
+		with self.app.app_context():
+			reminder = db.session.get(Reminder, 1)
+			self.assertEqual(reminder.sync_status, 'local')
+			self.assertEqual(reminder.timezone, 'Asia/Kolkata')
+			# 5 PM IST on the day it was created, stored as UTC
+			self.assertEqual(reminder.due_at, datetime(2025, 8, 24, 11, 30))
+
+	def test_text_timestamps_become_datetimes(self):
+		with self.app.app_context():
+			self.assertEqual(db.session.get(Reminder, 1).created_at, datetime(2025, 8, 24, 3, 56, 51))
+			# Old history rows only kept the time of day
+			timestamp = db.session.get(CommandHistory, 1).timestamp
+			self.assertEqual((timestamp.date(), timestamp.time()), (datetime.now().date(), datetime(1, 1, 1, 3, 57, 10).time()))
+			columns = {c['name']: c['type'] for c in inspect(db.engine).get_columns('command_history')}
+			self.assertIsInstance(columns['timestamp'], DateTime)
+
+	def test_outbox_credentials_move_to_one_row_per_user(self):
+		with self.app.app_context():
+			columns = {c['name'] for c in inspect(db.engine).get_columns('calendar_outbox')}
+			self.assertNotIn('credentials', columns)
+			self.assertEqual(db.session.get(CalendarOutbox, 1).user_id, 'u1')
+			stored = json.loads(db.session.get(GoogleCredential, 'u1').credentials)
+			self.assertEqual((stored['token'], stored['refresh_token']), ('t', 'r'))
+			self.assertNotIn('client_secret', stored)
+
+	def test_composite_indexes_exist(self):
+		with self.app.app_context():
+			indexes = {i['name']: i['column_names'] for i in inspect(db.engine).get_indexes('command_history')}
+			self.assertEqual(indexes['ix_command_history_user_timestamp'], ['user_id', 'timestamp'])
+			indexes = {i['name']: i['column_names'] for i in inspect(db.engine).get_indexes('reminder')}
+			self.assertEqual(indexes['ix_reminder_user_created'], ['user_id', 'created_at'])
+
+class TestSQLiteProfile(unittest.TestCase):
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.app = Flask(__name__)
+		self.app.config.from_object(Config)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.tmpdir.name, 'assistant.db')}"
+
+	def tearDown(self):
+		with self.app.app_context():
+			db.session.remove()
+			db.engine.dispose()
+		self.tmpdir.cleanup()
+
+	def pragma(self, name):
+		with self.app.app_context():
+			return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+	def test_production_profile(self):
+		self.app.config['DATABASE_PROFILE'] = 'production'
+		init_db(self.app)
+		self.assertEqual(self.pragma('journal_mode'), 'wal')
+		self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+		self.assertEqual(self.pragma('busy_timeout'), Config.SQLITE_BUSY_TIMEOUT)
+		with self.app.app_context():
+			self.assertEqual(db.engine.pool.size(), Config.DB_POOL_SIZE)
+
+	def test_default_profile_keeps_stock_settings(self):
+		init_db(self.app)
+		self.assertEqual(self.pragma('journal_mode'), 'delete')
+
+class TestUserStats(unittest.TestCase):
+	def setUp(self):
+		self.app = Flask(__name__)
+		self.app.config.from_object(Config)
+		self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+		init_db(self.app)
+		self.ctx = self.app.app_context()
+		self.ctx.push()
+		self.now = datetime(2025, 8, 20, 12, 0)
+		self.day = (datetime(2025, 8, 20, 0, 0), datetime(2025, 8, 21, 0, 0))
+
+	def tearDown(self):
+		db.session.remove()
+		db.drop_all()
+		self.ctx.pop()
+
+	def add_reminder(self, due_at, completed=False):
+		db.session.add(Reminder(task='t', time_phrase='p', created_at=datetime(2025, 8, 20, 9, 0), user_id='u1', completed=completed, due_at=due_at))
+		db.session.commit()
+
+	def populate(self):
+		self.add_reminder(self.now + timedelta(hours=2))
+		self.add_reminder(self.now - timedelta(hours=2))
+		self.add_reminder(self.now + timedelta(days=3), completed=True)
+		db.session.add(CommandHistory(command='help', timestamp=datetime(2025, 8, 20, 9, 0), user_id='u1'))
+		db.session.commit()
+
+	def stats(self):
+		return user_stats('u1', self.now, *self.day)
+
+	def test_aggregate_query(self):
+		self.populate()
+		self.assertEqual(self.stats(), {
+			'total_reminders': 3, 'completed_reminders': 1, 'today_reminders': 2,
+			'upcoming_reminders': 1, 'overdue_reminders': 1, 'total_commands': 1
+		})
+
+	def test_counters_are_seeded_then_maintained_on_write(self):
+		self.app.config['STATS_COUNTERS_ENABLED'] = True
+		self.populate()
+		expected = self.stats()
+		self.assertEqual(db.session.get(UserStats, 'u1').total_reminders, 3)
+		self.add_reminder(self.now + timedelta(hours=1))
+		db.session.add(CommandHistory(command='help', timestamp=datetime(2025, 8, 20, 9, 1), user_id='u1'))
+		db.session.commit()
+		expected.update(total_reminders=4, today_reminders=3, upcoming_reminders=2, total_commands=2)
+		self.assertEqual(self.stats(), expected)
+
+	def test_deletes_are_counted(self):
+		self.app.config['STATS_COUNTERS_ENABLED'] = True
+		self.populate()
+		self.stats()
+		db.session.delete(Reminder.query.filter_by(completed=True).one())
+		db.session.delete(CommandHistory.query.one())
+		db.session.commit()
+		stats = db.session.get(UserStats, 'u1')
+		self.assertEqual((stats.total_reminders, stats.completed_reminders, stats.total_commands), (2, 0, 0))
+
+	def test_seeding_twice_keeps_the_first_row(self):
+		self.app.config['STATS_COUNTERS_ENABLED'] = True
+		self.populate()
+		self.stats()
+		# A second seed, as a racing request would do, is ignored rather than failing
+		db.session.execute(models._insert_ignoring_conflicts(UserStats, {'user_id': 'u1', 'total_reminders': 99}))
+		db.session.commit()
+		self.assertEqual(db.session.get(UserStats, 'u1').total_reminders, 3)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import io
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+import requests
+from rate_limit import TokenBucket, ProviderLimiter, RateLimitExceeded, retry_after_seconds
+
+def make_response(status, headers=None):
+	response = requests.Response()
+	response.status_code = status
+	response.headers.update(headers or {})
+	response.raw = io.BytesIO(b'')
+	return response
+
+class TestTokenBucket(unittest.TestCase):
+	def test_burst_then_paced(self):
+		bucket = TokenBucket(rate=10, burst=2)
+		self.assertEqual(bucket.reserve(), 0)
+		self.assertEqual(bucket.reserve(), 0)
+		self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.01)
+		# Queued callers wait behind each other
+		self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.01)
+
+	def test_reservation_over_max_wait_is_refused(self):
+		bucket = TokenBucket(rate=1, burst=1)
+		bucket.reserve()
+		self.assertIsNone(bucket.reserve(max_wait=0.5))
+		self.assertAlmostEqual(bucket.reserve(max_wait=2), 1, delta=0.01)
+
+	def test_zero_rate_is_unlimited(self):
+		bucket = TokenBucket(rate=0, burst=1)
+		self.assertEqual([bucket.reserve() for _ in range(100)], [0.0] * 100)
+
+class TestProviderLimiter(unittest.TestCase):
+	def test_in_flight_cap_and_queue_time(self):
+		limiter = ProviderLimiter('test', max_in_flight=2)
+		lock = threading.Lock()
+		state = {'in_flight': 0, 'peak': 0}
+
+		def call():
+			with limiter.slot():
+				with lock:
+					state['in_flight'] += 1
+					state['peak'] = max(state['peak'], state['in_flight'])
+				time.sleep(0.03)
+				with lock:
+					state['in_flight'] -= 1
+
+		threads = [threading.Thread(target=call) for _ in range(6)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		stats = limiter.stats.snapshot()
+		self.assertEqual(state['peak'], 2)
+		self.assertEqual(stats['calls'], 6)
+		self.assertEqual(stats['in_flight'], 0)
+		self.assertGreater(stats['queue_ms_max'], 20)
+
+	def test_slot_gives_up_after_max_wait(self):
+		limiter = ProviderLimiter('test', max_in_flight=1, max_wait=0.05)
+		with limiter.slot():
+			with self.assertRaises(RateLimitExceeded):
+				with limiter.slot():
+					pass
+		self.assertEqual(limiter.stats.snapshot()['rejected'], 1)
+
+	def test_request_honours_retry_after(self):
+		limiter = ProviderLimiter('test')
+		responses = iter([make_response(429, {'Retry-After': '0.25'}), make_response(200)])
+		with mock.patch('rate_limit.time.sleep') as sleep:
+			with limiter.request(lambda: next(responses)) as response:
+				self.assertEqual(response.status_code, 200)
+		sleep.assert_called_once_with(0.25)
+		stats = limiter.stats.snapshot()
+		self.assertEqual((stats['retries'], stats['throttled']), (1, 1))
+
+	def test_long_retry_after_fails_fast_instead_of_sleeping(self):
+		limiter = ProviderLimiter('test', max_retry_sleep=1.0)
+		send = mock.Mock(return_value=make_response(429, {'Retry-After': '8'}))
+		with mock.patch('rate_limit.time.sleep') as sleep:
+			with self.assertRaises(RateLimitExceeded):
+				with limiter.request(send):
+					pass
+		sleep.assert_not_called()
+		self.assertEqual(send.call_count, 1)
+
+	def test_slot_refunds_its_token_when_it_gives_up(self):
+		limiter = ProviderLimiter('test', rate=1, burst=2, max_in_flight=1, max_wait=0.05)
+		with limiter.slot():
+			with self.assertRaises(RateLimitExceeded):
+				with limiter.slot():
+					pass
+		# Only the call that was made used a token
+		self.assertEqual(limiter.bucket.reserve(), 0)
+
+	def test_request_retries_timeouts_then_raises(self):
+		limiter = ProviderLimiter('test', backoff_base=0.5, backoff_max=8)
+		send = mock.Mock(side_effect=requests.exceptions.ReadTimeout())
+		with mock.patch('rate_limit.time.sleep') as sleep:
+			with self.assertRaises(requests.exceptions.Timeout):
+				with limiter.request(send, attempts=3):
+					pass
+		self.assertEqual(send.call_count, 3)
+		self.assertEqual(sleep.call_count, 2)
+		for (delay,), _ in sleep.call_args_list:
+			self.assertLessEqual(delay, 1.0)
+
+	def test_last_throttled_response_is_passed_through(self):
+		limiter = ProviderLimiter('test')
+		with mock.patch('rate_limit.time.sleep'):
+			with limiter.request(lambda: make_response(503), attempts=2) as response:
+				self.assertEqual(response.status_code, 503)
+
+	def test_backoff_is_jittered_and_capped(self):
+		limiter = ProviderLimiter('test', backoff_base=0.5, backoff_max=2)
+		delays = [limiter.backoff(10) for _ in range(200)]
+		self.assertTrue(all(0 <= delay <= 2 for delay in delays))
+		self.assertGreater(len(set(delays)), 1)
+
+	def test_retry_after_accepts_http_dates(self):
+		when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+		self.assertAlmostEqual(retry_after_seconds(when), 30, delta=2)
+		self.assertEqual(retry_after_seconds('3'), 3)
+		self.assertIsNone(retry_after_seconds('soon'))
+
+class TestAsyncLimiter(unittest.IsolatedAsyncioTestCase):
+	async def test_async_slot_caps_coroutines(self):
+		limiter = ProviderLimiter('test', max_in_flight=3)
+		state = {'in_flight': 0, 'peak': 0}
+
+		async def call():
+			async with limiter.async_slot():
+				state['in_flight'] += 1
+				state['peak'] = max(state['peak'], state['in_flight'])
+				await asyncio.sleep(0.01)
+				state['in_flight'] -= 1
+
+		await asyncio.gather(*[call() for _ in range(10)])
+		self.assertEqual(state['peak'], 3)
+		self.assertEqual(limiter.stats.snapshot()['calls'], 10)
+
+if __name__ == '__main__':
+	unittest.main()
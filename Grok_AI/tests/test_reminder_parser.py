@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from reminder_parser import parse_reminder_text, resolve_time_phrase, to_utc_naive
+from tests.reminder_corpus import cases
+
+class TestReminderParser(unittest.TestCase):
+	def test_golden_corpus(self):
+		failures = []
+		total = 0
+		for text, expected_task, expected_time in cases():
+			total += 1
+			result = parse_reminder_text(text)
+			if result != (expected_task, expected_time):
+				failures.append((text, result))
+		self.assertGreater(total, 2000)
+		self.assertEqual(failures[:5], [])
+
+	def test_time_phrase_is_removed_whatever_its_case(self):
+		self.assertEqual(parse_reminder_text('Remind me to call mom TOMORROW'), ('call mom', 'TOMORROW'))
+
+	def test_adjacent_time_phrases_are_kept_together(self):
+		self.assertEqual(
+			parse_reminder_text('remind me to submit report tomorrow at 5 PM'),
+			('submit report', 'tomorrow at 5 PM')
+		)
+
+	def test_filler_words_inside_the_task_are_kept(self):
+		self.assertEqual(parse_reminder_text('remind me to remember my keys'), ('remember my keys', 'in 1 hour'))
+		self.assertEqual(
+			parse_reminder_text('remind me to ask Please about the can you project at 5 pm'),
+			('ask Please about the can you project', 'at 5 pm')
+		)
+		self.assertEqual(parse_reminder_text("I need to tell Sam i need a day off"), ('tell Sam i need a day off', 'in 1 hour'))
+
+	def test_missing_time_defaults_to_one_hour(self):
+		self.assertEqual(parse_reminder_text('Remind me to stretch'), ('stretch', 'in 1 hour'))
+
+class TestResolveTimePhrase(unittest.TestCase):
+	def setUp(self):
+		# A Wednesday afternoon in Chennai
+		self.now = datetime(2025, 8, 20, 15, 0, tzinfo=ZoneInfo('Asia/Kolkata'))
+
+	def resolve(self, phrase):
+		return resolve_time_phrase(phrase, self.now).replace(tzinfo=None)
+
+	def test_clock_times(self):
+		self.assertEqual(self.resolve('at 7 PM'), datetime(2025, 8, 20, 19, 0))
+		self.assertEqual(self.resolve('at 10 am'), datetime(2025, 8, 21, 10, 0))
+
+	def test_days_and_relative_offsets(self):
+		self.assertEqual(self.resolve('tomorrow at 8 am'), datetime(2025, 8, 21, 8, 0))
+		self.assertEqual(self.resolve('next Monday'), datetime(2025, 8, 25, 9, 0))
+		self.assertEqual(self.resolve('this evening'), datetime(2025, 8, 20, 18, 0))
+		self.assertEqual(self.resolve('in 2 hours'), datetime(2025, 8, 20, 17, 0))
+
+	def test_utc_storage(self):
+		self.assertEqual(to_utc_naive(resolve_time_phrase('at 7 PM', self.now)), datetime(2025, 8, 20, 13, 30))
+
+if __name__ == '__main__':
+	unittest.main()
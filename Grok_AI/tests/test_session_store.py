@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask, session
+from flask_sqlalchemy import SQLAlchemy
+from config import Config
+from session_store import SessionStore
+
+try:
+	import fakeredis
+except ImportError:
+	fakeredis = None
+
+def make_app(**config):
+	app = Flask(__name__)
+	app.config.from_object(Config)
+	app.config.update(SESSION_CLEANUP_INTERVAL=0, **config)
+
+	@app.route('/login/<user_id>')
+	def login(user_id):
+		session['user_id'] = user_id
+		return 'ok'
+
+	@app.route('/whoami')
+	def whoami():
+		return session.get('user_id', 'anonymous')
+
+	return app
+
+class TestSqlAlchemySessions(unittest.TestCase):
+	def setUp(self):
+		# A separate SQLAlchemy instance, so the sessions model is not defined twice on the app's db
+		self.db = SQLAlchemy()
+		self.app = make_app(SESSION_TYPE='sqlalchemy', SQLALCHEMY_DATABASE_URI='sqlite://', SESSION_SQLALCHEMY=self.db)
+		self.db.init_app(self.app)
+		self.store = SessionStore(self.app)
+		self.client = self.app.test_client()
+		self.model = self.app.session_interface.sql_session_model
+
+	def test_session_round_trip_through_the_table(self):
+		self.client.get('/login/u1')
+		self.assertEqual(self.client.get('/whoami').get_data(as_text=True), 'u1')
+		with self.app.app_context():
+			row = self.model.query.one()
+			self.assertNotIn(b'\x80', row.data[:1])  # msgpack, not pickle
+			self.assertGreater(row.expiry, datetime.utcnow())
+
+	def test_expired_rows_are_deleted(self):
+		self.client.get('/login/u1')
+		self.app.test_client().get('/login/u2')
+		with self.app.app_context():
+			self.model.query.filter_by(id=1).update({'expiry': datetime.utcnow() - timedelta(seconds=1)})
+			self.db.session.commit()
+			self.assertEqual(self.store.delete_expired(), 1)
+			self.assertEqual(self.model.query.count(), 1)
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+class TestRedisSessions(unittest.TestCase):
+	def setUp(self):
+		self.redis = fakeredis.FakeStrictRedis()
+		self.app = make_app(SESSION_TYPE='redis', SESSION_REDIS=self.redis)
+		SessionStore(self.app)
+		self.client = self.app.test_client()
+
+	def test_session_round_trip_with_ttl(self):
+		self.client.get('/login/u1')
+		self.assertEqual(self.client.get('/whoami').get_data(as_text=True), 'u1')
+		keys = self.redis.keys('session:*')
+		self.assertEqual(len(keys), 1)
+		self.assertGreater(self.redis.ttl(keys[0]), 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from flask import url_for
+import app as app_module
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestStartup(unittest.TestCase):
+	def test_import_boots_without_key_or_google_sdks(self):
+		env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}", CALENDAR_SYNC_ENABLED='false')
+		env.pop('GOOGLE_API_KEY', None)
+		result = subprocess.run(
+			[sys.executable, '-c', (
+				"import sys, app; "
+				"print(sorted(m for m in ('google.generativeai', 'googleapiclient', 'google_auth_oauthlib', 'dateutil') if m in sys.modules))"
+			)],
+			cwd=APP_DIR, env=env, capture_output=True, text=True
+		)
+		self.assertEqual(result.returncode, 0, result.stderr)
+		self.assertEqual(result.stdout.strip(), '[]')
+
+	def test_gemini_model_requires_key_on_first_use(self):
+		with mock.patch.object(app_module, 'GOOGLE_API_KEY', None), mock.patch.object(app_module, '_gemini_model', None):
+			with self.assertRaisesRegex(ValueError, 'GOOGLE_API_KEY is missing'):
+				app_module.get_gemini_model()
+			response = app_module.app.test_client().post('/ask', json={'question': 'Uncached question without a key?'})
+		self.assertEqual(response.status_code, 500)
+		self.assertIn('GOOGLE_API_KEY is missing', response.get_json()['error'])
+
+	def test_routes_live_on_the_assistant_blueprint(self):
+		with app_module.app.test_request_context():
+			self.assertEqual(url_for('assistant.dashboard'), '/dashboard')
+			self.assertEqual(url_for('assistant.list_reminders'), '/api/reminders')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from google_services import GoogleServiceRegistry
+from app import app, client_secrets_flow, credentials_to_dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from stub_upstream import StubUpstream
+
+class TestConfigurableEndpoints(unittest.TestCase):
+	def test_google_clients_and_batches_use_the_configured_root(self):
+		from google.oauth2.credentials import Credentials
+		registry = GoogleServiceRegistry()
+		registry.root_url = 'http://127.0.0.1:8090'
+		credentials = Credentials(token='token')
+		gmail = registry.service('gmail', 'v1', credentials)
+		self.assertTrue(gmail.users().messages().list(userId='me').uri.startswith('http://127.0.0.1:8090/gmail/v1/users/me/messages'))
+		self.assertEqual(gmail.new_batch_http_request()._batch_uri, 'http://127.0.0.1:8090/batch')
+		calendar = registry.service('calendar', 'v3', credentials)
+		self.assertTrue(calendar.events().insert(calendarId='primary', body={}).uri.startswith('http://127.0.0.1:8090/calendar/v3/calendars/primary/events'))
+
+	def test_oauth_flow_uses_the_configured_endpoints(self):
+		with mock.patch.dict(app.config, GOOGLE_AUTH_URI='https://stub/o/oauth2/auth', GOOGLE_TOKEN_URI='https://stub/token'):
+			with app.test_request_context():
+				flow = client_secrets_flow(redirect_uri='http://localhost:5000/oauth2callback')
+				url, _ = flow.authorization_url()
+		self.assertTrue(url.startswith('https://stub/o/oauth2/auth?'))
+		self.assertEqual(flow.client_config['token_uri'], 'https://stub/token')
+
+	def test_stored_credentials_stay_valid_until_they_expire(self):
+		from google.oauth2.credentials import Credentials
+		credentials = Credentials(
+			token='token', refresh_token='refresh', token_uri='http://stub/token', client_id='id', client_secret='secret',
+			expiry=datetime.utcnow() + timedelta(hours=1)
+		)
+		restored = Credentials.from_authorized_user_info(credentials_to_dict(credentials))
+		self.assertTrue(restored.valid)
+
+class TestStubUpstream(unittest.TestCase):
+	def call(self, stub, method, path, query='', body=b''):
+		return asyncio.run(stub.handle(method, path, query, {}, body))
+
+	def test_throttles_and_errors_are_injected_per_upstream(self):
+		stub = StubUpstream(seed=1)
+		stub.configure(upstream='gemini', throttle_rate=1, retry_after=3)
+		status, headers, _ = self.call(stub, 'POST', '/v1beta/models/gemini-1.5-flash:generateContent')
+		self.assertEqual((status, dict(headers)['retry-after']), (429, '3'))
+		status, _, body = self.call(stub, 'GET', '/data/2.5/weather', 'q=chennai')
+		self.assertEqual((status, json.loads(body)['name']), (200, 'Chennai'))
+
+		self.call(stub, 'POST', '/_stub/config', body=b'{"upstream": "weather", "error_rate": 1}')
+		status, _, _ = self.call(stub, 'GET', '/data/2.5/weather', 'q=chennai')
+		self.assertEqual(status, 503)
+		stats = json.loads(self.call(stub, 'GET', '/_stub/stats')[2])
+		self.assertEqual(stats['injected'], {'throttled': 1, 'errors': 1})
+		self.assertEqual(stats['calls'], {'gemini.generate': 1, 'weather': 2})
+
+	def test_unknown_settings_are_rejected(self):
+		status, _, body = self.call(StubUpstream(), 'POST', '/_stub/config', body=b'{"latencyy": 1}')
+		self.assertEqual(status, 400)
+		self.assertIn('latencyy', json.loads(body)['error'])
+
+if __name__ == '__main__':
+	unittest.main()